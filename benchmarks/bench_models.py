@@ -0,0 +1,61 @@
+"""
+Сравнение моделей ответа: коробки (model="box") против неизменяемых
+моделей на `__slots__` (model="slots") - память на один ответ
+и скорость доступа к полям.
+
+    python benchmarks/bench_models.py [-n ЧИСЛО_ОТВЕТОВ]
+"""
+import argparse
+import copy
+import gc
+import json
+import timeit
+import tracemalloc
+
+from yandex_weather_api.types import WeatherAnswer
+from bench_validate import FIXTURES, load_fixture
+
+
+def memory_per_answer(obj, model, number):
+    "Средний объём памяти одного проверенного ответа в байтах"
+    raw = json.dumps(obj)
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    answers = [WeatherAnswer.validate(json.loads(raw), model)
+               for _ in range(number)]
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del answers
+    return used / number
+
+
+def access_time(answer, number):
+    "Среднее время чтения типичного набора полей в наносекундах"
+    def read():
+        # pylint: disable=pointless-statement
+        answer.fact.temp
+        answer.fact.condition
+        answer.info.url
+        answer.forecasts[0].parts.day.temp_avg
+    return timeit.timeit(read, number=number) / number * 1e9
+
+
+def main():
+    # pylint: disable=missing-docstring
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--number", type=int, default=500)
+    args = parser.parse_args()
+    for name in FIXTURES:
+        obj = load_fixture(name)
+        for model in ("box", "slots"):
+            answer = WeatherAnswer.validate(copy.deepcopy(obj), model)
+            print("{:<24} {:<6} {:10.0f} B/answer  access {:8.0f} ns".format(
+                name, model,
+                memory_per_answer(obj, model, args.number),
+                access_time(answer, args.number * 20)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Сравнение скорости WeatherAnswer.validate: скомпилированные схемы
+против полной проверки voluptuous на тестовых ответах из tests/.
+
+    python benchmarks/bench_validate.py [-n ЧИСЛО_ПОВТОРОВ]
+"""
+import argparse
+import copy
+import json
+import os
+import timeit
+
+from yandex_weather_api.types import BoxWithSchema, WeatherAnswer
+
+TESTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests")
+FIXTURES = ("request_informers.json", "request_testing.json")
+
+
+def load_fixture(name):
+    "Загружает тестовый ответ сервера"
+    with open(os.path.join(TESTS, name)) as fixture:
+        return json.load(fixture)
+
+
+def measure(obj, compiled, number):
+    "Среднее время одного вызова validate в микросекундах"
+    BoxWithSchema.COMPILED = compiled
+    try:
+        objs = [copy.deepcopy(obj) for _ in range(number)]
+        it = iter(objs)
+        total = timeit.timeit(lambda: WeatherAnswer.validate(next(it)),
+                              number=number)
+    finally:
+        BoxWithSchema.COMPILED = True
+    return total / number * 1e6
+
+
+def main():
+    # pylint: disable=missing-docstring
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--number", type=int, default=2000)
+    args = parser.parse_args()
+    for name in FIXTURES:
+        obj = load_fixture(name)
+        WeatherAnswer.validate(copy.deepcopy(obj))  # компиляция схем
+        slow = measure(obj, False, args.number)
+        fast = measure(obj, True, args.number)
+        print("{:<24} voluptuous {:8.1f} us  compiled {:8.1f} us  x{:.2f}"
+              .format(name, slow, fast, slow / fast))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Набор измерений производительности yandex_weather_api.
+
+Измеряет validate_args, WeatherAnswer.validate на тестовых и
+синтетических ответах, память на один ответ, двоичный формат codec
+в сравнении с JSON, историю ответов, пространственный индекс и задержку
+подкоманды server с локальной заглушкой вместо API. Результаты
+сохраняются в JSON, чтобы сравнивать запуски:
+
+    python benchmarks/run.py -o new.json --compare old.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# pylint: disable=wrong-import-position
+from yandex_weather_api import validate_args
+from yandex_weather_api import codec
+from yandex_weather_api.history import HistoryStore
+from yandex_weather_api.loadtest import run_load
+from yandex_weather_api.spatial import SpatialIndex
+from yandex_weather_api.types import WeatherAnswer, json_default
+from bench_validate import FIXTURES, load_fixture
+from bench_models import memory_per_answer
+from synthetic import make_answer
+
+
+def per_call(func, number):
+    "Лучшее из трёх среднее время вызова func в микросекундах"
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+def bench_args(number):
+    "validate_args для обоих тарифов"
+    return {
+        "informers_us": per_call(lambda: validate_args(
+            "key", lat=55.75, lon=37.62, lang="ru_RU"), number),
+        "forecast_us": per_call(lambda: validate_args(
+            "key", rate="forecast", lat=55.75, lon=37.62, lang="ru_RU",
+            limit=7, hours=True, extra=False), number),
+    }
+
+
+def bench_answers(number):
+    "WeatherAnswer.validate и память на ответ для каждого вида ответа"
+    answers = {name: load_fixture(name) for name in FIXTURES}
+    answers["synthetic_7d_hours"] = make_answer(7, hours=True)
+    answers["synthetic_7d"] = make_answer(7, hours=False)
+    ret = {}
+    for name, obj in answers.items():
+        raw = json.dumps(obj)
+        result = {}
+        for model in ("box", "slots"):
+            result[model + "_us"] = per_call(
+                lambda: WeatherAnswer.validate(json.loads(raw), model),
+                number) - per_call(lambda: json.loads(raw), number)
+            result[model + "_bytes"] = memory_per_answer(obj, model, number)
+        result["lazy_fact_us"] = per_call(
+            lambda: WeatherAnswer.validate(json.loads(raw), lazy=True).fact.temp,
+            number) - per_call(lambda: json.loads(raw), number)
+        ret[name] = result
+    return ret
+
+
+def bench_codec(number):
+    """
+    Двоичный формат `codec` против JSON: размер и время кодирования
+    проверенного ответа и восстановления ответа (для JSON - разбор
+    исходного ответа API с проверкой схемой)
+    """
+    answers = {name: load_fixture(name) for name in FIXTURES}
+    answers["synthetic_7d_hours"] = make_answer(7, hours=True)
+    ret = {}
+    for name, obj in answers.items():
+        raw = json.dumps(obj)
+        result = {"json_bytes": len(raw.encode())}
+        for model in ("box", "slots"):
+            answer = WeatherAnswer.validate(json.loads(raw), model)
+            data = codec.dumps(answer)
+            result["binary_bytes"] = len(data)
+            result[model + "_json_encode_us"] = per_call(
+                lambda: json.dumps(answer, default=json_default), number)
+            result[model + "_json_decode_us"] = per_call(
+                lambda: WeatherAnswer.validate(json.loads(raw), model), number)
+            result[model + "_binary_encode_us"] = per_call(
+                lambda: codec.dumps(answer), number)
+            result[model + "_binary_decode_us"] = per_call(
+                lambda: codec.loads(data, model), number)
+        ret[name] = result
+    return ret
+
+
+def bench_history(number, polls=144):
+    """
+    HistoryStore на polls опросах одной точки раз в 10 минут (сутки),
+    в которых меняются только now и fact.temp
+    """
+    base = make_answer(7, hours=True)
+    answers = []
+    for poll in range(polls):
+        raw = dict(base, now=base["now"] + poll * 600,
+                   fact=dict(base["fact"], temp=base["fact"]["temp"] + poll % 5))
+        answers.append(WeatherAnswer.validate(raw))
+    store = HistoryStore()
+    start = time.perf_counter()
+    for answer in answers:
+        key = store.append(answer)
+    history = store[key]
+    middle = answers[polls // 2].now
+    return dict(history.stats(), **{
+        "append_us": (time.perf_counter() - start) / polls * 1e6,
+        "at_us": per_call(lambda: history.at(middle), number // 10 or 1),
+        "range_us": per_call(lambda: history.fact(
+            "temp", answers[0].now, answers[-1].now), number),
+    })
+
+
+def bench_spatial(number, points=300000, radius=5.0):
+    """
+    SpatialIndex.nearest по points точкам, разбросанным по всему миру
+    и сосредоточенным в квадрате 2x2 градуса
+    """
+    import random
+    rnd = random.Random(1)
+    layouts = {
+        "world": lambda: (rnd.uniform(-85, 85), rnd.uniform(-180, 180)),
+        "dense": lambda: (55 + rnd.uniform(-1, 1), 37 + rnd.uniform(-1, 1)),
+    }
+    ret = {}
+    for name, point in layouts.items():
+        index = SpatialIndex(cell=radius / 4 / 111.2)
+        for value in range(points):
+            index.add(*point(), value)
+        queries = [point() for _ in range(number)]
+        queries = iter(queries * 3 * (number // len(queries) + 1))
+        ret[name + "_us"] = per_call(
+            lambda: index.nearest(*next(queries), radius), number)
+    return ret
+
+
+def bench_server(requests, concurrency=20, points=50):
+    "Задержка подкоманды server с заглушкой API на localhost"
+    return asyncio.run(run_load("server", requests, concurrency, points,
+                                latency=0.005))
+
+
+def compare(new, old, path=""):
+    "Печатает отношение новых результатов к старым"
+    for key, value in new.items():
+        name = path + "." + key if path else key
+        if isinstance(value, dict) and isinstance(old.get(key), dict):
+            compare(value, old[key], name)
+        elif isinstance(value, float) and old.get(key):
+            print("{:<50} {:12.2f} {:12.2f} x{:.2f}".format(
+                name, old[key], value, value / old[key]))
+
+
+def main():
+    # pylint: disable=missing-docstring
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--number", type=int, default=200)
+    parser.add_argument("-o", "--output", default="bench.json")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--compare", default=None)
+    args = parser.parse_args()
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "validate_args": bench_args(args.number * 10),
+        "answers": bench_answers(args.number),
+        "codec": bench_codec(args.number),
+        "history": bench_history(args.number),
+        "spatial": bench_spatial(args.number),
+        "server": bench_server(args.requests),
+    }
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2)
+    if args.compare:
+        with open(args.compare) as old:
+            compare(results, json.load(old))
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
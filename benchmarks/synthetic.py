@@ -0,0 +1,29 @@
+"""
+Синтетические ответы API заданного размера для измерений.
+"""
+import copy
+
+from bench_validate import load_fixture
+
+DAY = 24 * 3600
+
+
+def make_answer(days=7, hours=True):
+    """
+    Ответ тарифа «Тестовый» на days дней, построенный из первого дня
+    tests/request_testing.json, с почасовым прогнозом или без него.
+    """
+    base = load_fixture("request_testing.json")
+    template = next(day for day in base["forecasts"] if len(day["hours"]) == 24)
+    forecasts = []
+    for number in range(days):
+        day = copy.deepcopy(template)
+        day["date_ts"] += number * DAY
+        if hours:
+            for hour in day["hours"]:
+                hour["hour_ts"] += number * DAY
+        else:
+            day["hours"] = []
+        forecasts.append(day)
+    base["forecasts"] = forecasts
+    return base
@@ -30,6 +30,7 @@ setup(
     author='Pavel Pletenev',
     tests_require=["pytest", "coverage >= 3.6", "tox", "pytest-cov"],
     install_requires=["voluptuous", "python-box", "aiohttp"],
+    extras_require={"numpy": ["numpy"], "brotli": ["brotli"]},
     author_email='cpp.create@gmail.com',
     description='Yandex Weather API python module',
     long_description=LONG_DESCRIPTION,
@@ -0,0 +1,8 @@
+import pytest
+
+from test_data import get_test_data
+
+
+@pytest.fixture(params=["request_testing.json", "request_informers.json"])
+def answer(request):
+    return get_test_data(request.param)
@@ -0,0 +1,46 @@
+import asyncio
+
+import yandex_weather_api
+from test_cache import AsyncResponse, AsyncSession
+
+
+class SlowSession(AsyncSession):
+    def __init__(self):
+        super().__init__()
+        self.running = 0
+        self.peak = 0
+
+    async def get(self, url, **kwargs):
+        self.calls.append(kwargs["params"])
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return AsyncResponse(self.data)
+
+
+async def collect(session, requests, **kwargs):
+    return [result async for result in yandex_weather_api.async_get_many(
+        session, "key", requests, **kwargs)]
+
+
+def test_limit_and_errors():
+    session = SlowSession()
+    requests = [{"lat": lat, "lon": 0} for lat in range(10)]
+    requests.append({"lat": "north", "lon": 0})
+    results = asyncio.run(collect(session, requests, limit=3))
+    assert len(results) == 11
+    assert session.peak == 3
+    errors = [result for result in results if result.error is not None]
+    assert [result.request for result in errors] == [{"lat": "north", "lon": 0}]
+    assert all(result.answer is not None
+               for result in results if result.error is None)
+
+
+def test_coalescing():
+    session = SlowSession()
+    requests = [{"lat": 1, "lon": 2}] * 5 + [{"lat": 1, "lon": 2, "lang": "en_US"}]
+    results = asyncio.run(collect(session, requests, limit=10))
+    assert len(results) == 6
+    assert len(session.calls) == 2
+    assert len({id(result.answer) for result in results}) == 2
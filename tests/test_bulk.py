@@ -0,0 +1,98 @@
+import csv
+import io
+import json
+
+from yandex_weather_api import BatchResult, WeatherClient
+from yandex_weather_api.bulk import (
+    RowError, column_getter, fetch_points, read_points, write_csv, write_jsonl
+)
+from test_client import Session
+
+
+def test_read_points():
+    with_header = io.StringIO("name,lat,lon,lang\nМосква,55.75,37.62,ru_RU\n\n")
+    assert list(read_points(with_header)) == [
+        {"name": "Москва", "lat": "55.75", "lon": "37.62", "lang": "ru_RU"}]
+    plain = io.StringIO("# comment\n55.75 37.62\n59.9, 30.3, x\n")
+    assert list(read_points(plain)) == [
+        {"lat": "55.75", "lon": "37.62"},
+        {"lat": "59.9", "lon": "30.3"},
+    ]
+
+
+def test_column_getter():
+    answer = {"fact": {"temp": 20}, "forecasts": [{"parts": {"day": 3}}]}
+    assert column_getter("fact.temp")(answer) == 20
+    assert column_getter("forecasts.0.parts.day")(answer) == 3
+    assert column_getter("forecasts.5.parts")(answer) is None
+    assert column_getter("fact.temp.x")(answer) is None
+
+
+def fetch(lines, **kwargs):
+    session = Session()
+    client = WeatherClient("key", session=session, pool_size=3)
+    return session, fetch_points(client, read_points(lines), **kwargs)
+
+
+def test_csv_streams_results():
+    lines = ["id,lat,lon,lang"] + [
+        "p{0},{0},30,ru_RU".format(lat) for lat in range(20)] + ["bad,x,1,"]
+    session, results = fetch(lines)
+    out = io.StringIO()
+    write_csv(results, out, ["fact.temp", "fact.condition", "fact.missing"])
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert len(rows) == 21
+    assert list(rows[0]) == ["id", "lat", "lon", "lang", "fact.temp",
+                             "fact.condition", "fact.missing", "error"]
+    good = [row for row in rows if not row["error"]]
+    assert sorted(row["id"] for row in good) == sorted(
+        "p{}".format(lat) for lat in range(20))
+    assert {row["fact.temp"] for row in good} == {"20.0"}
+    assert {row["fact.condition"] for row in good} == {"overcast"}
+    assert {row["fact.missing"] for row in good} == {""}
+    bad = [row for row in rows if row["error"]]
+    assert [row["id"] for row in bad] == ["bad"]
+    assert len(session.calls) == 20
+    assert session.calls[0][1]["lang"] == "ru_RU"
+    assert session.peak <= 3
+
+
+def test_jsonl():
+    session, results = fetch(["1,2", "3,4"])
+    out = io.StringIO()
+    write_jsonl(results, out, ["fact.temp"])
+    lines = sorted((json.loads(line) for line in out.getvalue().splitlines()),
+                   key=lambda line: line["lat"])
+    assert lines == [{"lat": "1", "lon": "2", "fact.temp": 20},
+                     {"lat": "3", "lon": "4", "fact.temp": 20}]
+    _, results = fetch(["1,2"])
+    out = io.StringIO()
+    write_jsonl(results, out)
+    assert json.loads(out.getvalue())["answer"]["fact"]["temp"] == 20
+
+
+def test_invalid_rows_reported():
+    data = b"lat,lon\n1,2\n3,\xff4\n5,6\n"
+    source = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8",
+                              errors="surrogateescape", newline="")
+    session, results = fetch(source)
+    out = io.StringIO()
+    write_csv(results, out, ["fact.temp"])
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert len(rows) == 3
+    assert [row["error"] for row in rows if row["error"]] == [
+        "line 3: invalid UTF-8"]
+    assert len(session.calls) == 2
+
+
+def test_csv_header_after_unreadable_row():
+    results = [
+        ({}, BatchResult(None, None, RowError(1, "bad quoting"))),
+        ({"lat": "1", "lon": "2", "id": "a"}, BatchResult({}, None, None)),
+    ]
+    out = io.StringIO()
+    write_csv(results, out, [])
+    rows = list(csv.reader(io.StringIO(out.getvalue())))
+    assert rows == [["lat", "lon", "error"],
+                    ["", "", "line 1: bad quoting"],
+                    ["1", "2", ""]]
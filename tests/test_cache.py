@@ -0,0 +1,106 @@
+import asyncio
+import copy
+
+import pytest
+
+import yandex_weather_api
+from yandex_weather_api import AnswerCache
+from test_data import get_test_data
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Response:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return copy.deepcopy(self.data)
+
+
+class Session:
+    def __init__(self):
+        self.data = get_test_data("request_informers.json")
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append(kwargs["params"])
+        return Response(self.data)
+
+
+class AsyncResponse(Response):
+    released = False
+
+    async def read(self):
+        return b""
+
+    def release(self):
+        self.released = True
+
+    async def json(self):
+        return copy.deepcopy(self.data)
+
+
+class AsyncSession(Session):
+    async def get(self, url, **kwargs):
+        self.calls.append(kwargs["params"])
+        return AsyncResponse(self.data)
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def test_quantised_hit(clock):
+    session = Session()
+    cache = AnswerCache(ttl=60, precision=2, clock=clock)
+    a = yandex_weather_api.get(session, "key", lat=55.1001, lon=60.1, cache=cache)
+    b = yandex_weather_api.get(session, "key", lat=55.1002, lon=60.1, cache=cache)
+    assert a is b
+    assert session.calls == [{"lat": "55.1", "lon": "60.1"}]
+    yandex_weather_api.get(session, "key", lat=55.1, lon=60.1, lang="en_US",
+                           cache=cache)
+    assert len(session.calls) == 2
+
+
+def test_ttl_and_lru(clock):
+    session = Session()
+    cache = AnswerCache(maxsize=2, ttl=60, clock=clock)
+    for lat in (1, 2, 3):
+        yandex_weather_api.get(session, "key", lat=lat, lon=0, cache=cache)
+    assert len(cache) == 2
+    yandex_weather_api.get(session, "key", lat=1, lon=0, cache=cache)
+    assert len(session.calls) == 4
+    clock.now = 61
+    yandex_weather_api.get(session, "key", lat=1, lon=0, cache=cache)
+    assert len(session.calls) == 5
+
+
+def test_stale_while_revalidate(clock):
+    session = AsyncSession()
+    cache = AnswerCache(ttl=60, stale=60, clock=clock)
+
+    async def run():
+        first = await yandex_weather_api.async_get(
+            session, "key", lat=1, lon=0, cache=cache)
+        clock.now = 90
+        stale = await yandex_weather_api.async_get(
+            session, "key", lat=1, lon=0, cache=cache)
+        again = await yandex_weather_api.async_get(
+            session, "key", lat=1, lon=0, cache=cache)
+        assert first is stale is again
+        await asyncio.sleep(0)
+        assert len(session.calls) == 2
+        fresh = await yandex_weather_api.async_get(
+            session, "key", lat=1, lon=0, cache=cache)
+        assert fresh is not first
+        assert len(session.calls) == 2
+
+    asyncio.run(run())
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+import voluptuous as vol
+
+from yandex_weather_api import AnswerCache, WeatherClient
+from test_cache import Response
+from test_data import get_test_data
+
+
+class Session:
+    def __init__(self):
+        self.data = get_test_data("request_informers.json")
+        self.headers = {}
+        self.calls = []
+        self.running = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self.lock:
+            self.calls.append((url, kwargs["params"], kwargs["timeout"]))
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.01)
+        with self.lock:
+            self.running -= 1
+        return Response(self.data)
+
+    def close(self):
+        pass
+
+
+def test_get_prepared_args():
+    session = Session()
+    client = WeatherClient("key", "forecast", timeout=5, session=session)
+    answer = client.get(lat=1, lon=2, limit=3)
+    assert answer.fact.temp == 20
+    client.get(rate="informers", lat=1, lon=2)
+    assert session.headers == {"X-Yandex-API-Key": "key"}
+    assert session.calls == [
+        ("https://api.weather.yandex.ru/v1/forecast",
+         {"lat": "1.0", "lon": "2.0", "limit": "3"}, 5),
+        ("https://api.weather.yandex.ru/v1/informers",
+         {"lat": "1.0", "lon": "2.0"}, 5),
+    ]
+    with pytest.raises(vol.Invalid):
+        client.get(rate="informers", lat=1, lon=2, limit=3)
+
+
+def test_get_many():
+    session = Session()
+    client = WeatherClient("key", pool_size=3, session=session,
+                           cache=AnswerCache())
+    requests = [{"lat": lat, "lon": 0} for lat in range(10)]
+    requests.append({"lat": "north", "lon": 0})
+    results = list(client.get_many(requests))
+    assert len(results) == 11
+    assert session.peak == 3
+    errors = [result.request for result in results if result.error is not None]
+    assert errors == [{"lat": "north", "lon": 0}]
+    assert list(client.get_many([{"lat": 1, "lon": 0}]))[0].answer is not None
+    assert len(session.calls) == 10
+
+
+def test_get_many_early_exit():
+    session = Session()
+    client = WeatherClient("key", pool_size=2, session=session)
+    results = client.get_many({"lat": lat, "lon": 0} for lat in range(100))
+    assert next(results).error is None
+    results.close()
+    assert len(session.calls) < 10
+
+
+def test_get_many_iterator_error():
+    def requests():
+        yield {"lat": 1, "lon": 0}
+        raise ValueError("bad row")
+
+    client = WeatherClient("key", pool_size=3, session=Session())
+    results = list(client.get_many(requests()))
+    assert len(results) == 2
+    errors = [result for result in results if result.request is None]
+    assert len(errors) == 1 and isinstance(errors[0].error, ValueError)
+
+
+def test_pooled_session():
+    with WeatherClient("key", pool_size=4) as client:
+        adapter = client.session.get_adapter("https://api.weather.yandex.ru")
+        assert adapter._pool_maxsize == 4
+        assert adapter._pool_block
+        assert client.session.headers["X-Yandex-API-Key"] == "key"
@@ -0,0 +1,66 @@
+import json
+import struct
+
+import pytest
+
+from yandex_weather_api import codec
+from yandex_weather_api.types import (
+    WeatherAnswer, Condition, Icon, Hours, json_default
+)
+from test_data import get_test_data
+
+
+def dump(answer):
+    return json.dumps(answer, default=json_default, sort_keys=True)
+
+
+@pytest.mark.parametrize("name", ["request_informers.json",
+                                  "request_testing.json"])
+@pytest.mark.parametrize("model", ["box", "slots"])
+def test_round_trip(name, model):
+    raw = get_test_data(name)
+    answer = WeatherAnswer.validate(get_test_data(name), model)
+    data = codec.dumps(answer)
+    assert len(data) < len(json.dumps(raw)) * 0.7
+    restored = codec.loads(data, model)
+    assert type(restored) is type(answer)
+    assert restored == answer
+    assert dump(restored) == dump(answer)
+    assert restored.forecast is restored.forecasts
+    assert type(restored.fact.condition) is Condition
+    assert type(restored.fact.icon) is Icon
+
+
+def test_no_revalidation(monkeypatch):
+    answer = WeatherAnswer.validate(get_test_data("request_testing.json"))
+    data = codec.dumps(answer)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("schema must not run")
+    monkeypatch.setattr(WeatherAnswer, "check", fail)
+    restored = codec.loads(data)
+    assert isinstance(restored.forecasts[0].hours, Hours)
+    assert restored.forecasts[0].hours == answer.forecasts[0].hours
+
+
+def test_lazy_answer():
+    answer = WeatherAnswer.validate(get_test_data("request_informers.json"),
+                                    lazy=True)
+    restored = codec.loads(codec.dumps(answer))
+    assert restored.fact.temp == 20
+    assert restored == WeatherAnswer.validate(
+        get_test_data("request_informers.json"))
+
+
+def test_header_checks():
+    data = codec.dumps(WeatherAnswer.validate(
+        get_test_data("request_informers.json")))
+    with pytest.raises(ValueError):
+        codec.loads(b"XXX" + data[3:])
+    with pytest.raises(ValueError):
+        codec.loads(data[:3] + bytes([codec.VERSION + 1]) + data[4:])
+    fingerprint = struct.unpack_from("<I", data, 4)[0] ^ 1
+    with pytest.raises(ValueError):
+        codec.loads(data[:4] + struct.pack("<I", fingerprint) + data[8:])
+    with pytest.raises(ValueError):
+        codec.loads(data, model="dict")
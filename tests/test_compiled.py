@@ -0,0 +1,71 @@
+import copy
+import json
+from collections import OrderedDict
+
+import pytest
+import voluptuous as vol
+
+from yandex_weather_api.compiled import compile_schema
+from yandex_weather_api.types import *
+
+
+def validate_slow(obj):
+    BoxWithSchema.COMPILED = False
+    try:
+        return WeatherAnswer.validate(obj)
+    finally:
+        BoxWithSchema.COMPILED = True
+
+
+def test_same_result(answer):
+    fast = WeatherAnswer.validate(copy.deepcopy(answer))
+    assert fast == validate_slow(copy.deepcopy(answer))
+    assert type(fast.fact.condition) is Condition
+    assert type(fast.fact.icon) is Icon
+
+
+@pytest.mark.parametrize("path,value", [
+    (("fact", "temp"), "hot"),
+    (("fact", "condition"), "sunny"),
+    (("fact", "polar"), "no"),
+    (("info", "url"), None),
+])
+def test_same_error(answer, path, value):
+    obj = copy.deepcopy(answer)
+    obj[path[0]][path[1]] = value
+    with pytest.raises(vol.Invalid) as fast:
+        WeatherAnswer.validate(copy.deepcopy(obj))
+    with pytest.raises(vol.Invalid) as slow:
+        validate_slow(obj)
+    assert str(fast.value) == str(slow.value)
+    assert fast.value.path == slow.value.path
+
+
+def test_exclusive_forecast(answer):
+    obj = copy.deepcopy(answer)
+    obj["forecast"] = obj["forecasts"] = obj.get("forecast", obj.get("forecasts"))
+    with pytest.raises(vol.Invalid):
+        WeatherAnswer.validate(obj)
+
+
+def test_dict_subclasses(answer):
+    ordered = json.loads(json.dumps(answer), object_pairs_hook=OrderedDict)
+    result = WeatherAnswer.validate(ordered, model="slots")
+    assert type(result.fact).__name__ == "FacticalWeatherInfo"
+    assert result == WeatherAnswer.validate(copy.deepcopy(answer), model="slots")
+
+
+def test_fallback_uses_resolver():
+    schema = vol.Schema({vol.Optional("a", default=1): number})
+    validate = compile_schema(schema, lambda validator: lambda value: str(value))
+    assert validate({"a": 2}) == {"a": "2"}
+    assert validate({}) == {"a": "1"}
+
+
+def test_errors_are_not_hidden():
+    def broken(value):
+        raise KeyError(value)
+
+    validate = compile_schema(vol.Schema({"a": broken}))
+    with pytest.raises(KeyError):
+        validate({"a": 1})
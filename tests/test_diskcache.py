@@ -0,0 +1,102 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import yandex_weather_api
+from yandex_weather_api import AnswerCache, DiskCache
+from test_cache import AsyncSession, Session, clock
+
+
+def test_shared_between_instances(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite")
+    session = Session()
+    first = DiskCache(path, ttl=60, clock=clock)
+    second = DiskCache(path, ttl=60, clock=clock)
+    a = yandex_weather_api.get(session, "key", lat=1, lon=2, cache=first)
+    b = yandex_weather_api.get(session, "key", lat=1, lon=2, cache=second)
+    assert a == b
+    assert len(session.calls) == 1
+    clock.now = 61
+    yandex_weather_api.get(session, "key", lat=1, lon=2, cache=second)
+    assert len(session.calls) == 2
+    assert len(first) == 1
+
+
+def test_maxsize(tmp_path, clock):
+    session = Session()
+    cache = DiskCache(str(tmp_path / "cache.sqlite"), maxsize=2, clock=clock,
+                      prune_interval=0)
+    for lat in (1, 2, 3):
+        clock.now += 1
+        yandex_weather_api.get(session, "key", lat=lat, lon=0, cache=cache)
+    assert len(cache) == 2
+    yandex_weather_api.get(session, "key", lat=3, lon=0, cache=cache)
+    assert len(session.calls) == 3
+    yandex_weather_api.get(session, "key", lat=1, lon=0, cache=cache)
+    assert len(session.calls) == 4
+
+
+def test_memory_cache_backend(tmp_path, clock):
+    session = Session()
+    disk = DiskCache(str(tmp_path / "cache.sqlite"), clock=clock)
+    for _ in range(2):
+        cache = AnswerCache(backend=disk)
+        yandex_weather_api.get(session, "key", lat=1, lon=2, cache=cache)
+        yandex_weather_api.get(session, "key", lat=1, lon=2, cache=cache)
+    assert len(session.calls) == 1
+
+
+def test_periodic_prune(tmp_path, clock):
+    session = Session()
+    cache = DiskCache(str(tmp_path / "cache.sqlite"), ttl=5, clock=clock,
+                      prune_interval=30)
+    for lat in range(3):
+        clock.now += 10
+        yandex_weather_api.get(session, "key", lat=lat, lon=0, cache=cache)
+    assert len(cache) == 3
+    clock.now += 10
+    yandex_weather_api.get(session, "key", lat=3, lon=0, cache=cache)
+    assert len(cache) == 1
+
+
+def test_async_does_not_block_loop(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = DiskCache(path)
+    other = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.3, other.execute, ("COMMIT",)).start()
+
+    async def run():
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        task = asyncio.ensure_future(ticker())
+        answer = await yandex_weather_api.async_get(
+            AsyncSession(), "key", lat=1, lon=2, cache=cache)
+        task.cancel()
+        assert answer.fact.temp == 20
+        assert len(ticks) > 10
+        assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.2
+
+    asyncio.run(run())
+    other.close()
+    assert len(cache) == 1
+
+
+def test_memory_entry_keeps_disk_age(tmp_path, clock):
+    session = Session()
+    disk = DiskCache(str(tmp_path / "cache.sqlite"), ttl=60, clock=clock)
+    yandex_weather_api.get(session, "key", lat=1, lon=2,
+                           cache=AnswerCache(ttl=60, backend=disk, clock=clock))
+    clock.now = 50
+    cache = AnswerCache(ttl=60, backend=disk, clock=clock)
+    yandex_weather_api.get(session, "key", lat=1, lon=2, cache=cache)
+    assert len(session.calls) == 1
+    clock.now = 61
+    yandex_weather_api.get(session, "key", lat=1, lon=2, cache=cache)
+    assert len(session.calls) == 2
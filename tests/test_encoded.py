@@ -0,0 +1,39 @@
+import gzip
+import json
+
+import pytest
+
+from yandex_weather_api import encoded
+from yandex_weather_api.encoded import EncodedCache, matches, negotiate
+
+
+def test_variants_and_cache():
+    cache = EncodedCache(maxsize=1)
+    answer = {"fact": {"temp": 20, "condition": "ясно"}}
+    entry = cache.get("a", answer)
+    assert json.loads(entry.body) == answer
+    assert gzip.decompress(entry.variant("gzip")) == entry.body
+    assert entry.variant("gzip") is entry.variant("gzip")
+    assert cache.get("a", answer) is entry
+    assert cache.get("a", dict(answer)) is not entry
+    assert cache.get("a", dict(answer)).etag == entry.etag
+    cache.get("b", answer)
+    assert len(cache) == 1
+    with pytest.raises(ValueError):
+        entry.variant("deflate")
+
+
+def test_negotiate_and_matches(monkeypatch):
+    monkeypatch.setattr(encoded, "_brotli", lambda: None)
+    assert negotiate("") == "identity"
+    assert negotiate("gzip, deflate, br") == "gzip"
+    assert negotiate("gzip;q=0, deflate") == "identity"
+    assert negotiate("*") == "gzip"
+    assert negotiate("gzip;q=0, *") == "identity"
+    monkeypatch.setattr(encoded, "_brotli", lambda: object())
+    assert negotiate("gzip, deflate, br") == "br"
+    assert negotiate("br;q=0,gzip;q=0.5") == "gzip"
+    assert negotiate("br;q=0, *") == "gzip"
+    assert matches('"x", W/"y"', '"y"')
+    assert matches("*", '"y"')
+    assert not matches('"x"', '"y"')
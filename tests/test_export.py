@@ -0,0 +1,56 @@
+import copy
+
+import pytest
+
+from yandex_weather_api.types import *
+from test_data import get_test_data
+
+np = pytest.importorskip("numpy")
+from yandex_weather_api.export import to_columns
+
+
+@pytest.fixture
+def answers():
+    return [
+        WeatherAnswer.validate(get_test_data("request_testing.json")),
+        WeatherAnswer.validate(get_test_data("request_informers.json")),
+    ]
+
+
+def test_columns(answers):
+    columns = to_columns(answers)
+    fact = columns["fact"]
+    assert fact["temp"].tolist() == [-3.0, 20.0]
+    assert fact["temp"].dtype == np.float64
+    assert [Condition.VALUES[code] for code in fact["condition"]] == \
+        [answer.fact.condition for answer in answers]
+    assert np.isnan(fact["temp_water"]).all()
+
+    days = columns["days"]
+    assert len(days["date"]) == sum(len(answer.forecasts) for answer in answers)
+    assert days["answer"].tolist()[-1] == 1
+
+    parts = columns["parts"]
+    first = (parts["answer"] == 1) & (parts["day"] == 0)
+    names = [PartName.VALUES[code] for code in parts["part"][first]]
+    assert names == list(answers[1].forecasts[0].parts)
+    assert parts["temp_avg"][first].tolist() == \
+        [part.temp_avg for part in answers[1].forecasts[0].parts.values()]
+
+
+def test_structured_and_slots(answers):
+    slots = [WeatherAnswer.validate(get_test_data("request_testing.json"),
+                                    model="slots")]
+    structured = to_columns(slots, structured=True)["parts"]
+    assert structured["temp_avg"].tolist() == \
+        to_columns(answers[:1])["parts"]["temp_avg"].tolist()
+
+
+def test_mixed_models(answers):
+    slots = WeatherAnswer.validate(get_test_data("request_informers.json"),
+                                   model="slots")
+    mixed = to_columns([answers[0], slots])
+    same = to_columns(answers)
+    for table in ("fact", "days", "parts"):
+        for name, column in same[table].items():
+            np.testing.assert_array_equal(mixed[table][name], column)
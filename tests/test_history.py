@@ -0,0 +1,84 @@
+import copy
+import json
+
+import pytest
+
+from yandex_weather_api.history import HistoryStore
+from yandex_weather_api.types import WeatherAnswer, json_default
+from test_data import get_test_data
+
+
+def polls(name, count, model="box"):
+    base = get_test_data(name)
+    answers = []
+    for number in range(count):
+        raw = copy.deepcopy(base)
+        raw["now"] += number * 600
+        raw["fact"]["obs_time"] += number // 3 * 1800
+        raw["fact"]["temp"] += number % 4
+        if number == 5:
+            del raw["fact"]["uv_index"]
+        if "forecasts" in raw:
+            raw["forecasts"][0]["parts"]["day"]["temp_avg"] += number % 2
+        answers.append(WeatherAnswer.validate(raw, model))
+    return answers
+
+
+def dump(answer):
+    return json.dumps(answer, default=json_default, sort_keys=True)
+
+
+@pytest.mark.parametrize("model", ["box", "slots"])
+def test_reconstruction(model):
+    answers = polls("request_testing.json", 12, model)
+    store = HistoryStore()
+    keys = {store.append(answer) for answer in answers}
+    assert keys == {(55.75, 37.62)}
+    history = store[keys.pop()]
+    for answer in answers:
+        restored = history.at(answer.now, model)
+        assert type(restored) is type(answer)
+        assert dump(restored) == dump(answer)
+    assert history.at(answers[0].now - 1) is None
+    assert dump(history.at(answers[4].now + 1)) == dump(answers[4])
+    stats = history.stats()
+    assert stats["answers"] == 12
+    assert stats["stored"] * 10 < stats["values"]
+
+
+def test_range_queries():
+    answers = polls("request_testing.json", 12)
+    store = HistoryStore()
+    for answer in answers:
+        key = store.append(answer)
+    history = store[key]
+    temp = answers[0].fact.temp
+    assert history.fact("temp", answers[2].now, answers[6].now) == [
+        (answers[number].now, temp + number % 4) for number in range(2, 6)]
+    uv_index = history.fact("uv_index", 0, answers[7].now)
+    assert [time for time, _ in uv_index] == [
+        answers[number].now for number in (0, 1, 2, 3, 4, 6)]
+    by_obs = history.fact("temp", answers[3].fact.obs_time,
+                          answers[6].fact.obs_time, index="obs_time")
+    assert [value for _, value in by_obs] == [temp + 3, temp, temp + 1]
+    date = answers[0].forecasts[0].date_ts
+    day = history.part(date, "day", "temp_avg", 0, answers[3].now)
+    assert [value for _, value in day] == [
+        answers[0].forecasts[0].parts.day.temp_avg + number % 2
+        for number in range(3)]
+    assert history.part(date, "day", "no_such_field", 0, 1e12) == []
+    with pytest.raises(ValueError):
+        history.fact("temp", 0, 1, index="date")
+
+
+def test_keys_and_order():
+    store = HistoryStore()
+    answers = polls("request_informers.json", 3)
+    answers[1].info.geoid = 213
+    key = store.append(answers[0])
+    assert store.append(answers[1]) == 213
+    assert len(store) == 2 and 213 in store and key in store
+    older = answers[0].copy()
+    older.now -= 1
+    with pytest.raises(ValueError):
+        store[key].append(older)
@@ -0,0 +1,94 @@
+import copy
+import json
+import math
+import os
+import pickle
+import subprocess
+import sys
+
+import pytest
+import voluptuous as vol
+
+from yandex_weather_api.types import *
+from test_data import get_test_data
+
+
+@pytest.fixture
+def raw():
+    return get_test_data("request_testing.json")
+
+
+def test_rows_and_columns(raw):
+    hours = WeatherAnswer.validate(raw).forecasts[0].hours
+    source = get_test_data("request_testing.json")["forecasts"][0]["hours"]
+    assert isinstance(hours, Hours)
+    assert len(hours) == len(source)
+    assert hours[13].temp == source[13]["temp"]
+    assert hours[13].condition == source[13]["condition"]
+    assert type(hours[13].wind_dir) is WindDir
+    assert hours[-1].hour == source[-1]["hour"]
+    assert list(hours.temp) == [float(hour["temp"]) for hour in source]
+    assert math.isnan(hours[0].prec_type)
+    assert hours[0].is_thunder is None
+
+
+def test_time_range(raw):
+    hours = WeatherAnswer.validate(raw).forecasts[0].hours
+    part = hours.between(hours.hour_ts[6], hours.hour_ts[12])
+    assert part.hour == [str(hour) for hour in range(6, 12)]
+    assert list(part.temp) == list(hours.temp[6:12])
+    assert len(hours.between(0, 1)) == 0
+
+
+def test_invalid_hour(raw):
+    raw["forecasts"][0]["hours"][3]["condition"] = "sunny"
+    with pytest.raises(vol.Invalid):
+        WeatherAnswer.validate(raw)
+
+
+def test_json(raw):
+    answer = WeatherAnswer.validate(raw)
+    data = json.loads(json.dumps(answer, default=json_default))
+    assert data["forecasts"][0]["hours"][0]["temp"] == answer.forecasts[0].hours[0].temp
+
+
+def test_copy_pickle_and_to_json(raw):
+    answer = WeatherAnswer.validate(raw)
+    hours = answer.forecasts[0].hours
+    for restored in (copy.deepcopy(answer), pickle.loads(pickle.dumps(answer))):
+        assert restored.forecasts[0].hours == hours
+        assert list(restored.forecasts[0].hours.temp) == list(hours.temp)
+        assert restored.forecasts[0].hours[3].condition == hours[3].condition
+    row = pickle.loads(pickle.dumps(hours[5]))
+    assert row.to_dict() == hours[5].to_dict()
+    data = json.loads(answer.to_json())
+    assert data["forecasts"][0]["hours"] == hours.to_list()
+
+
+def test_dict_access_and_extra_fields(raw):
+    source = copy.deepcopy(raw["forecasts"][0]["hours"])
+    answer = WeatherAnswer.validate(raw)
+    hours = answer.forecasts[0].hours
+    assert hours[13]["temp"] == source[13]["temp"]
+    assert hours[13].get("no_such_field", 1) == 1
+    assert "temp" in hours[13] and "prec_type" not in hours[13]
+    with pytest.raises(KeyError):
+        hours[13]["no_such_field"]
+    assert hours[0]["_nowcast"] is True
+    assert hours[0:2][0]._nowcast is True
+    assert hours == source
+    plain = answer.to_dict()["forecasts"][0]["hours"]
+    assert type(plain) is list and plain == source
+
+
+def test_unpickle_in_new_process(raw):
+    hours = WeatherAnswer.validate(raw).forecasts[0].hours
+    script = (
+        "import pickle, sys\n"
+        "hours = pickle.loads(sys.stdin.buffer.read())\n"
+        "print(type(hours[13].condition).__name__, hours[0].is_thunder)\n")
+    out = subprocess.run(
+        [sys.executable, "-c", script], input=pickle.dumps(hours),
+        stdout=subprocess.PIPE, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert out.stdout.decode().split() == ["Condition", "None"]
@@ -0,0 +1,33 @@
+import json
+
+from yandex_weather_api.ingest import ingest
+from test_data import get_test_data
+
+
+def test_order_and_errors():
+    good = json.dumps(get_test_data("request_informers.json"))
+    bad = json.dumps({"now": 1})
+    lines = [good, bad, "", "not json", good] * 5
+    out = [json.loads(line) for line in
+           ingest(lines, workers=2, chunk_size=3, max_pending=2)]
+    assert [record["line"] for record in out] == \
+        [n for n, line in enumerate(lines, 1) if line]
+    assert [("answer" in record) for record in out[:4]] == \
+        [True, False, False, True]
+    assert out[0]["answer"]["fact"]["temp"] == 20
+    assert out[1]["type"] == "MultipleInvalid"
+
+
+def test_ingest_command(tmp_path):
+    from yandex_weather_api.cli import WeatherIngest
+    archive = tmp_path / "answers.jsonl"
+    output = tmp_path / "out.jsonl"
+    good = json.dumps(get_test_data("request_informers.json"))
+    archive.write_text(good + "\nnot json\n")
+    _, code = WeatherIngest.run(
+        ["ingest", "--workers", "1", "-o", str(output), str(archive)],
+        exit=False)
+    assert code == 0
+    out = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [record["line"] for record in out] == [1, 2]
+    assert "answer" in out[0] and "error" in out[1]
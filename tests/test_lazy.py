@@ -0,0 +1,45 @@
+import copy
+import json
+from collections import OrderedDict
+
+import pytest
+import voluptuous as vol
+
+from yandex_weather_api.lazy import Lazy
+from yandex_weather_api.types import *
+
+
+@pytest.mark.parametrize("model", ["box", "slots"])
+def test_same_values(answer, model):
+    eager = WeatherAnswer.validate(copy.deepcopy(answer))
+    lazy = WeatherAnswer.validate(answer, model=model, lazy=True)
+    assert isinstance(lazy.fact, Lazy)
+    assert not lazy.fact.resolved
+    assert lazy.fact.temp == eager.fact.temp
+    assert lazy.fact.resolved
+    assert not lazy.forecasts[0].resolved
+    assert lazy.forecasts[0].parts.day.temp_avg == \
+        eager.forecasts[0].parts.day.temp_avg
+    assert lazy.info == eager.info
+
+
+def test_error_on_access(answer):
+    answer["fact"]["condition"] = "sunny"
+    lazy = WeatherAnswer.validate(answer, lazy=True)
+    assert lazy.info.url
+    with pytest.raises(vol.Invalid):
+        lazy.fact.condition
+
+
+def test_top_level_errors_stay_eager(answer):
+    del answer["fact"]
+    with pytest.raises(vol.Invalid):
+        WeatherAnswer.validate(answer, lazy=True)
+
+
+def test_dict_subclasses_stay_lazy(answer):
+    ordered = json.loads(json.dumps(answer), object_pairs_hook=OrderedDict)
+    lazy = WeatherAnswer.validate(ordered, lazy=True)
+    assert isinstance(lazy.fact, Lazy)
+    assert not lazy.fact.resolved
+    assert lazy.fact.temp == answer["fact"]["temp"]
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+import yandex_weather_api
+from yandex_weather_api import AnswerCache, metrics
+from yandex_weather_api.metrics import MetricsRegistry
+from test_cache import Session, AsyncSession
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    metrics.add_hook(registry)
+    yield registry
+    metrics.remove_hook(registry)
+
+
+class FailingSession:
+    def get(self, url, **kwargs):
+        raise ConnectionError(url)
+
+
+def test_no_hooks_no_wrapping():
+    validate = yandex_weather_api.WeatherAnswer.validate
+    assert metrics.timed("validate_seconds", validate) is validate
+
+
+def test_phases_and_cache(registry):
+    session = Session()
+    cache = AnswerCache(ttl=60)
+    for _ in range(3):
+        yandex_weather_api.get(session, "key", lat=1, lon=2, cache=cache)
+    assert registry.counters == {"cache_misses_total": 1,
+                                 "cache_hits_total": 2}
+    for name in ("network_seconds", "decode_seconds", "validate_seconds"):
+        assert registry.histograms[name].count == 1
+    with pytest.raises(ConnectionError):
+        yandex_weather_api.get(FailingSession(), "key", lat=1, lon=2)
+    # по умолчанию сетевая ошибка повторяется дважды
+    assert registry.counters["upstream_errors_total"] == 3
+    assert registry.counters["retries_total"] == 2
+
+
+def test_async_phases(registry):
+    asyncio.run(yandex_weather_api.async_get(AsyncSession(), "key",
+                                             lat=1, lon=2))
+    for name in ("network_seconds", "decode_seconds", "validate_seconds"):
+        assert registry.histograms[name].count == 1
+
+
+def test_render():
+    registry = MetricsRegistry()
+    registry("cache_hits_total", 1)
+    registry("network_seconds", 0.003)
+    registry("network_seconds", 100)
+    text = registry.render()
+    assert "# TYPE yandex_weather_cache_hits_total counter\n" \
+        "yandex_weather_cache_hits_total 1\n" in text
+    assert 'yandex_weather_network_seconds_bucket{le="0.0025"} 0\n' in text
+    assert 'yandex_weather_network_seconds_bucket{le="0.005"} 1\n' in text
+    assert 'yandex_weather_network_seconds_bucket{le="10.0"} 1\n' in text
+    assert 'yandex_weather_network_seconds_bucket{le="+Inf"} 2\n' in text
+    assert "yandex_weather_network_seconds_count 2\n" in text
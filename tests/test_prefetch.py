@@ -0,0 +1,67 @@
+import asyncio
+
+import yandex_weather_api
+from yandex_weather_api import AnswerCache, DiskCache, SingleFlight, validate_args
+from yandex_weather_api.prefetch import Prefetcher
+from test_cache import AsyncSession, Clock
+
+
+def test_refreshes_hottest_within_rate():
+    clock = Clock()
+    session = AsyncSession()
+    cache = AnswerCache(ttl=60, clock=clock)
+    prefetcher = Prefetcher("key", "informers", cache, SingleFlight(),
+                            refresh_rate=1, lead=10)
+    prefetcher.session = session
+    keys = []
+    for lat, hits in ((1, 5), (2, 1)):
+        args, kwargs = validate_args("key", lat=lat, lon=0)
+        key = cache.key(args, kwargs)
+        cache.store(key, "old")
+        for _ in range(hits):
+            prefetcher.touch(key, kwargs["params"])
+        keys.append(key)
+
+    async def run():
+        assert prefetcher.tick() == 0
+        clock.now = 55
+        assert prefetcher.tick() == 1
+        await asyncio.sleep(0.01)
+        assert session.calls == [{"lat": "1.0", "lon": "0.0"}]
+        assert cache.lookup(keys[0])[0].fact.temp == 20
+        assert cache.lookup(keys[1])[0] == "old"
+        assert prefetcher.tick() == 1
+        await asyncio.sleep(0.01)
+        assert len(session.calls) == 2
+
+    asyncio.run(run())
+
+
+def test_refresh_reaches_shared_disk_cache(tmp_path):
+    clock = Clock()
+    session = AsyncSession()
+    path = str(tmp_path / "cache.sqlite")
+    cache = AnswerCache(ttl=60, clock=clock,
+                        backend=DiskCache(path, ttl=60, clock=clock))
+    prefetcher = Prefetcher("key", "informers", cache, SingleFlight(),
+                            refresh_rate=1, lead=10)
+    prefetcher.session = session
+    other = AnswerCache(ttl=60, clock=clock,
+                        backend=DiskCache(path, ttl=60, clock=clock))
+
+    async def run():
+        await yandex_weather_api.async_get(
+            session, "key", lat=1, lon=0, cache=cache)
+        args, kwargs = validate_args("key", lat=1, lon=0)
+        prefetcher.touch(cache.key(args, kwargs), kwargs["params"])
+        clock.now = 55
+        assert prefetcher.tick() == 1
+        await asyncio.sleep(0.05)
+        assert len(session.calls) == 2
+        # другой процесс видит обновлённый ответ после истечения старого
+        clock.now = 70
+        await yandex_weather_api.async_get(
+            session, "key", lat=1, lon=0, cache=other)
+        assert len(session.calls) == 2
+
+    asyncio.run(run())
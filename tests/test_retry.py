@@ -0,0 +1,185 @@
+import asyncio
+import time
+
+import pytest
+
+import yandex_weather_api
+from yandex_weather_api import WeatherClient
+from yandex_weather_api import metrics
+from yandex_weather_api.metrics import MetricsRegistry
+from yandex_weather_api.retry import DeadlineExceeded, RetryPolicy, UpstreamError
+from test_cache import AsyncResponse, Response
+from test_data import get_test_data
+
+FAST = RetryPolicy(retries=2, backoff=0)
+
+
+class Flaky:
+    "Сессия, которая отвечает по очереди ответами из outcomes"
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.data = get_test_data("request_informers.json")
+        self.timeouts = []
+        self.calls = 0
+
+    def response(self, timeout, make):
+        self.timeouts.append(timeout)
+        outcome = self.outcomes.pop(0) if self.outcomes else 200
+        if isinstance(outcome, Exception):
+            raise outcome
+        resp = make(self.data)
+        resp.status_code = resp.status = outcome
+        return resp
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+        return self.response(kwargs.get("timeout"), Response)
+
+
+class AsyncFlaky(Flaky):
+    def __init__(self, *outcomes, delays=()):
+        super().__init__(*outcomes)
+        self.delays = list(delays)
+
+    async def get(self, url, **kwargs):
+        self.calls += 1
+        if self.delays:
+            await asyncio.sleep(self.delays.pop(0))
+        return self.response(kwargs.get("timeout"), AsyncResponse)
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    metrics.add_hook(registry)
+    yield registry
+    metrics.remove_hook(registry)
+
+
+def test_retries_transient_failures(registry):
+    session = Flaky(ConnectionError(), 503)
+    answer = yandex_weather_api.get(session, "key", lat=1, lon=2, retry=FAST)
+    assert answer.fact.temp == 20
+    assert session.timeouts == [(3.05, 10)] * 3
+    assert registry.counters["retries_total"] == 2
+    assert registry.counters["upstream_errors_total"] == 2
+    with pytest.raises(UpstreamError) as info:
+        yandex_weather_api.get(Flaky(503, 503, 503), "key", lat=1, lon=2,
+                               retry=FAST)
+    assert info.value.status == 503
+    session = Flaky(ValueError("bug"))
+    with pytest.raises(ValueError):
+        yandex_weather_api.get(session, "key", lat=1, lon=2, retry=FAST)
+    assert session.timeouts == [(3.05, 10)]
+
+
+def test_no_retry_policy():
+    session = Flaky(ConnectionError())
+    with pytest.raises(ConnectionError):
+        yandex_weather_api.get(session, "key", lat=1, lon=2, retry=None)
+    assert session.timeouts == [None]
+
+
+def test_client_without_retries():
+    session = Flaky(ConnectionError(), ConnectionError())
+    session.headers = {}
+    client = WeatherClient("key", session=session, retry=None, timeout=4)
+    with pytest.raises(ConnectionError):
+        client.get(lat=1, lon=2)
+    assert session.timeouts == [4]
+    client = WeatherClient("key", session=session, timeout=4)
+    assert client.get(lat=1, lon=2).fact.temp == 20
+    assert session.timeouts == [4, 4, 4]
+
+
+def test_failed_responses_released():
+    async def run():
+        session = AsyncFlaky(503, 503)
+        session.responses = []
+        make = session.response
+
+        def response(timeout, make_response):
+            resp = make(timeout, make_response)
+            session.responses.append(resp)
+            return resp
+
+        session.response = response
+        await yandex_weather_api.async_get(session, "key", lat=1, lon=2,
+                                           retry=FAST)
+        assert [resp.released for resp in session.responses] == [
+            True, True, False]
+
+    asyncio.run(run())
+
+
+def test_cancelled_hedge_released():
+    class SlowBody(AsyncResponse):
+        async def read(self):
+            await asyncio.sleep(0.5)
+
+    class Session(AsyncFlaky):
+        def response(self, timeout, make):
+            resp = super().response(
+                timeout, SlowBody if self.calls == 1 else make)
+            responses.append(resp)
+            return resp
+
+    responses = []
+
+    async def run():
+        await yandex_weather_api.async_get(Session(), "key", lat=1, lon=2,
+                                           retry=RetryPolicy(hedge=0.02))
+        await asyncio.sleep(0)
+        assert [resp.released for resp in responses] == [True, False]
+
+    asyncio.run(run())
+
+
+def test_backoff_with_jitter():
+    policy = RetryPolicy(backoff=0.1, max_backoff=0.3)
+    for attempt, bound in ((0, 0.1), (1, 0.2), (2, 0.3), (5, 0.3)):
+        delays = [policy.delay(attempt) for _ in range(100)]
+        assert all(0 <= delay <= bound for delay in delays)
+        assert len(set(delays)) > 1
+    assert policy.replace(retries=0).retries == 0
+    assert policy.replace(retries=0).backoff == 0.1
+
+
+def test_sync_hedge(registry):
+    class Slow(Flaky):
+        def get(self, url, **kwargs):
+            self.calls += 1
+            if self.calls == 1:
+                time.sleep(0.3)
+            return self.response(kwargs.get("timeout"), Response)
+
+    start = time.perf_counter()
+    answer = yandex_weather_api.get(Slow(), "key", lat=1, lon=2,
+                                    retry=RetryPolicy(hedge=0.02))
+    assert answer.fact.temp == 20
+    assert time.perf_counter() - start < 0.25
+    assert registry.counters["hedges_total"] == 1
+    assert registry.counters["hedge_wins_total"] == 1
+
+
+def test_async_retry_hedge_and_deadline(registry):
+    async def run():
+        session = AsyncFlaky(502, delays=[0, 0.5, 0])
+        answer = await yandex_weather_api.async_get(
+            session, "key", lat=1, lon=2,
+            retry=RetryPolicy(backoff=0, hedge=0.02))
+        assert answer.fact.temp == 20
+        assert session.calls == 3
+        assert session.timeouts[0].sock_read == 10
+        assert registry.counters["retries_total"] == 1
+        assert registry.counters["hedge_wins_total"] == 1
+
+        start = time.perf_counter()
+        with pytest.raises(DeadlineExceeded):
+            await yandex_weather_api.async_get(
+                AsyncFlaky(delays=[5]), "key", lat=1, lon=2,
+                retry=RetryPolicy(deadline=0.05))
+        assert time.perf_counter() - start < 1
+        assert registry.counters["deadline_exceeded_total"] == 1
+
+    asyncio.run(run())
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from yandex_weather_api.cli import make_app
+from yandex_weather_api.scheduler import (
+    BULK, INTERACTIVE, NORMAL, QuotaExceeded, QuotaScheduler
+)
+from test_cache import AsyncResponse, AsyncSession, Clock
+
+
+class KeySession(AsyncSession):
+    def __init__(self):
+        super().__init__()
+        self.keys = []
+
+    async def get(self, url, **kwargs):
+        self.keys.append(kwargs["headers"]["X-Yandex-API-Key"])
+        return await super().get(url, **kwargs)
+
+    async def close(self):
+        pass
+
+
+def test_balances_keys_and_meters_api_calls():
+    session = KeySession()
+    scheduler = QuotaScheduler({"aaaa": 3, "bbbb": 5})
+
+    async def run():
+        for lat in range(4):
+            answer = await scheduler.get(session, lat=lat, lon=0)
+            assert answer.fact.temp == 20
+
+    asyncio.run(run())
+    assert session.keys == ["bbbb", "bbbb", "aaaa", "bbbb"]
+    usage = scheduler.usage()
+    assert [(key["key"], key["used"]) for key in usage["keys"]] == [
+        ("...aaaa", 1), ("...bbbb", 3)]
+    assert usage["remaining"] == 4
+    assert usage["waiting"] == 0
+
+
+def test_priority_order_under_rate_limit():
+    scheduler = QuotaScheduler({"key": 100}, rate=200, burst=1)
+    order = []
+
+    async def run():
+        await scheduler.acquire()
+        waiters = []
+        for priority in (BULK, NORMAL, INTERACTIVE, NORMAL):
+            future = scheduler.acquire(priority)
+            future.add_done_callback(lambda _, p=priority: order.append(p))
+            waiters.append(future)
+        assert scheduler.usage()["waiting"] == 4
+        await asyncio.gather(*waiters)
+
+    asyncio.run(run())
+    assert order == [INTERACTIVE, NORMAL, NORMAL, BULK]
+
+
+def test_low_quota_defers_or_drops_bulk():
+    clock = Clock()
+    scheduler = QuotaScheduler({"key": 10}, reserve=0.2, period=100,
+                               clock=clock)
+
+    async def run():
+        for _ in range(8):
+            await scheduler.acquire(BULK)
+        assert scheduler.usage()["low"]
+        with pytest.raises(QuotaExceeded):
+            await scheduler.acquire(BULK, low_quota="drop")
+        deferred = scheduler.acquire(BULK)
+        assert await scheduler.acquire(INTERACTIVE) == "key"
+        assert await scheduler.acquire(NORMAL) == "key"
+        with pytest.raises(QuotaExceeded):
+            await scheduler.acquire(INTERACTIVE)
+        assert not deferred.done()
+        clock.now = 100
+        assert await scheduler.acquire(INTERACTIVE) == "key"
+        assert await deferred == "key"
+        assert scheduler.usage()["keys"][0]["used"] == 2
+
+    asyncio.run(run())
+
+
+def test_server_quota():
+    session = KeySession()
+    scheduler = QuotaScheduler({"first": 1, "second": 1})
+
+    async def run():
+        app = make_app("first", "informers", session_factory=lambda: session,
+                       scheduler=scheduler)
+        async with TestClient(TestServer(app)) as client:
+            for lat in (1, 1, 2):
+                resp = await client.get("/", params={"lat": lat, "lon": 0})
+                assert resp.status == 200
+            resp = await client.get("/", params={"lat": 3, "lon": 0})
+            assert resp.status == 503
+            usage = await (await client.get("/quota")).json()
+            assert usage["remaining"] == 0
+
+    asyncio.run(run())
+    assert session.keys == ["first", "second"]
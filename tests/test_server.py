@@ -0,0 +1,167 @@
+import asyncio
+import json
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from yandex_weather_api import metrics
+from yandex_weather_api.cli import make_app
+from yandex_weather_api.metrics import MetricsRegistry
+from test_batch import SlowSession
+
+
+class Session(SlowSession):
+    async def close(self):
+        pass
+
+
+def run_app(check, **kwargs):
+    session = Session()
+
+    async def run():
+        app = make_app("key", "informers", session_factory=lambda: session,
+                       **kwargs)
+        async with TestClient(TestServer(app)) as client:
+            await check(client)
+
+    asyncio.run(run())
+    return session
+
+
+def test_query_params_and_singleflight():
+    async def check(client):
+        responses = await asyncio.gather(*[
+            client.get("/", params={"lat": "55.75", "lon": "37.62"})
+            for _ in range(20)
+        ])
+        assert all(resp.status == 200 for resp in responses)
+        data = await responses[0].json()
+        assert data["fact"]["temp"] == 20
+        resp = await client.get("/", params={"lat": "55.75", "lon": "37.62",
+                                             "lang": "en_US"})
+        assert resp.status == 200
+
+    session = run_app(check)
+    assert session.calls == [
+        {"lat": "55.75", "lon": "37.62"},
+        {"lat": "55.75", "lon": "37.62", "lang": "en_US"},
+    ]
+
+
+def test_default_location_and_bad_request():
+    async def check(client):
+        assert (await client.get("/")).status == 200
+        assert (await client.get("/", params={"lat": "x"})).status == 400
+
+    session = run_app(check, lat=1, lon=2)
+    assert session.calls == [{"lat": "1.0", "lon": "2.0"}]
+
+
+def test_metrics_endpoint():
+    registry = MetricsRegistry()
+
+    async def check(client):
+        assert (await client.get("/", params={"lat": "1", "lon": "2"})).status == 200
+        assert (await client.get("/", params={"lat": "1", "lon": "2"})).status == 200
+        resp = await client.get("/metrics")
+        assert resp.status == 200
+        text = await resp.text()
+        assert "yandex_weather_cache_hits_total 1\n" in text
+        assert "yandex_weather_request_seconds_count 2\n" in text
+        assert "yandex_weather_network_seconds_count 1\n" in text
+
+    run_app(check, registry=registry)
+    assert registry not in metrics.HOOKS
+
+
+def test_encoded_responses_and_etag():
+    async def check(client):
+        params = {"lat": "1", "lon": "2"}
+        first = await client.get("/", params=params,
+                                 headers={"Accept-Encoding": "gzip"})
+        assert first.status == 200
+        assert first.headers["Content-Encoding"] == "gzip"
+        assert first.headers["Vary"] == "Accept-Encoding"
+        assert (await first.json())["fact"]["temp"] == 20
+        etag = first.headers["ETag"]
+        plain = await client.get("/", params=params,
+                                 headers={"Accept-Encoding": "identity"})
+        assert "Content-Encoding" not in plain.headers
+        assert plain.headers["ETag"] == etag
+        assert len(client.app["encoded"]) == 1
+        cached = await client.get("/", params=params,
+                                  headers={"If-None-Match": etag})
+        assert cached.status == 304
+        assert cached.headers["ETag"] == etag
+        assert await cached.read() == b""
+
+    run_app(check)
+
+
+def read_lines(text):
+    return sorted((json.loads(line) for line in text.splitlines()),
+                  key=lambda line: line["index"])
+
+
+def test_batch_streams_ndjson():
+    async def check(client):
+        items = [{"lat": lat, "lon": 0} for lat in range(12)]
+        items += [5, {"lat": 1, "lon": 0, "rate": "forecast"}, {"lat": "x"}]
+        resp = await client.post("/batch", json=items)
+        assert resp.status == 200
+        assert resp.content_type == "application/x-ndjson"
+        lines = read_lines(await resp.text())
+        assert [line["index"] for line in lines] == list(range(15))
+        assert all(line["answer"]["fact"]["temp"] == 20 for line in lines[:12])
+        assert lines[12] == {"index": 12, "request": 5,
+                             "error": "batch item must be an object"}
+        assert lines[13]["error"] == "unknown arguments: rate"
+        assert "answer" not in lines[14] and lines[14]["error"]
+        assert (await client.post("/batch", json={"lat": 1})).status == 400
+
+    session = run_app(check, batch_limit=3)
+    assert len(session.calls) == 12
+    assert session.peak == 3
+
+
+def test_batch_ndjson_request():
+    async def check(client):
+        body = b'{"lat": 1, "lon": 2}\n\n{"lat": 3}\nnot json\n'
+        resp = await client.post(
+            "/batch", data=body,
+            headers={"Content-Type": "application/x-ndjson"})
+        lines = read_lines(await resp.text())
+        assert lines[0]["answer"]["fact"]["temp"] == 20
+        assert lines[0]["request"] == {"lat": 1, "lon": 2}
+        assert lines[1]["request"] == {"lat": 3}
+        assert lines[1]["answer"]
+        assert lines[2]["request"] == "not json"
+        assert lines[2]["error"].startswith("invalid JSON")
+
+    session = run_app(check, lat=0, lon=5)
+    assert sorted(call["lat"] for call in session.calls) == ["1.0", "3.0"]
+
+
+def test_batch_invalid_items_only():
+    async def check(client):
+        resp = await client.post("/batch", json=[1, {"x": 2}])
+        lines = read_lines(await resp.text())
+        assert [line["error"] for line in lines] == [
+            "batch item must be an object", "unknown arguments: x"]
+
+    session = run_app(check)
+    assert session.calls == []
+
+
+def test_port_switch():
+    from yandex_weather_api.cli import WeatherWeb
+    seen = []
+
+    class Probe(WeatherWeb):
+        def main(self, lat=None, lon=None):
+            seen.append((self.port, lat, lon))
+
+    Probe.run(["server"], exit=False)
+    Probe.run(["server", "--port", "8080"], exit=False)
+    Probe.run(["server", "-p", "8081", "55.75", "37.62"], exit=False)
+    assert seen == [(8000, None, None), (8080, None, None),
+                    (8081, "55.75", "37.62")]
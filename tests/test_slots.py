@@ -0,0 +1,41 @@
+import copy
+import pickle
+
+import pytest
+
+from yandex_weather_api.types import *
+
+
+def test_same_fields(answer):
+    box = WeatherAnswer.validate(copy.deepcopy(answer))
+    slots = WeatherAnswer.validate(copy.deepcopy(answer), model="slots")
+    assert slots == box.to_dict()
+    assert slots.fact.temp == box.fact.temp
+    assert slots.forecasts[0].parts.day == box.forecasts[0].parts.day
+    assert slots.forecasts[0].parts["day"].condition == \
+        box.forecasts[0].parts.day.condition
+    assert slots.forecast is slots.forecasts
+
+
+def test_frozen(answer):
+    slots = WeatherAnswer.validate(answer, model="slots")
+    with pytest.raises(AttributeError):
+        slots.fact.temp = 0
+    with pytest.raises(AttributeError):
+        slots.fact.no_such_field
+
+
+def test_copy_and_pickle(answer):
+    slots = WeatherAnswer.validate(answer, model="slots")
+    assert copy.copy(slots) is slots
+    for restored in (copy.deepcopy(slots), pickle.loads(pickle.dumps(slots))):
+        assert restored == slots
+        assert type(restored) is type(slots)
+        assert type(restored.info) is type(slots.info)
+        assert type(restored.fact.condition) is Condition
+        assert restored.forecasts[0].parts.day == slots.forecasts[0].parts.day
+
+
+def test_unknown_model(answer):
+    with pytest.raises(ValueError):
+        WeatherAnswer.validate(answer, model="dataclass")
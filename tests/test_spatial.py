@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+import yandex_weather_api
+from yandex_weather_api import AnswerCache, NearbyCache, SpatialIndex
+from yandex_weather_api.spatial import distance
+from test_cache import Response, Session
+
+
+def brute(points, lat, lon, radius):
+    dist, point = min((distance(lat, lon, *point[:2]), point) for point in points)
+    return (dist,) + point if dist <= radius else None
+
+
+def test_nearest_matches_brute_force():
+    rnd = random.Random(1)
+    points = [(rnd.uniform(-90, 90), rnd.uniform(-180, 180), number)
+              for number in range(2000)]
+    points += [(60 + rnd.uniform(-1, 1), 179.5 + rnd.uniform(0, 1), number)
+               for number in range(2000, 2500)]
+    points += [(89.9, rnd.uniform(-180, 180), number)
+               for number in range(2500, 2600)]
+    for radius in (50, 500):
+        index = SpatialIndex(cell=radius / 4 / 111.2)
+        for point in points:
+            index.add(*point)
+        assert len(index) == len(points)
+        for _ in range(200):
+            lat, lon = rnd.uniform(-90, 90), rnd.uniform(-180, 180)
+            assert index.nearest(lat, lon, radius) == \
+                brute(points, lat, lon, radius)
+        assert index.nearest(60.5, -179.9, radius) == \
+            brute(points, 60.5, -179.9, radius)
+        # у полюса точки 89.9 равноудалены, сравниваем расстояния
+        assert index.nearest(90, 0, radius)[0] == \
+            pytest.approx(brute(points, 90, 0, radius)[0])
+
+
+def test_add_replaces_value():
+    index = SpatialIndex()
+    index.add(55.75, 37.62, "a")
+    index.add(55.75, 37.62, "b")
+    assert len(index) == 1
+    assert index.nearest(55.75, 37.62, 1)[3] == "b"
+    assert index.nearest(50, 30, 1) is None
+
+
+class PlaceSession(Session):
+    "Ответ для населённого пункта в точке запроса"
+    def get(self, url, **kwargs):
+        params = kwargs["params"]
+        self.calls.append(params)
+        data = dict(self.data, info=dict(
+            self.data["info"], lat=float(params["lat"]),
+            lon=float(params["lon"]), geoid=213))
+        return Response(data)
+
+
+def test_nearby_cache():
+    session = PlaceSession()
+    cache = NearbyCache(AnswerCache(), radius=5)
+
+    def get(lat, lon):
+        return yandex_weather_api.get(session, "key", lat=lat, lon=lon,
+                                      cache=cache)
+    first = get(55.7539, 37.6204)
+    assert get(55.76, 37.63) is first
+    assert get(55.72, 37.6).info.lat == 55.75
+    assert get(59.94, 30.31) is not first
+    assert session.calls == [{"lat": "55.75", "lon": "37.62"},
+                             {"lat": "59.94", "lon": "30.31"}]
+    assert cache.index.nearest(55.76, 37.63, 5)[3] == {
+        "lat": "55.75", "lon": "37.62", "geoid": 213}
+    assert len(cache) == 2
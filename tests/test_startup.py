@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+
+
+def importtime(code):
+    "Запускает code в новом интерпретаторе с -X importtime"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", textwrap.dedent(code)],
+        cwd=TESTS, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True)
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def roots(modules):
+    return {name.split(".")[0] for name in modules}
+
+
+def test_cli_module_is_light():
+    modules = importtime("import yandex_weather_api.cli")
+    heavy = {"requests", "aiohttp", "voluptuous", "box", "asyncio", "sqlite3",
+             "numpy"}
+    assert roots(modules) & heavy == set()
+    assert "yandex_weather_api.types" not in modules
+
+
+def test_cli_get_does_not_import_aiohttp():
+    modules = importtime("""
+        import json
+        import yandex_weather_api.cli
+
+        class Session:
+            def get(self, url, **kwargs):
+                return self
+
+            def json(self):
+                with open("request_informers.json") as f:
+                    return json.load(f)
+
+        yandex_weather_api.get(Session(), "key", lat=1, lon=2)
+    """)
+    assert "voluptuous" in modules
+    assert roots(modules) & {"aiohttp", "asyncio"} == set()
+
+
+def test_server_does_not_import_requests():
+    modules = importtime("""
+        from yandex_weather_api.cli import make_app
+        make_app("key", "informers")
+    """)
+    assert "aiohttp" in modules
+    assert "requests" not in roots(modules)
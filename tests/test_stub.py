@@ -0,0 +1,83 @@
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from yandex_weather_api import RetryPolicy, WeatherClient, validate_args
+from yandex_weather_api.loadtest import run_load, summarize
+from yandex_weather_api.stub import Upstream, make_answer
+from yandex_weather_api.types import WeatherAnswer
+
+
+def test_answers_validate():
+    informers = WeatherAnswer.validate(make_answer(55.75, 37.62, now=1e9))
+    assert informers.now == 1e9
+    assert len(informers.forecast) == 1
+    forecast = WeatherAnswer.validate(
+        make_answer(55.75, 37.62, "forecast", days=3, hours=True), model="slots")
+    assert len(forecast.forecasts) == 3
+    assert len(forecast.forecasts[2].hours) == 24
+    short = make_answer(55.75, 37.62, "forecast", days=2, hours=False)
+    assert "hours" not in short["forecasts"][0]
+    assert make_answer(1, 2) == make_answer(1, 2, now=short["now"])
+
+
+def test_base_url():
+    args, kwargs = validate_args("key", base_url="http://127.0.0.1:8080/",
+                                 lat=1, lon=2)
+    assert args == ("http://127.0.0.1:8080/v1/informers",)
+    assert validate_args("key", lat=1, lon=2)[0] == (
+        "https://api.weather.yandex.ru/v1/informers",)
+    client = WeatherClient("key", "forecast", base_url="http://stub")
+    assert client.args(lat=1, lon=2)[0] == ("http://stub/v1/forecast",)
+    client.close()
+
+
+def test_upstream_responses():
+    upstream = Upstream(days=3)
+
+    async def run():
+        async with TestClient(TestServer(upstream.make_app())) as client:
+            headers = {"X-Yandex-API-Key": "key"}
+            resp = await client.get("/v1/forecast", headers=headers,
+                                    params={"lat": 1, "lon": 2, "limit": 7})
+            data = await resp.json()
+            assert len(data["forecasts"]) == 3
+            assert len(data["forecasts"][0]["hours"]) == 24
+            resp = await client.get("/v1/forecast", headers=headers, params={
+                "lat": 1, "lon": 2, "limit": 2, "hours": "false"})
+            data = await resp.json()
+            assert len(data["forecasts"]) == 2
+            assert "hours" not in data["forecasts"][0]
+            assert (await client.get("/v1/informers", params={
+                "lat": 1, "lon": 2})).status == 403
+            assert (await client.get("/v1/informers", headers=headers,
+                                     params={"lat": 1})).status == 400
+            upstream.error_rate = 1
+            assert (await client.get("/v1/informers", headers=headers, params={
+                "lat": 1, "lon": 2})).status == 503
+
+    asyncio.run(run())
+    assert upstream.requests == 5
+    assert upstream.errors == 1
+
+
+def test_run_load():
+    client = asyncio.run(run_load("client", 40, 5, points=4, latency=0,
+                                  error_rate=0.5, seed=1,
+                                  retry=RetryPolicy(retries=0)))
+    assert client["requests"] == 40
+    assert 0 < client["errors"] < 40
+    assert client["upstream_requests"] == 40
+    server = asyncio.run(run_load("server", 40, 5, points=4, latency=0))
+    assert server["errors"] == 0
+    assert server["upstream_requests"] == 4
+    assert server["p50_ms"] <= server["p99_ms"]
+
+
+def test_summarize():
+    result = summarize([0.001 * number for number in range(1, 101)], 5, 2.0)
+    assert result["requests"] == 105
+    assert result["rps"] == 52.5
+    assert round(result["p50_ms"]) == 51
+    assert round(result["p99_ms"]) == 100
+    assert summarize([], 3, 1.0)["p50_ms"] is None
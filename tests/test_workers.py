@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+import requests
+from aiohttp import web
+
+from yandex_weather_api.cli import serve_workers
+
+
+def build(number):
+    async def handler(request):  # pylint: disable=unused-argument
+        return web.json_response({"number": number, "pid": os.getpid()})
+    app = web.Application()
+    app.router.add_get("/", handler)
+    return app
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def poll(port, exclude=None, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            data = requests.get("http://127.0.0.1:{}/".format(port),
+                                timeout=1).json()
+            if data["pid"] != exclude:
+                return data
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    raise AssertionError("server did not answer")
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def test_restart_and_graceful_shutdown():
+    port = free_port()
+    master = multiprocessing.get_context("fork").Process(
+        target=serve_workers, args=(build, port, 1), kwargs={"interval": 0.05})
+    master.start()
+    try:
+        first = poll(port)
+        assert first["number"] == 0
+        os.kill(first["pid"], signal.SIGKILL)
+        second = poll(port, exclude=first["pid"])
+        assert second["number"] == 0
+        os.kill(master.pid, signal.SIGTERM)
+        master.join(10)
+        assert master.exitcode == 0
+        assert not alive(second["pid"])
+    finally:
+        if master.is_alive():
+            master.kill()
@@ -15,73 +15,57 @@
     You should have received a copy of the GNU General Public License
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
-import voluptuous as vol
-from .types import Enum, number, boolean, integer, WeatherAnswer
-
-
-class Rate(Enum):
-    "Тариф доступа. Возможные значения: "
-    VALUES = (
-        "informers",  # тариф «Погода на Вашем сайте»
-        "forecast"    # тариф «Тестовый»
-    )
-
-
-class Language(Enum):
-    "Язык ответа"
-    VALUES = (
-        "ru_RU",  # русский язык для домена России
-        "ru_UA",  # русский язык для домена Украины
-        "uk_UA",  # украинский язык для домена Украины
-        "be_BY",  # белорусский язык для домена Беларуси
-        "kk_KZ",  # казахский язык для домена Казахстана
-        "tr_TR",  # турецкий язык для домена Турции
-        "en_US"   # международный английский
-    )
-
-
-def stringify(schema):
-    "Проверяет схему и преобразует полученное значение в строку"
-    return lambda x: str(schema(x))
-
-
-def lowcase_str_boolean(obj):
-    "Делает из obj строку `true` или `false`"
-    if isinstance(obj, str):
-        if obj not in ["true", "false"]:
-            raise RuntimeError(
-                'Expecting "true" or "false", got {}'.format(obj))
-        return obj
-    return str(bool(obj)).lower()
-
-
-ARGS_SCHEMA = vol.Schema({
-    vol.Required("lat"): stringify(number),       # широта
-    vol.Required("lon"): stringify(number),       # долгота
-    vol.Optional("lang"): stringify(Language.validate)  # язык ответа
-})
-
-
-ARGS_FORECAST_SCHEMA = ARGS_SCHEMA.extend({
-    vol.Optional("limit"): stringify(integer),  # срок прогноза
-    vol.Optional("hours"): lowcase_str_boolean,  # наличие почасового прогноза
-    vol.Optional("extra"): lowcase_str_boolean   # подробный прогноз осадков
-})
-
-
-def validate_args(api_key, *, rate="informers", **kwargs):
-    "Проверяет и формирует аргументы для запроса"
-    rate = Rate.validate(rate)
-    headers = {"X-Yandex-API-Key": api_key}
-    url = "https://api.weather.yandex.ru/v1/{}".format(rate)
-    if rate == "informers":
-        params = ARGS_SCHEMA(kwargs)
-    else:
-        params = ARGS_FORECAST_SCHEMA(kwargs)
-    return (url,), {"headers": headers, "params": params}
+from collections import namedtuple
+from importlib import import_module
+from time import perf_counter
+from .cache import AnswerCache, request_key
+from . import metrics
+from .retry import DEFAULT_RETRY
+
+# Имена, которые загружаются при первом обращении, чтобы импорт пакета
+# не тянул за собой voluptuous, box, asyncio и sqlite3.
+_LAZY = {
+    "Rate": ".args",
+    "Language": ".args",
+    "stringify": ".args",
+    "lowcase_str_boolean": ".args",
+    "ARGS_SCHEMA": ".args",
+    "ARGS_FORECAST_SCHEMA": ".args",
+    "validate_args": ".args",
+    "validate_params": ".args",
+    "Enum": ".types",
+    "number": ".types",
+    "boolean": ".types",
+    "integer": ".types",
+    "WeatherAnswer": ".types",
+    "DiskCache": ".diskcache",
+    "SingleFlight": ".singleflight",
+    "WeatherClient": ".client",
+    "RetryPolicy": ".retry",
+    "UpstreamError": ".retry",
+    "DeadlineExceeded": ".retry",
+    "NearbyCache": ".spatial",
+    "SpatialIndex": ".spatial",
+    "QuotaScheduler": ".scheduler",
+    "QuotaExceeded": ".scheduler",
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
 
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
 
-def get(session, api_key, **kwargs):
+
+def get(session, api_key, *, cache=None, retry=DEFAULT_RETRY, **kwargs):
     """
     Выполняет доступ к API.
 
@@ -89,6 +73,9 @@ def get(session, api_key, **kwargs):
     api_key - строка ключа доступа к API
     rate - тариф, может быть `informers` или `forecast`
     lat, lon - широта и долгота
+    cache - необязательный кэш ответов `AnswerCache` или `DiskCache`
+    retry - `RetryPolicy`: время ожидания, повторы, дублирование запросов
+        и общее время вызова; None - один запрос без ограничения времени
 
     ```
     import yandex_weather_api
@@ -97,12 +84,51 @@ def get(session, api_key, **kwargs):
     yandex_weather_api.get(req, "ЗАМЕНИ_МЕНЯ_КЛЮЧОМ", lat=55.10, lon=60.10)
     ```
     """
+    from .args import validate_args
     args, kwargs = validate_args(api_key, **kwargs)
-    resp = session.get(*args, **kwargs)
-    return WeatherAnswer.validate(resp.json())
+    return fetch_answer(session, args, kwargs, cache, retry)
+
 
+def fetch_answer(session, args, kwargs, cache=None, retry=None):
+    """
+    Выполняет session.get(*args, **kwargs) и проверяет ответ.
 
-async def async_get(session, api_key, **kwargs):
+    args и kwargs - готовые аргументы запроса, как их возвращает
+    `validate_args`; retry - необязательная `RetryPolicy`.
+    """
+    from .types import WeatherAnswer
+    validate = metrics.timed("validate_seconds", WeatherAnswer.validate)
+
+    def send(timeout=None):
+        options = kwargs if timeout is None else dict(kwargs, timeout=timeout)
+        resp = session.get(*args, **options)
+        return resp if retry is None else retry.check(resp)
+
+    def request():
+        return send() if retry is None else retry.call(send)
+
+    def fetch():
+        if not metrics.HOOKS:
+            return request().json()
+        start = perf_counter()
+        try:
+            resp = request()
+        except Exception:
+            if retry is None:
+                metrics.emit("upstream_errors_total")
+            raise
+        received = perf_counter()
+        metrics.emit("network_seconds", received - start)
+        data = resp.json()
+        metrics.emit("decode_seconds", perf_counter() - received)
+        return data
+    if cache is None:
+        return validate(fetch())
+    return cache.fetch(cache.key(args, kwargs), fetch, validate)
+
+
+async def async_get(session, api_key, *, cache=None, flight=None,
+                    retry=DEFAULT_RETRY, refresh=False, **kwargs):
     """
     Выполняет асинхронный доступ к API.
 
@@ -110,7 +136,152 @@ async def async_get(session, api_key, **kwargs):
     api_key - строка ключа доступа к API
     rate - тариф, может быть `informers` или `forecast`
     lat, lon - широта и долгота
+    cache - необязательный кэш ответов `AnswerCache` или `DiskCache`
+    flight - необязательный `SingleFlight` для объединения одинаковых
+        одновременных запросов
+    retry - `RetryPolicy`, как у `get`
+    refresh - запросить ответ у API, не заглядывая в cache, и сохранить
+        его во всех уровнях кэша (см. `AnswerCache.async_refresh`)
     """
+    # pylint: disable=too-many-arguments
+    from .args import validate_args
+    from .types import WeatherAnswer
     args, kwargs = validate_args(api_key, **kwargs)
-    resp = await session.get(*args, **kwargs)
-    return WeatherAnswer.validate(await resp.json())
+    validate = metrics.timed("validate_seconds", WeatherAnswer.validate)
+
+    async def send(timeout=None):
+        options = kwargs
+        if timeout is not None:
+            from .retry import client_timeout
+            options = dict(kwargs, timeout=client_timeout(timeout))
+        resp = await session.get(*args, **options)
+        try:
+            if retry is not None:
+                retry.check(resp)
+            # тело читается в попытке: время ожидания, повторы и дубли
+            # охватывают весь ответ, а json() измеряет только разбор
+            await resp.read()
+        except BaseException:
+            # возвращаем соединение в пул и при отмене дубля
+            resp.release()
+            raise
+        return resp
+
+    async def request():
+        return await (send() if retry is None else retry.async_call(send))
+
+    async def fetch():
+        if not metrics.HOOKS:
+            resp = await request()
+            return await resp.json()
+        start = perf_counter()
+        try:
+            resp = await request()
+        except Exception:
+            if retry is None:
+                metrics.emit("upstream_errors_total")
+            raise
+        received = perf_counter()
+        metrics.emit("network_seconds", received - start)
+        data = await resp.json()
+        metrics.emit("decode_seconds", perf_counter() - received)
+        return data
+
+    async def fetch_answer():
+        return validate(await fetch())
+    if cache is None:
+        if flight is None:
+            return await fetch_answer()
+        return await flight.run(request_key(args, kwargs), fetch_answer)
+    key = cache.key(args, kwargs)
+    load = cache.async_refresh if refresh else cache.async_fetch
+    if flight is None:
+        return await load(key, fetch, validate)
+    return await flight.run(key, lambda: load(key, fetch, validate))
+
+
+BatchResult = namedtuple("BatchResult", ("request", "answer", "error"))
+BatchResult.__doc__ = """
+Результат одного запроса из `async_get_many`: исходные аргументы request,
+ответ answer или исключение error (одно из двух равно None).
+"""
+
+
+async def async_get_many(session, api_key, requests, *, limit=10,
+                         cache=None, flight=None):
+    """
+    Выполняет асинхронный доступ к API для многих точек сразу.
+
+    session - экземпляр объекта ClientSession из aiohttp
+    api_key - строка ключа доступа к API
+    requests - итерируемый (или асинхронно итерируемый) набор словарей
+        с аргументами `async_get` (lat, lon, rate, lang и т.д.); он
+        читается по мере выполнения запросов
+    limit - максимальное число одновременных запросов
+    cache - необязательный кэш ответов `AnswerCache` или `DiskCache`
+    flight - необязательный `SingleFlight`, общий для нескольких вызовов
+
+    Одинаковые одновременные запросы объединяются в один. Результаты
+    `BatchResult` выдаются по мере готовности; ошибка одного запроса
+    не прерывает остальные. Ошибка чтения requests выдаётся результатом
+    с request, равным None.
+
+    ```
+    points = [{"lat": 55.75, "lon": 37.62}, {"lat": 59.94, "lon": 30.31}]
+    async for result in async_get_many(session, "КЛЮЧ", points):
+        print(result.request, result.answer or result.error)
+    ```
+    """
+    # pylint: disable=too-many-arguments
+    import asyncio
+    from .singleflight import SingleFlight
+    if flight is None:
+        flight = SingleFlight()
+    results = asyncio.Queue(maxsize=limit)  # type: asyncio.Queue
+    done = object()
+    if hasattr(requests, "__aiter__"):
+        items = requests.__aiter__()
+        lock = asyncio.Lock()
+
+        async def take():
+            async with lock:
+                try:
+                    return await items.__anext__()
+                except StopAsyncIteration:
+                    return done
+    else:
+        items = iter(requests)
+
+        async def take():
+            return next(items, done)
+
+    async def worker():
+        while True:
+            try:
+                item = await take()
+            except Exception as error:  # pylint: disable=broad-except
+                await results.put(BatchResult(None, None, error))
+                break
+            if item is done:
+                break
+            try:
+                answer = await async_get(
+                    session, api_key, cache=cache, flight=flight, **item)
+            except Exception as error:  # pylint: disable=broad-except
+                await results.put(BatchResult(item, None, error))
+            else:
+                await results.put(BatchResult(item, answer, None))
+        await results.put(None)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(limit)]
+    try:
+        running = len(workers)
+        while running:
+            result = await results.get()
+            if result is None:
+                running -= 1
+            else:
+                yield result
+    finally:
+        for task in workers:
+            task.cancel()
@@ -0,0 +1,105 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import os
+
+import voluptuous as vol
+from .types import Enum, number, integer
+
+
+class Rate(Enum):
+    "Тариф доступа. Возможные значения: "
+    VALUES = (
+        "informers",  # тариф «Погода на Вашем сайте»
+        "forecast"    # тариф «Тестовый»
+    )
+
+
+class Language(Enum):
+    "Язык ответа"
+    VALUES = (
+        "ru_RU",  # русский язык для домена России
+        "ru_UA",  # русский язык для домена Украины
+        "uk_UA",  # украинский язык для домена Украины
+        "be_BY",  # белорусский язык для домена Беларуси
+        "kk_KZ",  # казахский язык для домена Казахстана
+        "tr_TR",  # турецкий язык для домена Турции
+        "en_US"   # международный английский
+    )
+
+
+def stringify(schema):
+    "Проверяет схему и преобразует полученное значение в строку"
+    return lambda x: str(schema(x))
+
+
+def lowcase_str_boolean(obj):
+    "Делает из obj строку `true` или `false`"
+    if isinstance(obj, str):
+        if obj not in ["true", "false"]:
+            raise RuntimeError(
+                'Expecting "true" or "false", got {}'.format(obj))
+        return obj
+    return str(bool(obj)).lower()
+
+
+ARGS_SCHEMA = vol.Schema({
+    vol.Required("lat"): stringify(number),       # широта
+    vol.Required("lon"): stringify(number),       # долгота
+    vol.Optional("lang"): stringify(Language.validate)  # язык ответа
+})
+
+
+ARGS_FORECAST_SCHEMA = ARGS_SCHEMA.extend({
+    vol.Optional("limit"): stringify(integer),  # срок прогноза
+    vol.Optional("hours"): lowcase_str_boolean,  # наличие почасового прогноза
+    vol.Optional("extra"): lowcase_str_boolean   # подробный прогноз осадков
+})
+
+
+# Адрес API можно заменить, например, на локальную заглушку
+# (подкоманда `stub`, см. `yandex_weather_api.stub`)
+BASE_URL = os.environ.get("YANDEX_WEATHER_API_URL",
+                          "https://api.weather.yandex.ru")
+URL = BASE_URL + "/v1/{}"
+
+
+def rate_url(rate, base_url=None):
+    "Адрес тарифа rate на сервере base_url (по умолчанию BASE_URL)"
+    if base_url is None:
+        return URL.format(rate)
+    return base_url.rstrip("/") + "/v1/" + rate
+
+
+def validate_params(rate, kwargs):
+    "Проверяет аргументы запроса kwargs для уже проверенного тарифа rate"
+    if rate == "informers":
+        return ARGS_SCHEMA(kwargs)
+    return ARGS_FORECAST_SCHEMA(kwargs)
+
+
+def validate_args(api_key, *, rate="informers", base_url=None, **kwargs):
+    """
+    Проверяет и формирует аргументы для запроса
+
+    base_url - необязательный адрес сервера API вместо BASE_URL
+    """
+    rate = Rate.validate(rate)
+    headers = {"X-Yandex-API-Key": api_key}
+    url = rate_url(rate, base_url)
+    params = validate_params(rate, kwargs)
+    return (url,), {"headers": headers, "params": params}
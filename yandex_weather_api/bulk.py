@@ -0,0 +1,205 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import csv
+import json
+from collections import deque
+
+from . import BatchResult
+from .types import json_default
+
+# Колонки входного файла, которые передаются в запрос к API
+REQUEST_COLUMNS = ("lat", "lon", "lang", "limit", "hours", "extra")
+
+DEFAULT_COLUMNS = ("fact.temp", "fact.feels_like", "fact.condition",
+                   "fact.wind_speed", "fact.wind_dir", "fact.pressure_mm",
+                   "fact.humidity")
+
+
+class RowError(ValueError):
+    """
+    Строку входного файла нельзя прочитать.
+
+    line - номер строки, point - поля, которые удалось разобрать
+    """
+    def __init__(self, line, reason, point=None):
+        super().__init__("line {}: {}".format(line, reason))
+        self.line = line
+        self.point = point if point is not None else {}
+
+
+def read_points(lines):
+    """
+    Читает точки из строк CSV (например, из открытого файла).
+
+    Если первая строка содержит колонки lat и lon, она считается
+    заголовком, иначе первые два поля строки - широта и долгота. Строки
+    без запятых разбиваются по пробелам. Возвращает генератор словарей
+    колонка -> значение; пустые строки и строки, начинающиеся с #,
+    пропускаются.
+
+    Вместо строки, которую нельзя разобрать, выдаётся `RowError`
+    с её номером; чтение продолжается со следующей строки. Файл стоит
+    открывать с errors="surrogateescape", тогда байты не из UTF-8
+    тоже сообщаются как ошибка строки.
+    """
+    header = None
+    reader = csv.reader(lines)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as error:
+            yield RowError(reader.line_num, error)
+            continue
+        if len(row) == 1:
+            row = row[0].split()
+        row = [field.strip() for field in row]
+        if not row or row[0].startswith("#"):
+            continue
+        invalid = any(_undecoded(field) for field in row)
+        if invalid:
+            row = [field.encode("utf-8", "surrogateescape").decode(
+                "utf-8", "replace") for field in row]
+        if header is None:
+            if "lat" in row and "lon" in row and not invalid:
+                header = row
+                continue
+            header = ["lat", "lon"] + [
+                "column{}".format(number) for number in range(3, len(row) + 1)]
+        point = dict(zip(header, row))
+        if invalid:
+            yield RowError(reader.line_num, "invalid UTF-8", point)
+        else:
+            yield point
+
+
+def _undecoded(field):
+    "Истинно, если в field остались байты, не декодированные из UTF-8"
+    return any("\udc80" <= char <= "\udcff" for char in field)
+
+
+def request_args(point):
+    "Аргументы `WeatherClient.get` из колонок точки point"
+    return {key: value for key, value in point.items()
+            if key in REQUEST_COLUMNS and value != ""}
+
+
+def column_getter(path):
+    """
+    Функция, которая достаёт из ответа поле по пути path
+    ("fact.temp", "forecasts.0.parts.day.temp_avg"); None, если поля нет.
+    """
+    names = path.split(".")
+
+    def get(answer):
+        value = answer
+        for name in names:
+            try:
+                if isinstance(value, (list, tuple)) or name.isdigit():
+                    value = value[int(name)]
+                else:
+                    value = value[name]
+            except (KeyError, IndexError, TypeError, ValueError):
+                return None
+        return value
+    return get
+
+
+def _plain(value):
+    "Значение для CSV: перечисления и числа - строкой, объекты - JSON"
+    if value is None:
+        return ""
+    if isinstance(value, (str, int, float, bool)):
+        return str(value)
+    return json.dumps(value, default=json_default, ensure_ascii=False)
+
+
+def fetch_points(client, points, *, workers=None):
+    """
+    Получает ответы для точек points через `WeatherClient.get_many`.
+
+    Возвращает генератор пар (точка, `BatchResult`) в порядке
+    готовности; points читается постепенно. `RowError` из points
+    выдаётся сразу результатом с этой ошибкой, без запроса к API.
+    """
+    pending = {}  # type: dict
+    invalid = deque()  # type: deque
+
+    def requests():
+        for point in points:
+            if isinstance(point, RowError):
+                invalid.append((point.point, BatchResult(None, None, point)))
+                continue
+            args = request_args(point)
+            pending[id(args)] = point
+            yield args
+
+    for result in client.get_many(requests(), workers=workers):
+        while invalid:
+            yield invalid.popleft()
+        yield pending.pop(id(result.request), {}), result
+    while invalid:
+        yield invalid.popleft()
+
+
+def write_csv(results, target, columns=DEFAULT_COLUMNS):
+    """
+    Пишет пары (точка, `BatchResult`) в target в формате CSV.
+
+    Колонки: колонки первой точки (всегда с lat и lon), затем columns
+    из ответа и error. Каждая строка записывается сразу.
+    """
+    getters = [column_getter(column) for column in columns]
+    writer = None
+    for point, result in results:
+        if writer is None:
+            inputs = [column for column in ("lat", "lon")
+                      if column not in point] + list(point)
+            writer = csv.writer(target)
+            writer.writerow(inputs + list(columns) + ["error"])
+        row = [point.get(column, "") for column in inputs]
+        if result.error is None:
+            row += [_plain(get(result.answer)) for get in getters]
+            row.append("")
+        else:
+            row += [""] * len(getters)
+            row.append(str(result.error) or type(result.error).__name__)
+        writer.writerow(row)
+        target.flush()
+
+
+def write_jsonl(results, target, columns=None):
+    """
+    Пишет пары (точка, `BatchResult`) в target в формате JSONL.
+
+    Объект строки - колонки точки и либо columns из ответа (весь ответ
+    в "answer", если columns не заданы), либо "error".
+    """
+    getters = [(column, column_getter(column)) for column in columns or ()]
+    for point, result in results:
+        line = dict(point)
+        if result.error is not None:
+            line["error"] = str(result.error) or type(result.error).__name__
+        elif getters:
+            line.update((column, get(result.answer)) for column, get in getters)
+        else:
+            line["answer"] = result.answer
+        target.write(json.dumps(line, default=json_default, ensure_ascii=False))
+        target.write("\n")
+        target.flush()
@@ -0,0 +1,246 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from . import metrics
+
+
+def request_key(args, kwargs):
+    "Ключ запроса из результата `validate_args` без ключа доступа к API"
+    return args + tuple(sorted(kwargs["params"].items()))
+
+
+def quantise(kwargs, precision):
+    "Округляет lat и lon в kwargs[\"params\"] до precision знаков на месте"
+    if precision is not None:
+        params = kwargs["params"]
+        for name in ("lat", "lon"):
+            params[name] = str(round(float(params[name]), precision))
+
+
+class _Entry:
+    "Запись кэша: ответ, время получения и признак идущего обновления"
+    __slots__ = ("answer", "fetched", "refreshing")
+
+    def __init__(self, answer, fetched):
+        self.answer = answer
+        self.fetched = fetched
+        self.refreshing = False
+
+
+class AnswerCache:
+    """
+    Кэш ответов API в памяти процесса.
+
+    maxsize - максимальное число ответов, лишние вытесняются по LRU
+    ttl - время (в секундах), в течение которого ответ считается свежим
+    stale - время после истечения ttl, в течение которого вызывающему
+        сразу отдаётся устаревший ответ, а в фоне запускается одно
+        обновление (stale-while-revalidate); 0 отключает
+    precision - число знаков после запятой, до которого округляются
+        широта и долгота; None отключает округление
+    backend - необязательный следующий уровень кэша (например,
+        `DiskCache`), к которому обращается этот кэш при промахе; ответ
+        из backend живёт здесь не дольше, чем в backend
+
+    Координаты округляются и в ключе, и в самом запросе к API, поэтому
+    ответ в кэше не зависит от того, какая из близких точек его получила.
+
+    ```
+    cache = yandex_weather_api.AnswerCache(ttl=600, precision=2)
+    yandex_weather_api.get(req, "КЛЮЧ", lat=55.10, lon=60.10, cache=cache)
+    ```
+    """
+    def __init__(self, maxsize=1024, ttl=600, stale=0, precision=2,
+                 clock=time.monotonic, backend=None):
+        # pylint: disable=too-many-arguments
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale = stale
+        self.precision = precision
+        self.clock = clock
+        self.backend = backend
+        self._entries = OrderedDict()  # type: OrderedDict
+        self._lock = threading.Lock()
+        self._tasks = set()  # type: set
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, args, kwargs):
+        """
+        Строит ключ кэша из результата `validate_args`.
+
+        Округляет lat и lon в kwargs["params"] на месте.
+        """
+        quantise(kwargs, self.precision)
+        return request_key(args, kwargs)
+
+    def lookup(self, key):
+        """
+        Возвращает пару (ответ, нужно_обновить).
+
+        Ответ равен None, если его нет в кэше или он устарел сильнее,
+        чем допускает stale. нужно_обновить истинно для устаревшего
+        ответа, обновление которого ещё не запущено; вызывающий обязан
+        запустить обновление и вызвать `store` или `release`.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, False
+            age = self.clock() - entry.fetched
+            if age < self.ttl:
+                self._entries.move_to_end(key)
+                return entry.answer, False
+            if age >= self.ttl + self.stale:
+                del self._entries[key]
+                return None, False
+            self._entries.move_to_end(key)
+            if entry.refreshing:
+                return entry.answer, False
+            entry.refreshing = True
+            return entry.answer, True
+
+    def expires_in(self, key):
+        """
+        Время (в секундах) до истечения ttl ответа с ключом key.
+
+        Отрицательно для устаревших ответов, None - если ответа нет.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return entry.fetched + self.ttl - self.clock()
+
+    def store(self, key, answer, expires_in=None):
+        """
+        Сохраняет ответ answer под ключом key.
+
+        expires_in - сколько секунд ответу осталось жить в backend; ответ
+        не живёт в этом кэше дольше, чем там.
+        """
+        fetched = self.clock()
+        if expires_in is not None and expires_in < self.ttl:
+            fetched -= self.ttl - expires_in
+        with self._lock:
+            self._entries[key] = _Entry(answer, fetched)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def release(self, key):
+        "Снимает признак обновления после неудачной попытки"
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.refreshing = False
+
+    def clear(self):
+        "Очищает кэш"
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def _count(answer, refresh):
+        if answer is None:
+            metrics.emit("cache_misses_total")
+        elif refresh:
+            metrics.emit("cache_stale_total")
+        else:
+            metrics.emit("cache_hits_total")
+
+    def _load(self, key, fetch, validate):
+        "Пара (ответ, секунд до истечения в backend или None)"
+        if self.backend is not None:
+            return self.backend.fetch_entry(key, fetch, validate)
+        return validate(fetch()), None
+
+    async def _async_load(self, key, fetch, validate):
+        if self.backend is not None:
+            return await self.backend.async_fetch_entry(key, fetch, validate)
+        return validate(await fetch()), None
+
+    def _refresh(self, key, fetch, validate):
+        try:
+            self.store(key, *self._load(key, fetch, validate))
+        except Exception:  # pylint: disable=broad-except
+            self.release(key)
+
+    async def _async_refresh(self, key, fetch, validate):
+        try:
+            self.store(key, *await self._async_load(key, fetch, validate))
+        except Exception:  # pylint: disable=broad-except
+            self.release(key)
+
+    def fetch(self, key, fetch, validate):
+        """
+        Возвращает ответ из кэша или получает его как validate(fetch()).
+
+        fetch возвращает необработанный JSON-ответ API, validate
+        превращает его в ответ. Фоновое обновление выполняется
+        в отдельном потоке.
+        """
+        answer, refresh = self.lookup(key)
+        if metrics.HOOKS:
+            self._count(answer, refresh)
+        if refresh:
+            threading.Thread(
+                target=self._refresh, args=(key, fetch, validate), daemon=True
+            ).start()
+        if answer is not None:
+            return answer
+        answer, expires_in = self._load(key, fetch, validate)
+        self.store(key, answer, expires_in)
+        return answer
+
+    async def async_refresh(self, key, fetch, validate):
+        """
+        Получает ответ заново как validate(await fetch()), не заглядывая
+        в кэш, и сохраняет его и здесь, и в backend.
+        """
+        if self.backend is not None:
+            answer = await self.backend.async_refresh(key, fetch, validate)
+        else:
+            answer = validate(await fetch())
+        self.store(key, answer)
+        return answer
+
+    async def async_fetch(self, key, fetch, validate):
+        """
+        Возвращает ответ из кэша или получает его как
+        validate(await fetch()).
+
+        Фоновое обновление выполняется отдельной задачей asyncio.
+        """
+        import asyncio
+        answer, refresh = self.lookup(key)
+        if metrics.HOOKS:
+            self._count(answer, refresh)
+        if refresh:
+            task = asyncio.ensure_future(
+                self._async_refresh(key, fetch, validate))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if answer is not None:
+            return answer
+        answer, expires_in = await self._async_load(key, fetch, validate)
+        self.store(key, answer, expires_in)
+        return answer
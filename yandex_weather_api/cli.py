@@ -17,12 +17,14 @@
 """
 # pylint: disable=no-name-in-module,arguments-differ
 import os
+from functools import partial
+from time import perf_counter
 from textwrap import dedent
 from pprint import pprint
-import requests
 import plumbum.cli
-from plumbum.colors import green
-from . import get, async_get
+from . import async_get, AnswerCache
+from .metrics import HOOKS, MetricsRegistry, add_hook, remove_hook, emit
+from .retry import DEFAULT_RETRY, RetryPolicy
 
 
 class Weather(plumbum.cli.Application):
@@ -43,12 +45,85 @@ class WeatherCli(plumbum.cli.Application):
     содержащая ключ доступа к API.
     Также можно указать переменную среды YANDEX_WEATHER_RATE=forecast, если вы
     используете тариф "Тестовый".
+    С ключом --cache-file ответы сохраняются в файловый кэш, общий
+    для всех процессов, использующих тот же файл.
+    Без lat и lon или с ключом --input точки читаются из файла CSV
+    (или стандартного ввода): колонки lat и lon с заголовком или без,
+    колонки lang, limit и hours передаются в запрос, остальные
+    повторяются в выводе. Ответы запрашиваются одновременно через общий
+    пул соединений и выводятся в формате CSV или JSONL по мере готовности;
+    --columns выбирает поля ответа, например fact.temp,fact.condition.
     """
-    def main(self, lat, lon):
-        # pylint: disable=invalid-name
+    cache_file = plumbum.cli.SwitchAttr(
+        "--cache-file", str, default=None,
+        help="Файл SQLite для кэша ответов, общего для нескольких процессов")
+    ttl = plumbum.cli.SwitchAttr(
+        "--ttl", float, default=600,
+        help="Время жизни ответа в файловом кэше, в секундах")
+    input_file = plumbum.cli.SwitchAttr(
+        ["-i", "--input"], str, default=None,
+        help="Файл CSV с точками, \"-\" - стандартный ввод")
+    output = plumbum.cli.SwitchAttr(
+        ["-o", "--output"], str, default="-",
+        help="Файл для результата, \"-\" - стандартный вывод")
+    output_format = plumbum.cli.SwitchAttr(
+        "--format", plumbum.cli.Set("csv", "jsonl"), default="csv",
+        help="Формат вывода для многих точек")
+    columns = plumbum.cli.SwitchAttr(
+        "--columns", str, default=None,
+        help="Поля ответа через запятую, например fact.temp,fact.condition")
+    workers = plumbum.cli.SwitchAttr(
+        "--workers", int, default=10,
+        help="Число одновременных запросов для многих точек")
+
+    def client(self, pool_size):
+        "`WeatherClient` с настройками из переменных среды и ключей"
+        from .client import WeatherClient
+        from .diskcache import DiskCache
         api_key = os.environ.get("YANDEX_API_KEY")
         rate = os.environ.get("YANDEX_WEATHER_RATE", "informers")
-        w = get(requests, api_key, rate=rate, lat=lat, lon=lon, limit=2)
+        cache = None
+        if self.cache_file is not None:
+            cache = DiskCache(self.cache_file, ttl=self.ttl)
+        return WeatherClient(api_key, rate, pool_size=pool_size, cache=cache)
+
+    def bulk(self):
+        "Ответы для многих точек из --input"
+        import io
+        import sys
+        from . import bulk
+        if self.input_file in (None, "-"):
+            source = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8",
+                                      errors="surrogateescape", newline="")
+        else:
+            source = open(self.input_file, encoding="utf-8",
+                          errors="surrogateescape", newline="")
+        target = sys.stdout if self.output == "-" \
+            else open(self.output, "w", newline="")
+        columns = self.columns.split(",") if self.columns else None
+        try:
+            with self.client(self.workers) as client:
+                results = bulk.fetch_points(client, bulk.read_points(source))
+                if self.output_format == "jsonl":
+                    bulk.write_jsonl(results, target, columns)
+                else:
+                    bulk.write_csv(results, target,
+                                   columns or bulk.DEFAULT_COLUMNS)
+        finally:
+            if self.input_file in (None, "-"):
+                source.detach()
+            else:
+                source.close()
+            if target is not sys.stdout:
+                target.close()
+
+    def main(self, lat=None, lon=None):
+        # pylint: disable=invalid-name
+        if self.input_file is not None or lat is None:
+            return self.bulk()
+        from plumbum.colors import green
+        with self.client(1) as client:
+            w = client.get(lat=lat, lon=lon, limit=2)
         pprint(w)
         temp = green | (str(w.fact.temp) + '°C')
         print(dedent(f"""
@@ -61,12 +136,13 @@ class WeatherCli(plumbum.cli.Application):
         """).strip())
 
 
-def setup_client(app):
+def setup_client(app, session_factory=None):
     # pylint: disable=missing-docstring
-    from aiohttp import ClientSession
+    if session_factory is None:
+        from aiohttp import ClientSession as session_factory
 
     async def on_startup(app):
-        app["client_session"] = ClientSession()
+        app["client_session"] = session_factory()
 
     async def on_shutdown(app):
         await app["client_session"].close()
@@ -75,37 +151,578 @@ def setup_client(app):
     app.on_shutdown.append(on_shutdown)
 
 
+def setup_prefetcher(app, prefetcher):
+    # pylint: disable=missing-docstring
+    async def on_startup(app):
+        session = app["client_session"]
+        if "scheduler" in app:
+            session = app["scheduler"].session(
+                session, app["scheduler"].BULK, low_quota="drop")
+        prefetcher.start(session)
+
+    async def on_shutdown(app):  # pylint: disable=unused-argument
+        await prefetcher.stop()
+
+    app["prefetcher"] = prefetcher
+    app.on_startup.append(on_startup)
+    app.on_shutdown.insert(0, on_shutdown)
+
+
+def setup_metrics(app, registry):
+    # pylint: disable=missing-docstring
+    from aiohttp import web
+
+    async def on_startup(app):  # pylint: disable=unused-argument
+        add_hook(registry)
+
+    async def on_cleanup(app):  # pylint: disable=unused-argument
+        remove_hook(registry)
+
+    async def handler(request):  # pylint: disable=unused-argument
+        return web.Response(text=registry.render(),
+                            content_type="text/plain", charset="utf-8")
+
+    app["metrics"] = registry
+    app.router.add_get("/metrics", handler)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+
+
+def setup_scheduler(app, scheduler):
+    # pylint: disable=missing-docstring
+    from aiohttp import web
+
+    async def handler(request):  # pylint: disable=unused-argument
+        return web.json_response(scheduler.usage())
+
+    app["scheduler"] = scheduler
+    app.router.add_get("/quota", handler)
+
+
+QUERY_ARGS = ("lat", "lon", "lang", "limit", "hours")
+
+
+def setup_batch(app, api_key, upstream, defaults, limit):
+    """
+    Добавляет обработчик POST /batch.
+
+    Тело запроса - JSON-массив объектов с аргументами QUERY_ARGS или
+    NDJSON (Content-Type: application/x-ndjson). NDJSON читается по мере
+    выполнения запросов, JSON-массив - целиком. Ответ - NDJSON: по строке
+    {"index", "request", "answer"} или {"index", "request", "error"}
+    на каждый объект в порядке готовности, не больше limit запросов к API
+    одновременно. upstream - аргументы rate, base_url и retry для
+    `async_get`.
+    """
+    # pylint: disable=too-many-arguments
+    import asyncio
+    import json
+    from aiohttp import web
+    from . import async_get_many
+    from .encoded import dumps
+
+    def check(item):
+        "Ошибка в объекте item или None"
+        if not isinstance(item, dict):
+            return "batch item must be an object"
+        unknown = set(item) - set(QUERY_ARGS)
+        if unknown:
+            return "unknown arguments: " + ", ".join(sorted(unknown))
+        return None
+
+    async def read_ndjson(request):
+        "Пары (объект, ошибка разбора) из строк тела запроса"
+        async for line in request.content:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line), None
+            except ValueError as err:
+                yield (line.decode("utf-8", "replace").strip(),
+                       "invalid JSON: {}".format(err))
+
+    async def read_array(items):
+        for item in items:
+            yield item, None
+
+    async def handler(request):
+        if request.content_type == "application/x-ndjson":
+            items = read_ndjson(request)
+        else:
+            try:
+                body = await request.json()
+            except ValueError as err:
+                raise web.HTTPBadRequest(text="invalid JSON: {}".format(err))
+            if not isinstance(body, list):
+                raise web.HTTPBadRequest(text="batch must be a JSON array")
+            items = read_array(body)
+        session = request.app["client_session"]
+        if "scheduler" in request.app:
+            session = request.app["scheduler"].session(session)
+        response = web.StreamResponse(
+            headers={"Content-Type": "application/x-ndjson; charset=utf-8"})
+        await response.prepare(request)
+        lock = asyncio.Lock()
+        pending = {}  # type: dict
+
+        async def write(line):
+            async with lock:
+                await response.write(dumps(line) + b"\n")
+
+        async def requests():
+            "Аргументы async_get_many; ошибки в объектах пишутся сразу"
+            index = 0
+            async for item, error in items:
+                error = error or check(item)
+                if error is None:
+                    params = dict(defaults, **upstream, **item)
+                    pending[id(params)] = (index, item)
+                    yield params
+                else:
+                    await write({"index": index, "request": item,
+                                 "error": error})
+                index += 1
+
+        results = async_get_many(
+            session, api_key, requests(), limit=limit,
+            cache=request.app["answer_cache"], flight=request.app["flight"])
+        try:
+            async for result in results:
+                if result.request is None:
+                    line = {"error": str(result.error)}
+                else:
+                    index, item = pending.pop(id(result.request))
+                    line = {"index": index, "request": item}
+                    if result.error is not None:
+                        line["error"] = str(result.error) \
+                            or type(result.error).__name__
+                    else:
+                        line["answer"] = result.answer
+                await write(line)
+        finally:
+            await results.aclose()
+        await response.write_eof()
+        return response
+
+    app.router.add_post("/batch", handler)
+
+
+def make_app(api_key, rate, lat=None, lon=None, cache=None,
+             session_factory=None, prefetch=None, registry=None,
+             scheduler=None, batch_limit=10, base_url=None, retry=DEFAULT_RETRY):
+    """
+    Создаёт aiohttp-приложение сервера погоды.
+
+    Аргументы запроса lat, lon, lang, limit и hours передаются в API,
+    lat и lon по умолчанию берутся из одноимённых аргументов.
+    Ответы хранятся в общем кэше cache, одинаковые одновременные
+    запросы к API объединяются в один.
+    prefetch - необязательный словарь аргументов `Prefetcher`, включает
+    фоновое обновление популярных ответов.
+    registry - необязательный `MetricsRegistry`, метрики которого
+    отдаются по адресу /metrics в формате Prometheus.
+    Ответы отдаются из заранее закодированных байтов JSON (и их сжатых
+    gzip и brotli вариантов) с ETag; запрос с совпадающим If-None-Match
+    получает 304.
+    POST /batch принимает массив аргументов запроса и возвращает ответы
+    построчно в формате NDJSON, выполняя не больше batch_limit запросов
+    к API одновременно (см. `setup_batch`).
+    base_url - необязательный адрес сервера API (см. `validate_args`).
+    retry - `RetryPolicy` запросов к API: время ожидания, повторы,
+    дублирование медленных запросов и общее время на запрос.
+    scheduler - необязательный `QuotaScheduler`: запросы к API идут
+    через него, запросы клиентов - с приоритетом INTERACTIVE, фоновые
+    обновления - BULK; использование квот отдаётся по адресу /quota.
+    """
+    # pylint: disable=too-many-arguments
+    from aiohttp import web
+    import voluptuous as vol
+    from .args import validate_args
+    from .encoded import EncodedCache, matches, negotiate
+    from .scheduler import QuotaExceeded
+    from .singleflight import SingleFlight
+    routes = web.RouteTableDef()
+    defaults = {key: value for key, value in (("lat", lat), ("lon", lon))
+                if value is not None}
+    upstream = {"rate": rate, "base_url": base_url, "retry": retry}
+
+    @routes.get('/')
+    async def weather(request):  # pylint: disable=unused-variable
+        if not HOOKS:
+            return await respond(request)
+        start = perf_counter()
+        try:
+            return await respond(request)
+        finally:
+            emit("request_seconds", perf_counter() - start)
+
+    async def respond(request):
+        params = dict(defaults)
+        params.update((key, request.query[key])
+                      for key in QUERY_ARGS if key in request.query)
+        try:
+            args, kwargs = validate_args(
+                api_key, rate=rate, base_url=base_url, **params)
+        except (vol.Invalid, ValueError, RuntimeError) as err:
+            raise web.HTTPBadRequest(text=str(err))
+        key = request.app["answer_cache"].key(args, kwargs)
+        if "prefetcher" in request.app:
+            request.app["prefetcher"].touch(key, kwargs["params"])
+        session = request.app["client_session"]
+        if "scheduler" in request.app:
+            session = request.app["scheduler"].session(
+                session, request.app["scheduler"].INTERACTIVE)
+        try:
+            answer = await async_get(
+                session, api_key, **upstream, cache=request.app["answer_cache"],
+                flight=request.app["flight"], **params
+            )
+        except QuotaExceeded as err:
+            raise web.HTTPServiceUnavailable(text=str(err))
+        encoded = request.app["encoded"].get(key, answer)
+        headers = {"ETag": encoded.etag, "Vary": "Accept-Encoding"}
+        if matches(request.headers.get("If-None-Match", ""), encoded.etag):
+            return web.Response(status=304, headers=headers)
+        encoding = negotiate(request.headers.get("Accept-Encoding", ""))
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return web.Response(body=encoded.variant(encoding), headers=headers,
+                            content_type="application/json", charset="utf-8")
+    app = web.Application()
+    app.add_routes(routes)
+    app["answer_cache"] = cache if cache is not None else AnswerCache()
+    app["flight"] = SingleFlight()
+    app["encoded"] = EncodedCache(getattr(app["answer_cache"], "maxsize", 1024))
+    setup_client(app, session_factory)
+    setup_batch(app, api_key, upstream, defaults, batch_limit)
+    if scheduler is not None:
+        setup_scheduler(app, scheduler)
+    if prefetch is not None:
+        from .prefetch import Prefetcher
+        setup_prefetcher(app, Prefetcher(
+            api_key, rate, app["answer_cache"], app["flight"],
+            base_url=base_url, **prefetch))
+    if registry is not None:
+        setup_metrics(app, registry)
+    return app
+
+
+def _run_worker(build, number, port):
+    "Процесс-обработчик: приложение build(number) на общем порте"
+    import signal
+    from aiohttp import web
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    web.run_app(build(number), port=port, reuse_port=True,
+                print=None if number else print)
+
+
+def serve_workers(build, port, workers, *, interval=0.5, timeout=30):
+    """
+    Запускает workers процессов сервера на одном порте.
+
+    build(number) создаёт aiohttp-приложение в процессе-обработчике
+    с номером number. Процессы слушают порт с SO_REUSEPORT, и ядро
+    распределяет соединения между ними. Завершившиеся процессы
+    перезапускаются. SIGINT и SIGTERM штатно останавливают обработчики:
+    они дообслуживают открытые запросы, а через timeout секунд
+    завершаются принудительно.
+    """
+    import multiprocessing
+    import signal
+    import socket
+    import time
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise RuntimeError("SO_REUSEPORT is not supported on this platform")
+    context = multiprocessing.get_context("fork")
+    stopping = []
+
+    def stop(signum, frame):  # pylint: disable=unused-argument
+        stopping.append(signum)
+
+    def start(number):
+        process = context.Process(target=_run_worker, args=(build, number, port),
+                                  name="weather-worker-{}".format(number))
+        process.start()
+        return process
+
+    previous = {signum: signal.signal(signum, stop)
+                for signum in (signal.SIGINT, signal.SIGTERM)}
+    processes = [start(number) for number in range(workers)]
+    try:
+        while not stopping:
+            time.sleep(interval)
+            for number, process in enumerate(processes):
+                if not stopping and not process.is_alive():
+                    processes[number] = start(number)
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in processes:
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+
 @Weather.subcommand('server')
 class WeatherWeb(plumbum.cli.Application):
     """
     Интерфейс командной строки для Яндекс.Погоды
 
-    Запускает asyncio сервер на HTTP порте `port`,
-    предоставляющий json-ответ прогноза по точке lat и lon (широта и долгота).
+    Запускает asyncio сервер на HTTP порте --port (по умолчанию 8000),
+    предоставляющий json-ответ прогноза по точке, заданной аргументами
+    запроса lat и lon (широта и долгота), а также lang, limit и hours.
+    Если lat и lon не указаны в запросе, используются аргументы lat и lon.
+    Ответы кэшируются на время --ttl секунд, популярные ответы можно
+    обновлять в фоне до истечения ttl (--prefetch-rate).
+    По адресу /metrics отдаются метрики в формате Prometheus: время
+    запросов к API, разбора и проверки ответов, попадания в кэш и ошибки.
     В среде выполнения должна быть установлена переменная YANDEX_API_KEY,
-    содержащая ключ доступа к API.
+    содержащая ключ доступа к API или несколько ключей через запятую.
+    С --daily-limit запросы к API распределяются между ключами с учётом
+    их суточных квот, а использование квот отдаётся по адресу /quota.
+    С --workers N сервер запускает N процессов на одном порте. Процессы
+    делят кэш в файле SQLite (--cache-file или временный файл) и суточную
+    квоту поровну; популярные ответы обновляет только первый процесс,
+    метрики каждый процесс собирает свои.
     Также можно указать переменную среды YANDEX_WEATHER_RATE=forecast, если вы
     используете тариф "Тестовый".
     """
-    def main(self, lat, lon, port=8000):
-        api_key = os.environ.get("YANDEX_API_KEY")
+    ttl = plumbum.cli.SwitchAttr(
+        "--ttl", float, default=600,
+        help="Время жизни ответа в кэше, в секундах")
+    cache_size = plumbum.cli.SwitchAttr(
+        "--cache-size", int, default=1024,
+        help="Максимальное число ответов в кэше")
+    precision = plumbum.cli.SwitchAttr(
+        "--precision", int, default=2,
+        help="Число знаков после запятой при округлении координат")
+    cache_file = plumbum.cli.SwitchAttr(
+        "--cache-file", str, default=None,
+        help="Файл SQLite для кэша ответов, общего для нескольких процессов")
+    prefetch_rate = plumbum.cli.SwitchAttr(
+        "--prefetch-rate", float, default=0,
+        help="Максимум фоновых обновлений популярных ответов в секунду, "
+             "0 отключает обновления")
+    prefetch_lead = plumbum.cli.SwitchAttr(
+        "--prefetch-lead", float, default=30,
+        help="За сколько секунд до истечения ttl обновлять ответ")
+    radius = plumbum.cli.SwitchAttr(
+        "--radius", float, default=0,
+        help="Отвечать на запрос ответом для известного населённого пункта "
+             "в пределах этого расстояния (км), 0 отключает")
+    daily_limit = plumbum.cli.SwitchAttr(
+        "--daily-limit", int, default=0,
+        help="Суточная квота запросов каждого ключа, 0 отключает учёт квот")
+    quota_reserve = plumbum.cli.SwitchAttr(
+        "--quota-reserve", float, default=0.1,
+        help="Доля квоты, которая не тратится на фоновые обновления")
+    timeout = plumbum.cli.SwitchAttr(
+        "--timeout", float, default=10,
+        help="Время ожидания ответа API, в секундах")
+    retries = plumbum.cli.SwitchAttr(
+        "--retries", int, default=2,
+        help="Число повторов запроса к API после сетевой ошибки или 5xx")
+    hedge = plumbum.cli.SwitchAttr(
+        "--hedge", float, default=None,
+        help="Через сколько секунд дублировать медленный запрос к API")
+    deadline = plumbum.cli.SwitchAttr(
+        "--deadline", float, default=None,
+        help="Общее время на запрос к API со всеми повторами, в секундах")
+    port = plumbum.cli.SwitchAttr(
+        ["-p", "--port"], int, default=8000,
+        help="HTTP порт сервера")
+    workers = plumbum.cli.SwitchAttr(
+        "--workers", int, default=1,
+        help="Число процессов сервера на одном порте (SO_REUSEPORT)")
+    no_metrics = plumbum.cli.Flag(
+        "--no-metrics", help="Не собирать метрики и не отдавать /metrics")
+
+    def main(self, lat=None, lon=None):
+        api_keys = os.environ.get("YANDEX_API_KEY", "").split(",")
         rate = os.environ.get("YANDEX_WEATHER_RATE", "informers")
 
+        if self.workers > 1:
+            import tempfile
+            with tempfile.TemporaryDirectory() as path:
+                cache_file = self.cache_file or os.path.join(path, "answers.sqlite")
+                serve_workers(partial(self.build, api_keys, rate, lat, lon, cache_file),
+                              self.port, self.workers)
+        else:
+            from aiohttp import web
+            web.run_app(self.build(api_keys, rate, lat, lon, self.cache_file, 0),
+                        port=self.port)
+
+    def build(self, api_keys, rate, lat, lon, cache_file, number):
+        "Приложение процесса-обработчика с номером number"
+        # pylint: disable=too-many-arguments
+        from .diskcache import DiskCache
+        backend = None
+        if cache_file is not None:
+            backend = DiskCache(cache_file, ttl=self.ttl,
+                                precision=self.precision)
+        cache = AnswerCache(maxsize=self.cache_size, ttl=self.ttl,
+                            precision=self.precision, backend=backend)
+        if self.radius > 0:
+            from .spatial import NearbyCache
+            cache = NearbyCache(cache, self.radius)
+        prefetch = None
+        if self.prefetch_rate > 0 and number == 0:
+            prefetch = {"refresh_rate": self.prefetch_rate,
+                        "lead": self.prefetch_lead}
+        registry = None if self.no_metrics else MetricsRegistry()
+        scheduler = None
+        if self.daily_limit > 0:
+            from .scheduler import QuotaScheduler
+            scheduler = QuotaScheduler(
+                {key: self.daily_limit // max(self.workers, 1)
+                 for key in api_keys},
+                reserve=self.quota_reserve)
+        retry = RetryPolicy(timeout=(min(3.05, self.timeout), self.timeout),
+                            retries=self.retries, hedge=self.hedge,
+                            deadline=self.deadline)
+        return make_app(api_keys[0], rate, lat, lon, cache,
+                        prefetch=prefetch, registry=registry,
+                        scheduler=scheduler, retry=retry)
+
+
+@Weather.subcommand('ingest')
+class WeatherIngest(plumbum.cli.Application):
+    """
+    Проверка архива ответов API
+
+    Читает архив `archive` в формате JSONL (по одному ответу API в строке,
+    "-" - стандартный ввод), проверяет ответы в нескольких процессах и
+    выводит для каждой строки JSON-объект с номером строки "line" и
+    проверенным ответом "answer" или ошибкой "error" в порядке архива.
+    """
+    workers = plumbum.cli.SwitchAttr(
+        "--workers", int, default=None,
+        help="Число процессов, по умолчанию - число ядер")
+    chunk_size = plumbum.cli.SwitchAttr(
+        "--chunk-size", int, default=1000,
+        help="Число строк в одной пачке для процесса")
+    output = plumbum.cli.SwitchAttr(
+        ["-o", "--output"], str, default="-",
+        help="Файл для результата, \"-\" - стандартный вывод")
+
+    def main(self, archive):
+        import sys
+        from .ingest import ingest
+        source = sys.stdin if archive == "-" else open(archive)
+        target = sys.stdout if self.output == "-" \
+            else open(self.output, "w")
+        try:
+            for line in ingest(source, workers=self.workers,
+                               chunk_size=self.chunk_size):
+                target.write(line)
+                target.write("\n")
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if target is not sys.stdout:
+                target.close()
+
+
+class StubSwitches(plumbum.cli.Application):
+    "Ключи заглушки API для подкоманд stub и load"
+    latency = plumbum.cli.SwitchAttr(
+        "--latency", float, default=0.005,
+        help="Задержка ответа заглушки, в секундах")
+    jitter = plumbum.cli.SwitchAttr(
+        "--jitter", float, default=0,
+        help="Случайная добавка к задержке (от 0 до jitter), в секундах")
+    error_rate = plumbum.cli.SwitchAttr(
+        "--error-rate", float, default=0,
+        help="Доля запросов, на которые заглушка отвечает 503")
+    days = plumbum.cli.SwitchAttr(
+        "--days", int, default=7, help="Наибольший срок прогноза, в днях")
+    no_hours = plumbum.cli.Flag(
+        "--no-hours", help="Не отдавать почасовой прогноз")
+    seed = plumbum.cli.SwitchAttr(
+        "--seed", int, default=None,
+        help="Начальное значение генератора задержек и ошибок")
+    slow_rate = plumbum.cli.SwitchAttr(
+        "--slow-rate", float, default=0,
+        help="Доля медленных ответов заглушки")
+    slow_latency = plumbum.cli.SwitchAttr(
+        "--slow-latency", float, default=1.0,
+        help="Дополнительная задержка медленных ответов, в секундах")
+
+    def stub_options(self):
+        "Аргументы `Upstream`"
+        return {"latency": self.latency, "jitter": self.jitter,
+                "error_rate": self.error_rate, "days": self.days,
+                "hours": not self.no_hours, "seed": self.seed,
+                "slow_rate": self.slow_rate, "slow_latency": self.slow_latency}
+
+
+@Weather.subcommand('stub')
+class WeatherStub(StubSwitches):
+    """
+    Заглушка API Яндекс.Погоды
+
+    Запускает на порте `port` сервер, который отвечает на запросы
+    /v1/informers и /v1/forecast правдоподобными ответами с заданной
+    задержкой и долей ошибок. Чтобы направить на неё подкоманды cli и
+    server, установите переменную среды
+    YANDEX_WEATHER_API_URL=http://127.0.0.1:`port`.
+    """
+    def main(self, port=8080):
         from aiohttp import web
-        routes = web.RouteTableDef()
-
-        @routes.get('/')
-        async def weather(request):  # pylint: disable=unused-variable
-            return web.json_response(
-                await async_get(
-                    request.app["client_session"],
-                    api_key, rate=rate, lat=lat, lon=lon
-                )
-            )
-        app = web.Application()
-        app.add_routes(routes)
-        setup_client(app)
-        web.run_app(app, port=port)
+        from .stub import Upstream
+        web.run_app(Upstream(**self.stub_options()).make_app(),
+                    port=int(port), access_log=None)
+
+
+@Weather.subcommand('load')
+class WeatherLoad(StubSwitches):
+    """
+    Нагрузочный тест без доступа к сети
+
+    Запускает заглушку API и отправляет запросы через async_get
+    (--target client) или через подкоманду server, запущенную в этом же
+    процессе или уже работающую по адресу --url (--target server).
+    Выводит JSON с числом запросов и ошибок, запросами в секунду и
+    задержкой p50 и p99 в миллисекундах.
+    """
+    target = plumbum.cli.SwitchAttr(
+        "--target", plumbum.cli.Set("client", "server"), default="server",
+        help="Что нагружать")
+    requests = plumbum.cli.SwitchAttr(
+        ["-n", "--requests"], int, default=2000, help="Число запросов")
+    concurrency = plumbum.cli.SwitchAttr(
+        ["-c", "--concurrency"], int, default=20,
+        help="Число одновременных запросов")
+    points = plumbum.cli.SwitchAttr(
+        "--points", int, default=50, help="Число разных точек")
+    rate = plumbum.cli.SwitchAttr(
+        "--rate", plumbum.cli.Set("informers", "forecast"), default="informers",
+        help="Тариф")
+    url = plumbum.cli.SwitchAttr(
+        "--url", str, default=None,
+        help="Адрес запущенного сервера вместо сервера в этом процессе")
+    retries = plumbum.cli.SwitchAttr(
+        "--retries", int, default=2,
+        help="Число повторов запроса к заглушке")
+    hedge = plumbum.cli.SwitchAttr(
+        "--hedge", float, default=None,
+        help="Через сколько секунд дублировать медленный запрос к заглушке")
+
+    def main(self):
+        import asyncio
+        import json
+        from .loadtest import run_load
+        retry = RetryPolicy(retries=self.retries, hedge=self.hedge)
+        result = asyncio.run(run_load(
+            self.target, self.requests, self.concurrency, self.points,
+            self.rate, self.url, retry, **self.stub_options()))
+        print(json.dumps(result, indent=2))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,164 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import BatchResult, fetch_answer
+from .args import Rate, rate_url, validate_params
+from .retry import DEFAULT_RETRY
+
+
+class WeatherClient:
+    """
+    Синхронный клиент API с пулом соединений.
+
+    api_key - строка ключа доступа к API
+    rate - тариф по умолчанию, `informers` или `forecast`
+    pool_size - число соединений, которые держатся открытыми и
+        используются повторно; столько же потоков у `get_many`
+    timeout - время ожидания (в секундах) соединения и ответа: число
+        или пара (соединение, чтение), как в requests
+    cache - необязательный кэш ответов `AnswerCache` или `DiskCache`
+    session - необязательная готовая сессия requests; по умолчанию
+        создаётся своя
+    base_url - необязательный адрес сервера API (см. `validate_args`)
+    retry - `RetryPolicy` (повторы, дублирование запросов, общее время
+        вызова), её время ожидания заменяется на timeout; None отключает
+        повторы, как у `get`
+
+    Адреса тарифов и заголовок с ключом готовятся один раз в
+    конструкторе, поэтому запрос проверяет только lat, lon и прочие
+    аргументы.
+
+    ```
+    with yandex_weather_api.WeatherClient("КЛЮЧ") as client:
+        client.get(lat=55.10, lon=60.10)
+    ```
+    """
+    def __init__(self, api_key, rate="informers", *, pool_size=10,
+                 timeout=(3.05, 10), cache=None, session=None, base_url=None,
+                 retry=DEFAULT_RETRY):
+        # pylint: disable=too-many-arguments
+        self.rate = Rate.validate(rate)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.cache = cache
+        self.retry = None if retry is None else retry.replace(timeout=timeout)
+        if session is None:
+            session = self._make_session(pool_size)
+        session.headers["X-Yandex-API-Key"] = api_key
+        self.session = session
+        self._urls = {rate: (rate_url(rate, base_url),) for rate in Rate.VALUES}
+
+    @staticmethod
+    def _make_session(pool_size):
+        "Сессия requests, держащая до pool_size соединений с сервером"
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        # pool_block не даёт открывать лишние соединения сверх пула:
+        # потоки ждут освободившееся соединение и используют его повторно
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              pool_block=True)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def close(self):
+        "Закрывает соединения пула"
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def args(self, *, rate=None, **kwargs):
+        "Аргументы запроса к API, как их возвращает `validate_args`"
+        rate = self.rate if rate is None else Rate.validate(rate)
+        params = validate_params(rate, kwargs)
+        return self._urls[rate], {"params": params, "timeout": self.timeout}
+
+    def get(self, **kwargs):
+        """
+        Выполняет доступ к API.
+
+        Аргументы те же, что у `get`: lat, lon, lang, а также rate,
+        если нужен тариф, отличный от тарифа клиента.
+        """
+        args, kwargs = self.args(**kwargs)
+        return fetch_answer(self.session, args, kwargs, self.cache, self.retry)
+
+    def get_many(self, requests, *, workers=None):
+        """
+        Выполняет доступ к API для многих точек сразу в пуле потоков.
+
+        requests - итерируемый набор словарей с аргументами `get`
+        workers - число потоков, по умолчанию pool_size
+
+        Результаты `BatchResult` выдаются по мере готовности; ошибка
+        одного запроса не прерывает остальные. requests читается
+        постепенно, поэтому может быть сколь угодно длинным. Ошибка
+        чтения requests выдаётся результатом с request, равным None.
+        """
+        workers = workers or self.pool_size
+        items = iter(requests)
+        lock = threading.Lock()
+        results = queue.Queue(maxsize=workers)  # type: queue.Queue
+        stop = threading.Event()
+
+        done = object()
+
+        def worker():
+            try:
+                while not stop.is_set():
+                    try:
+                        with lock:
+                            item = next(items, done)
+                    except Exception as error:  # pylint: disable=broad-except
+                        results.put(BatchResult(None, None, error))
+                        break
+                    if item is done:
+                        break
+                    try:
+                        result = BatchResult(item, self.get(**item), None)
+                    except Exception as error:  # pylint: disable=broad-except
+                        result = BatchResult(item, None, error)
+                    results.put(result)
+            finally:
+                results.put(None)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for _ in range(workers):
+                executor.submit(worker)
+            try:
+                running = workers
+                while running:
+                    result = results.get()
+                    if result is None:
+                        running -= 1
+                    else:
+                        yield result
+            finally:
+                stop.set()
+                # освобождаем потоки, ожидающие места в очереди
+                while running:
+                    if results.get() is None:
+                        running -= 1
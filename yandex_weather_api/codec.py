@@ -0,0 +1,380 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import json
+import struct
+import sys
+import zlib
+from array import array
+
+import voluptuous as vol
+
+from .lazy import Lazy
+from .types import (
+    BoxWithSchema, Enum, Hours, Icon, Forecasts, WeatherAnswer, boolean,
+    integer, json_default, number
+)
+
+# Формат: MAGIC, байт VERSION, crc32 описания раскладки (меняется вместе
+# со схемами) и запись WeatherAnswer.
+#
+# Запись - это struct с битовой маской присутствующих полей и всеми
+# полями фиксированной ширины (числа - float64, целые - int64, булевы,
+# перечисления - индекс в VALUES), за которым в порядке схемы идут
+# строки, вложенные записи, списки, колонки `Hours` (и их поля вне схемы
+# JSON-списком) и поля вне схемы одним JSON-объектом.
+MAGIC = b"YWA"
+VERSION = 2
+
+_MISSING = object()
+_SIZE = struct.Struct("<I")
+_BIG_ENDIAN = sys.byteorder == "big"
+
+
+def _pack_size(size, out):
+    "Длина: один байт до 254, иначе 255 и uint32"
+    if size < 255:
+        out.append(size)
+    else:
+        out.append(255)
+        out += _SIZE.pack(size)
+
+
+def _unpack_size(buf, pos):
+    size = buf[pos]
+    if size < 255:
+        return size, pos + 1
+    return _SIZE.unpack_from(buf, pos + 1)[0], pos + 5
+
+
+def _pack_bytes(data, out):
+    _pack_size(len(data), out)
+    out += data
+
+
+def _unpack_bytes(buf, pos):
+    size, pos = _unpack_size(buf, pos)
+    return bytes(buf[pos:pos + size]), pos + size
+
+
+def _getter(obj):
+    "Чтение поля из коробки или словаря либо из модели на слотах"
+    if isinstance(obj, dict):
+        return obj.get
+    return lambda name, default: getattr(obj, name, default)
+
+
+class _EnumCodes:
+    "Коды перечисления и заранее созданные значения для декодирования"
+    __slots__ = ("codes", "values")
+
+    def __init__(self, enum):
+        self.codes = {value: code for code, value in enumerate(enum.VALUES)}
+        self.values = tuple(enum(value) for value in enum.VALUES)
+
+
+class _Record:
+    "Раскладка объекта по схеме"
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, schema, owner=None, skip=()):
+        self.owner = owner
+        self.fields = []  # type: list
+        formats = []
+        node = schema.schema if isinstance(schema, vol.Schema) else schema
+        for marker in node:
+            name = marker.schema if isinstance(marker, vol.Marker) else marker
+            if name in skip:
+                continue
+            kind, arg = _kind(node[marker])
+            bit = 1 << len(self.fields)
+            slot = None
+            if kind in _FIXED:
+                slot = len(formats) + 1
+                formats.append(kind)
+            self.fields.append((name, bit, kind, arg, slot))
+        self.extra_bit = 1 << len(self.fields)
+        self.names = frozenset(field[0] for field in self.fields) | set(skip)
+        bits = len(self.fields) + 1
+        mask = "B" if bits <= 8 else "H" if bits <= 16 else "I" if bits <= 32 else "Q"
+        self.struct = struct.Struct("<" + mask + "".join(formats))
+        self.defaults = [0] * len(formats)
+
+    def describe(self):
+        "Описание раскладки для отпечатка формата"
+        return [(name, kind, arg.describe() if isinstance(arg, _Record) else
+                 list(arg.codes) if isinstance(arg, _EnumCodes) else None)
+                for name, _, kind, arg, _ in self.fields]
+
+    def encode(self, obj, out):
+        # pylint: disable=too-many-branches
+        if isinstance(obj, Lazy):
+            obj = obj.resolve()
+        get = _getter(obj)
+        present = 0
+        fixed = list(self.defaults)
+        variable = []
+        for name, bit, kind, arg, slot in self.fields:
+            value = get(name, _MISSING)
+            if value is _MISSING:
+                continue
+            present |= bit
+            if slot is None:
+                variable.append((kind, arg, value))
+            elif kind == "B":
+                fixed[slot - 1] = arg.codes[value]
+            else:
+                fixed[slot - 1] = value
+        if isinstance(obj, dict):
+            extra = {key: value for key, value in obj.items()
+                     if key not in self.names}
+        else:
+            extra = {key: obj[key] for key in obj.keys()
+                     if key not in self.names}
+        if extra:
+            present |= self.extra_bit
+        out += self.struct.pack(present, *fixed)
+        for kind, arg, value in variable:
+            _ENCODERS[kind](value, arg, out)
+        if extra:
+            _pack_bytes(json.dumps(extra, default=json_default).encode(), out)
+
+    def decode(self, buf, pos, model):
+        fixed = self.struct.unpack_from(buf, pos)
+        pos += self.struct.size
+        present = fixed[0]
+        data = {}
+        for name, bit, kind, arg, slot in self.fields:
+            if not present & bit:
+                continue
+            if slot is None:
+                data[name], pos = _DECODERS[kind](buf, pos, arg, model)
+            elif kind == "B":
+                data[name] = arg.values[fixed[slot]]
+            else:
+                data[name] = fixed[slot]
+        if present & self.extra_bit:
+            raw, pos = _unpack_bytes(buf, pos)
+            data.update(json.loads(raw.decode()))
+        if self.owner is not None and model != "box":
+            data = self.owner.build(data, model)
+        return data, pos
+
+
+def _kind(validator):
+    "Вид поля и его параметр для валидатора из схемы"
+    # pylint: disable=too-many-return-statements
+    if isinstance(validator, vol.Schema):
+        validator = validator.schema
+    if validator is number:
+        return "d", None
+    if validator in (int, integer):
+        return "q", None
+    if validator in (bool, boolean):
+        return "?", None
+    if validator is str:
+        return "s", None
+    if isinstance(validator, dict):
+        return "m", _Record(validator)
+    if isinstance(validator, list) and len(validator) == 1:
+        kind, arg = _kind(validator[0])
+        return ("l", arg) if kind == "r" else ("j", None)
+    item_validator = getattr(validator, "item_validator", None)
+    if item_validator is not None:
+        kind, arg = _kind(item_validator)
+        return ("l", arg) if kind == "r" else ("j", None)
+    owner = getattr(validator, "__self__", None)
+    if owner is Icon:
+        return "s", Icon
+    if owner is Hours:
+        return "h", None
+    if isinstance(owner, type) and issubclass(owner, Enum):
+        return "B", _EnumCodes(owner)
+    if isinstance(owner, type) and issubclass(owner, BoxWithSchema):
+        return "r", _record(owner)
+    return "j", None
+
+
+_FIXED = ("d", "q", "?", "B")
+
+
+def _encode_str(value, arg, out):  # pylint: disable=unused-argument
+    _pack_bytes(value.encode(), out)
+
+
+def _decode_str(buf, pos, arg, model):  # pylint: disable=unused-argument
+    raw, pos = _unpack_bytes(buf, pos)
+    value = raw.decode()
+    return (value if arg is None else arg(value)), pos
+
+
+def _encode_record(value, arg, out):
+    arg.encode(value, out)
+
+
+def _decode_record(buf, pos, arg, model):
+    return arg.decode(buf, pos, model)
+
+
+def _encode_list(value, arg, out):
+    _pack_size(len(value), out)
+    for item in value:
+        arg.encode(item, out)
+
+
+def _decode_list(buf, pos, arg, model):
+    size, pos = _unpack_size(buf, pos)
+    ret = []
+    for _ in range(size):
+        item, pos = arg.decode(buf, pos, model)
+        ret.append(item)
+    return ret, pos
+
+
+def _encode_json(value, arg, out):  # pylint: disable=unused-argument
+    _pack_bytes(json.dumps(value, default=json_default).encode(), out)
+
+
+def _decode_json(buf, pos, arg, model):  # pylint: disable=unused-argument
+    raw, pos = _unpack_bytes(buf, pos)
+    return json.loads(raw.decode()), pos
+
+
+def _encode_hours(value, arg, out):  # pylint: disable=unused-argument
+    # pylint: disable=protected-access
+    columns = value._columns
+    out += _SIZE.pack(len(value))
+    for name, kind, _ in Hours.columns_spec():
+        column = columns[name]
+        if kind is None:
+            # длина строки + 1, 0 - отсутствующее значение
+            for item in column:
+                if item is None:
+                    out.append(0)
+                    continue
+                item = item.encode()
+                _pack_size(len(item) + 1, out)
+                out += item
+            continue
+        if _BIG_ENDIAN and kind == "d":
+            column = array(kind, column)
+            column.byteswap()
+        out += column.tobytes()
+    _encode_json(value._extra, None, out)
+
+
+def _decode_hours(buf, pos, arg, model):  # pylint: disable=unused-argument
+    length = _SIZE.unpack_from(buf, pos)[0]
+    pos += 4
+    columns = {}
+    for name, kind, _ in Hours.columns_spec():
+        if kind is None:
+            icon = name == "icon"
+            column = []
+            for _ in range(length):
+                size, pos = _unpack_size(buf, pos)
+                if size == 0:
+                    column.append(None)
+                    continue
+                value = bytes(buf[pos:pos + size - 1]).decode()
+                column.append(Icon(value) if icon else value)
+                pos += size - 1
+            columns[name] = column
+            continue
+        column = array(kind)
+        end = pos + column.itemsize * length
+        column.frombytes(buf[pos:end])
+        if _BIG_ENDIAN and kind == "d":
+            column.byteswap()
+        columns[name] = column
+        pos = end
+    extra, pos = _decode_json(buf, pos, None, model)
+    return Hours(columns, length, extra), pos
+
+
+_ENCODERS = {"s": _encode_str, "r": _encode_record, "m": _encode_record,
+             "l": _encode_list, "j": _encode_json, "h": _encode_hours}
+_DECODERS = {"s": _decode_str, "r": _decode_record, "m": _decode_record,
+             "l": _decode_list, "j": _decode_json, "h": _decode_hours}
+
+_RECORDS = {}  # type: dict
+
+
+def _record(cls):
+    "Раскладка для `BoxWithSchema`-класса cls"
+    record = _RECORDS.get(cls)
+    if record is None:
+        if cls is WeatherAnswer:
+            # forecast и forecasts - одни и те же прогнозы, хранится только
+            # forecasts в раскладке Forecasts, подходящей для обоих тарифов
+            schema = cls.SCHEMA.schema.copy()
+            schema[vol.Optional("forecasts")] = [Forecasts.validate]
+            record = _Record(schema, cls, skip=("forecast",))
+        else:
+            record = _Record(cls.SCHEMA, cls)
+        _RECORDS[cls] = record
+    return record
+
+
+_HEADER = struct.Struct("<3sBI")
+_FINGERPRINT = []  # type: list
+
+
+def _fingerprint():
+    "crc32 описания раскладки WeatherAnswer"
+    if not _FINGERPRINT:
+        description = json.dumps(_record(WeatherAnswer).describe())
+        description += json.dumps([
+            (name, kind, getattr(enum, "VALUES", None))
+            for name, kind, enum in Hours.columns_spec()])
+        _FINGERPRINT.append(zlib.crc32(description.encode()))
+    return _FINGERPRINT[0]
+
+
+def dumps(answer):
+    """
+    Кодирует проверенный ответ answer (коробку, модель на слотах или
+    ленивый ответ) в компактный двоичный формат.
+    """
+    out = bytearray(_HEADER.pack(MAGIC, VERSION, _fingerprint()))
+    _record(WeatherAnswer).encode(answer, out)
+    return bytes(out)
+
+
+def loads(data, model="box"):
+    """
+    Восстанавливает ответ, закодированный `dumps`, в модели model.
+
+    Схемы повторно не проверяются: данные считаются проверенными при
+    кодировании. Прогнозы тарифа `informers` восстанавливаются в
+    раскладке `Forecasts`. ValueError - если данные закодированы другой
+    версией формата или с другими схемами.
+    """
+    if model not in WeatherAnswer.MODELS:
+        raise ValueError("Model {} cannot be used in {}".format(
+            model, WeatherAnswer))
+    buf = memoryview(data)
+    magic, version, fingerprint = _HEADER.unpack_from(buf, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Unsupported format {!r} version {}".format(
+            magic, version))
+    if fingerprint != _fingerprint():
+        raise ValueError("Data was encoded with different schemas")
+    answer, _ = _record(WeatherAnswer).decode(buf, _HEADER.size, model)
+    if model == "box":
+        answer = WeatherAnswer.build(answer, model)
+    return answer
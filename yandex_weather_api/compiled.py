@@ -0,0 +1,157 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import voluptuous as vol
+
+
+class NotCompilable(Exception):
+    "Схему нельзя скомпилировать в быстрый валидатор"
+
+
+class Mismatch(Exception):
+    "Данные не прошли быструю проверку, нужна полная проверка схемой"
+
+
+def _compile_type(kind):
+    "Проверка типа, как её делает voluptuous для классов в схеме"
+    def validate(value):
+        if not isinstance(value, kind):
+            raise Mismatch(value)
+        return value
+    return validate
+
+
+def _compile_list(validator):
+    "Проверка списка с единственным валидатором элементов"
+    def validate(value):
+        if not isinstance(value, list):
+            raise Mismatch(value)
+        return [validator(item) for item in value]
+    return validate
+
+
+def _compile_dict(node, extra, required_default, resolve):
+    "Проверка словаря со строковыми ключами"
+    # pylint: disable=too-many-branches
+    validators = {}
+    required = set()
+    groups = {}
+    for marker, value in node.items():
+        key = marker.schema if isinstance(marker, vol.Marker) else marker
+        if not isinstance(key, str):
+            raise NotCompilable(marker)
+        if isinstance(marker, vol.Inclusive):
+            raise NotCompilable(marker)
+        if isinstance(marker, (vol.Required, vol.Optional)) \
+                and not isinstance(marker.default, vol.Undefined):
+            raise NotCompilable(marker)
+        if isinstance(marker, vol.Required) \
+                or (required_default and not isinstance(marker, vol.Optional)):
+            required.add(key)
+        if isinstance(marker, vol.Exclusive):
+            groups.setdefault(marker.group_of_exclusion, set()).add(key)
+        validators[key] = _compile(value, extra, required_default, resolve)
+    required = frozenset(required)
+    exclusive = tuple(frozenset(keys) for keys in groups.values() if len(keys) > 1)
+    keep_extra = extra == vol.ALLOW_EXTRA
+    drop_extra = extra == vol.REMOVE_EXTRA
+
+    def validate(data):
+        if not isinstance(data, dict):
+            raise Mismatch(data)
+        out = {}
+        for key, value in data.items():
+            validator = validators.get(key)
+            if validator is not None:
+                out[key] = validator(value)
+            elif keep_extra:
+                out[key] = value
+            elif not drop_extra:
+                raise Mismatch(key)
+        if not out.keys() >= required:
+            raise Mismatch(data)
+        for group in exclusive:
+            if len(group & out.keys()) > 1:
+                raise Mismatch(data)
+        return out
+    return validate
+
+
+def _compile(node, extra, required_default, resolve):
+    "Компилирует узел схемы в обычную функцию"
+    if isinstance(node, vol.Schema):
+        return _compile(node.schema, node.extra, node.required, resolve)
+    if isinstance(node, dict):
+        return _compile_dict(node, extra, required_default, resolve)
+    if isinstance(node, list):
+        if len(node) != 1:
+            raise NotCompilable(node)
+        return _compile_list(_compile(node[0], extra, required_default, resolve))
+    if isinstance(node, type):
+        return _compile_type(node)
+    if callable(node):
+        return resolve(node) if resolve is not None else node
+    raise NotCompilable(node)
+
+
+def _resolve_schema(node, resolve):
+    "Копия узла схемы, в которой валидаторы-функции подменены resolve"
+    if isinstance(node, vol.Schema):
+        return vol.Schema(_resolve_schema(node.schema, resolve),
+                          required=node.required, extra=node.extra)
+    if isinstance(node, dict):
+        return {key: _resolve_schema(value, resolve)
+                for key, value in node.items()}
+    if isinstance(node, list):
+        return [_resolve_schema(value, resolve) for value in node]
+    if callable(node) and not isinstance(node, type):
+        return resolve(node)
+    return node
+
+
+def compile_schema(schema, resolve=None):
+    """
+    Компилирует схему voluptuous в специализированную функцию проверки.
+
+    Функция выполняет те же проверки и преобразования, что и схема,
+    но без накладных расходов voluptuous. Если данные не проходят
+    быструю проверку, они повторно проверяются исходной схемой, поэтому
+    ошибки совпадают с ошибками voluptuous. Схемы, которые компилятор
+    не поддерживает, возвращаются как есть.
+
+    resolve - необязательная функция, которая может подменить
+    валидатор-функцию из схемы более быстрым эквивалентом; она
+    применяется и к схеме для повторной проверки.
+    """
+    try:
+        fast = _compile(schema.schema, schema.extra, schema.required, resolve)
+    except NotCompilable:
+        return schema if resolve is None else _resolve_schema(schema, resolve)
+    slow = []
+
+    def validate(data):
+        try:
+            return fast(data)
+        except (Mismatch, vol.Invalid, ValueError):
+            # voluptuous тоже превращает ValueError валидаторов в ошибку
+            # проверки; прочие исключения - ошибки, а не плохие данные
+            pass
+        if not slow:
+            slow.append(schema if resolve is None
+                        else _resolve_schema(schema, resolve))
+        return slow[0](data)
+    return validate
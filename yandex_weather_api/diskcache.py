@@ -0,0 +1,193 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from . import metrics
+from .cache import quantise, request_key
+
+
+class DiskCache:
+    """
+    Кэш необработанных JSON-ответов API в файле SQLite.
+
+    path - путь к файлу базы
+    ttl - время (в секундах), в течение которого ответ считается свежим
+    maxsize - максимальное число ответов, при превышении удаляются
+        самые старые
+    precision - число знаков после запятой, до которого округляются
+        широта и долгота; None отключает округление
+    prune_interval - как часто (в секундах) запись удаляет устаревшие
+        и лишние ответы; между очистками база может превышать maxsize
+
+    База работает в режиме WAL, поэтому одним файлом могут одновременно
+    пользоваться несколько процессов. Кэш можно передать в `get`
+    и `async_get` сам по себе или как backend для `AnswerCache`.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS answers (
+            key TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            fetched REAL NOT NULL,
+            ttl REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS answers_fetched ON answers (fetched);
+        CREATE INDEX IF NOT EXISTS answers_expires ON answers (fetched + ttl);
+    """
+
+    def __init__(self, path, ttl=600, maxsize=10000, precision=2,
+                 clock=time.time, prune_interval=60):
+        # pylint: disable=too-many-arguments
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.precision = precision
+        self.clock = clock
+        self.prune_interval = prune_interval
+        self._pruned = None  # type: Optional[float]
+        self._local = threading.local()
+        self._connect().executescript(self.SCHEMA)
+
+    def _connect(self):
+        "Соединение с базой для текущего потока и процесса"
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            local.pid = os.getpid()
+            local.connection = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None)
+            local.connection.execute("PRAGMA journal_mode=WAL")
+            local.connection.execute("PRAGMA synchronous=NORMAL")
+        return local.connection
+
+    def __len__(self):
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def key(self, args, kwargs):
+        """
+        Строит ключ кэша из результата `validate_args`.
+
+        Округляет lat и lon в kwargs["params"] на месте.
+        """
+        quantise(kwargs, self.precision)
+        return request_key(args, kwargs)
+
+    def load(self, key):
+        "Возвращает свежий необработанный ответ с ключом key или None"
+        entry = self.load_entry(key)
+        return None if entry is None else entry[0]
+
+    def load_entry(self, key):
+        """
+        Возвращает пару (свежий необработанный ответ с ключом key,
+        секунд до истечения его ttl) или None
+        """
+        now = self.clock()
+        row = self._connect().execute(
+            "SELECT data, fetched + ttl - ? FROM answers"
+            " WHERE key = ? AND fetched + ttl > ?",
+            (now, json.dumps(key), now)).fetchone()
+        if metrics.HOOKS:
+            metrics.emit("disk_cache_misses_total" if row is None
+                         else "disk_cache_hits_total")
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def store(self, key, data):
+        """
+        Сохраняет необработанный ответ data; раз в prune_interval
+        секунд также вытесняет устаревшие и лишние ответы
+        """
+        now = self.clock()
+        prune = self._pruned is None or now - self._pruned >= self.prune_interval
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?)",
+                (json.dumps(key), json.dumps(data), now, self.ttl))
+            if prune:
+                connection.execute(
+                    "DELETE FROM answers WHERE fetched + ttl <= ?", (now,))
+                connection.execute(
+                    "DELETE FROM answers WHERE key IN ("
+                    " SELECT key FROM answers ORDER BY fetched DESC"
+                    " LIMIT -1 OFFSET ?)", (self.maxsize,))
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        if prune:
+            self._pruned = now
+
+    def clear(self):
+        "Очищает кэш"
+        self._connect().execute("DELETE FROM answers")
+
+    def fetch(self, key, fetch, validate):
+        """
+        Возвращает validate от ответа из кэша или от fetch().
+
+        fetch возвращает необработанный JSON-ответ API.
+        """
+        return self.fetch_entry(key, fetch, validate)[0]
+
+    def fetch_entry(self, key, fetch, validate):
+        "Как `fetch`, но возвращает пару (ответ, секунд до истечения ttl)"
+        entry = self.load_entry(key)
+        if entry is None:
+            data = fetch()
+            answer = validate(data)
+            self.store(key, data)
+            return answer, self.ttl
+        return validate(entry[0]), entry[1]
+
+    async def async_fetch(self, key, fetch, validate):
+        """
+        Возвращает validate от ответа из кэша или от `await fetch()`.
+
+        Обращения к базе выполняются в пуле потоков цикла событий:
+        запись может ждать блокировку, которую держит другой процесс.
+        """
+        return (await self.async_fetch_entry(key, fetch, validate))[0]
+
+    async def async_fetch_entry(self, key, fetch, validate):
+        "Как `async_fetch`, но возвращает пару (ответ, секунд до истечения ttl)"
+        import asyncio
+        entry = await asyncio.get_running_loop().run_in_executor(
+            None, self.load_entry, key)
+        if entry is None:
+            return await self.async_refresh(key, fetch, validate), self.ttl
+        return validate(entry[0]), entry[1]
+
+    async def async_refresh(self, key, fetch, validate):
+        """
+        Получает ответ как validate(await fetch()), не заглядывая в базу,
+        и сохраняет необработанный ответ в базе.
+        """
+        import asyncio
+        data = await fetch()
+        answer = validate(data)
+        await asyncio.get_running_loop().run_in_executor(
+            None, self.store, key, data)
+        return answer
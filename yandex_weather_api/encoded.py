@@ -0,0 +1,149 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from .types import json_default
+
+ENCODINGS = ("br", "gzip")
+
+
+def dumps(answer):
+    "Компактный JSON ответа в UTF-8"
+    return json.dumps(answer, default=json_default, ensure_ascii=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def _brotli():
+    "Модуль brotli или None, если он не установлен"
+    try:
+        import brotli  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    return brotli
+
+
+class EncodedAnswer:
+    """
+    Ответ, заранее преобразованный в байты JSON.
+
+    body - JSON ответа, etag - строгий ETag (хэш body в кавычках).
+    Сжатые варианты строятся при первом запросе `variant` и
+    запоминаются.
+    """
+    __slots__ = ("answer", "body", "etag", "_variants", "_lock")
+
+    def __init__(self, answer, encode=dumps):
+        self.answer = answer
+        self.body = encode(answer)
+        self.etag = '"{}"'.format(
+            hashlib.blake2b(self.body, digest_size=12).hexdigest())
+        self._variants = {"identity": self.body}
+        self._lock = threading.Lock()
+
+    def variant(self, encoding):
+        "Тело ответа в кодировке encoding: identity, gzip или br"
+        data = self._variants.get(encoding)
+        if data is None:
+            with self._lock:
+                data = self._variants.get(encoding)
+                if data is None:
+                    if encoding == "gzip":
+                        data = gzip.compress(self.body, 6, mtime=0)
+                    elif encoding == "br":
+                        data = _brotli().compress(self.body, quality=9)
+                    else:
+                        raise ValueError(encoding)
+                    self._variants[encoding] = data
+        return data
+
+
+def negotiate(accept_encoding):
+    """
+    Выбирает кодировку ответа по заголовку Accept-Encoding.
+
+    Предпочитает br (если установлен модуль brotli), затем gzip;
+    кодировки с q=0 не выбираются, даже если разрешён "*".
+    """
+    accepted = set()
+    rejected = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.partition(";")
+        name = name.strip()
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    rejected.add(name)
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name)
+    for encoding in ENCODINGS:
+        if encoding in rejected:
+            continue
+        if encoding in accepted or "*" in accepted:
+            if encoding != "br" or _brotli() is not None:
+                return encoding
+    return "identity"
+
+
+def matches(if_none_match, etag):
+    "Истинно, если заголовок If-None-Match совпадает с etag"
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag in ("*", etag):
+            return True
+    return False
+
+
+class EncodedCache:
+    """
+    Кэш закодированных ответов по ключу запроса.
+
+    Ответ кодируется заново, только когда под ключом появляется другой
+    объект ответа; лишние записи вытесняются по LRU.
+    """
+    def __init__(self, maxsize=1024, encode=dumps):
+        self.maxsize = maxsize
+        self.encode = encode
+        self._entries = OrderedDict()  # type: OrderedDict
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, answer):
+        "`EncodedAnswer` для ответа answer, полученного по ключу key"
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.answer is answer:
+                self._entries.move_to_end(key)
+                return entry
+        entry = EncodedAnswer(answer, self.encode)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
@@ -0,0 +1,153 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from itertools import repeat
+
+import voluptuous as vol
+
+from .types import (
+    number, Enum, Icon, PartName, FacticalWeatherInfo, ForecastPart,
+    BASE_FORECAST_SCHEMA
+)
+
+
+def column_spec(schema):
+    """
+    Список колонок (имя, тип numpy, перечисление) для полей схемы.
+
+    Числа становятся float64 (NaN для отсутствующих), перечисления -
+    кодами int8 (индекс в VALUES, -1 для отсутствующих), строки -
+    строками numpy. Вложенные объекты пропускаются.
+    """
+    ret = []
+    for key, validator in schema.schema.items():
+        name = key.schema if isinstance(key, vol.Marker) else key
+        owner = getattr(validator, "__self__", None)
+        if validator is number:
+            ret.append((name, "f8", None))
+        elif validator is int:
+            ret.append((name, "i8", None))
+        elif validator is bool:
+            ret.append((name, "?", None))
+        elif validator is str or owner is Icon:
+            ret.append((name, "U", None))
+        elif isinstance(owner, type) and issubclass(owner, Enum):
+            ret.append((name, "i1", owner))
+    return ret
+
+
+FACT_COLUMNS = column_spec(FacticalWeatherInfo.SCHEMA)
+DAY_COLUMNS = column_spec(BASE_FORECAST_SCHEMA)
+PART_COLUMNS = column_spec(ForecastPart.SCHEMA)
+
+_DEFAULTS = {"f8": float("nan"), "i8": 0, "?": False, "U": "", "i1": -1}
+
+
+def _get(row, name, default):
+    "Чтение поля строки любой модели"
+    if isinstance(row, dict):
+        return row.get(name, default)
+    return getattr(row, name, default)
+
+
+def _getter(rows):
+    """
+    Быстрое чтение поля: dict.get, если все строки - словари или коробки,
+    getattr, если среди них нет словарей, иначе проверка каждой строки
+    """
+    dicts = sum(1 for row in rows if isinstance(row, dict))
+    if dicts == len(rows):
+        return dict.get
+    if not dicts:
+        return lambda row, name, default: getattr(row, name, default)
+    return _get
+
+
+def _table(rows, spec):
+    "Строит колонки для строк rows по описанию spec"
+    import numpy as np
+    get = _getter(rows)
+    count = len(rows)
+    ret = {}
+    for name, kind, enum in spec:
+        values = map(get, rows, repeat(name, count), repeat(_DEFAULTS[kind]))
+        if enum is not None:
+            codes = {value: code for code, value in enumerate(enum.VALUES)}
+            values = map(codes.get, values, repeat(-1))
+        if kind == "U":
+            ret[name] = np.array(list(values), dtype=str)
+        else:
+            ret[name] = np.fromiter(values, dtype=kind, count=count)
+    return ret
+
+
+def to_columns(answers, structured=False):
+    """
+    Преобразует проверенные ответы в колонки numpy.
+
+    Возвращает словарь с таблицами "fact", "days" и "parts". Каждая
+    таблица - словарь колонок одинаковой длины или, если structured
+    истинно, структурированный массив. Колонки "answer", "day" и
+    "part" связывают строки с номером ответа в answers, номером дня
+    в `forecasts` и кодом `PartName`. Части дня с именами не из
+    `PartName` (например, day_short) пропускаются.
+
+    Перечисления хранятся кодами: `Condition.VALUES[code]`.
+    """
+    import numpy as np
+    answers = list(answers)
+    facts = [answer["fact"] for answer in answers]
+    days, day_answer, day_number = [], [], []
+    parts, part_answer, part_day, part_name = [], [], [], []
+    codes = {value: code for code, value in enumerate(PartName.VALUES)}
+    for answer_no, answer in enumerate(answers):
+        for day_no, day in enumerate(answer["forecasts"]):
+            days.append(day)
+            day_answer.append(answer_no)
+            day_number.append(day_no)
+            for name, part in day["parts"].items():
+                if name not in codes:
+                    continue
+                parts.append(part)
+                part_answer.append(answer_no)
+                part_day.append(day_no)
+                part_name.append(codes[name])
+
+    fact = _table(facts, FACT_COLUMNS)
+    fact["answer"] = np.arange(len(facts), dtype="i8")
+    day = _table(days, DAY_COLUMNS)
+    day["answer"] = np.array(day_answer, dtype="i8")
+    day["day"] = np.array(day_number, dtype="i8")
+    part = _table(parts, [col for col in PART_COLUMNS if col[0] != "part_name"])
+    part["answer"] = np.array(part_answer, dtype="i8")
+    part["day"] = np.array(part_day, dtype="i8")
+    part["part"] = np.array(part_name, dtype="i1")
+    ret = {"fact": fact, "days": day, "parts": part}
+    if structured:
+        ret = {name: to_structured(table) for name, table in ret.items()}
+    return ret
+
+
+def to_structured(columns):
+    "Собирает словарь колонок одинаковой длины в структурированный массив"
+    import numpy as np
+    dtype = [(name, column.dtype) for name, column in columns.items()]
+    count = len(next(iter(columns.values()))) if columns else 0
+    ret = np.empty(count, dtype=dtype)
+    for name, column in columns.items():
+        ret[name] = column
+    return ret
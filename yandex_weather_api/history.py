@@ -0,0 +1,329 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Tuple
+
+from .lazy import Lazy
+from .slots import Slotted
+from .types import (
+    Hours, Info, TZInfo, FacticalWeatherInfo, Forecasts, ForecastPart,
+    PartName, WeatherAnswer
+)
+
+_MISSING = object()
+
+# Классы вложенных объектов для восстановления моделей на слотах
+_TOP_MODELS = {
+    ("info",): Info,
+    ("info", "tzinfo"): TZInfo,
+    ("fact",): FacticalWeatherInfo,
+}
+_DAY_MODELS = {
+    ("parts", name): ForecastPart for name in PartName.VALUES
+}  # type: Dict[Tuple[str, ...], type]
+_DAY_MODELS[()] = Forecasts
+
+
+def _same(old, new):
+    "Равенство значений полей; `Hours` сравниваются по колонкам"
+    if old is new:
+        return True
+    if isinstance(old, Hours) or isinstance(new, Hours):
+        # pylint: disable=protected-access
+        return isinstance(old, Hours) and isinstance(new, Hours) \
+            and len(old) == len(new) and all(
+                column.tobytes() == new._columns[name].tobytes()
+                if isinstance(column, array) else column == new._columns[name]
+                for name, column in old._columns.items()) \
+            and old._extra == new._extra
+    return type(old) is type(new) and old == new
+
+
+def _items(obj):
+    "Пары (ключ, значение) коробки, словаря или модели на слотах"
+    if isinstance(obj, Lazy):
+        obj = obj.resolve()
+    return obj.items()
+
+
+def _flatten(obj, prefix, out, skip=()):
+    "Раскладывает вложенные объекты obj в словарь путь -> значение"
+    for key, value in _items(obj):
+        if key in skip:
+            continue
+        path = prefix + (key,)
+        if isinstance(value, (dict, Slotted, Lazy)):
+            _flatten(value, path, out)
+        else:
+            out[path] = value
+    return out
+
+
+def _unflatten(leaves, model, models):
+    "Собирает словарь путь -> значение обратно во вложенные объекты"
+    root = {}  # type: dict
+    for path, value in leaves.items():
+        node = root
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+    if model == "box":
+        return root
+
+    def build(node, path):
+        for key, value in node.items():
+            if type(value) is dict:  # pylint: disable=unidiomatic-typecheck
+                node[key] = build(value, path + (key,))
+        cls = models.get(path)
+        return node if cls is None else cls.build(node, model)
+    return build(root, ())
+
+
+class _Series:
+    "Значения одного поля: номера снимков, где значение изменилось"
+    __slots__ = ("indexes", "values")
+
+    def __init__(self):
+        self.indexes = array("L")
+        self.values = []  # type: list
+
+    def append(self, index, value):
+        if self.values and _same(self.values[-1], value):
+            return
+        self.indexes.append(index)
+        self.values.append(value)
+
+    def at(self, index):
+        "Значение в снимке index"
+        pos = bisect_right(self.indexes, index) - 1
+        return self.values[pos] if pos >= 0 else _MISSING
+
+    def between(self, start, end):
+        "Значения в снимках start..end-1 в виде списка"
+        indexes = self.indexes
+        pos = bisect_right(indexes, start) - 1
+        value = self.values[pos] if pos >= 0 else _MISSING
+        ret = []
+        for index in range(start, end):
+            while pos + 1 < len(indexes) and indexes[pos + 1] <= index:
+                pos += 1
+                value = self.values[pos]
+            ret.append(value)
+        return ret
+
+
+class _Group:
+    "Поля одного объекта (ответа без прогнозов или прогноза на день)"
+    __slots__ = ("series", "live")
+
+    def __init__(self):
+        self.series = {}  # type: dict
+        self.live = set()  # type: set
+
+    def update(self, index, leaves):
+        for path, value in leaves.items():
+            series = self.series.get(path)
+            if series is None:
+                series = self.series[path] = _Series()
+            series.append(index, value)
+        for path in self.live.difference(leaves):
+            self.series[path].append(index, _MISSING)
+        self.live = set(leaves)
+
+    def at(self, index):
+        ret = {}
+        for path, series in self.series.items():
+            value = series.at(index)
+            if value is not _MISSING:
+                ret[path] = value
+        return ret
+
+
+class LocationHistory:
+    """
+    История ответов для одной точки.
+
+    Каждое поле ответа хранится только в те моменты, когда оно
+    изменилось по сравнению с предыдущим ответом. Ответы добавляются
+    в порядке неубывания `now`; `fact.obs_time` тоже предполагается
+    неубывающим.
+
+    ```
+    history.fact("temp", start, end)  # [(now, temp), ...]
+    history.part(date_ts, "day", "temp_avg", start, end)
+    history.at(now)  # ответ, каким он был в момент now
+    ```
+    """
+    INDEXES = ("now", "obs_time")
+
+    def __init__(self):
+        self.now = array("d")
+        self.obs_time = array("d")
+        self.dates = _Series()
+        self._top = _Group()
+        self._days = {}  # type: dict
+        self._values = 0
+
+    def __len__(self):
+        return len(self.now)
+
+    def append(self, answer):
+        "Добавляет проверенный ответ answer"
+        now = float(answer["now"])
+        if self.now and now < self.now[-1]:
+            raise ValueError("Answer at {} is older than the last one at {}"
+                             .format(now, self.now[-1]))
+        index = len(self.now)
+        top = _flatten(answer, (), {}, skip=("forecast", "forecasts"))
+        dates = []
+        for day in answer["forecasts"]:
+            leaves = _flatten(day, (), {})
+            date = leaves.get(("date_ts",), leaves.get(("date",)))
+            group = self._days.get(date)
+            if group is None:
+                group = self._days[date] = _Group()
+            group.update(index, leaves)
+            dates.append(date)
+            self._values += len(leaves)
+        previous = self.dates.at(index - 1) if index else ()
+        for date in set(previous).difference(dates):
+            self._days[date].update(index, {})
+        self.dates.append(index, tuple(dates))
+        self._top.update(index, top)
+        self._values += len(top)
+        self.now.append(now)
+        self.obs_time.append(float(top.get(("fact", "obs_time"), now)))
+
+    def _times(self, index):
+        "Времена ответов по index"
+        if index not in self.INDEXES:
+            raise ValueError("Index {} cannot be used in {}".format(
+                index, type(self).__name__))
+        return getattr(self, index)
+
+    def _range(self, start, end, index):
+        "Номера снимков со временем index в полуинтервале [start, end)"
+        times = self._times(index)
+        return times, bisect_left(times, start), bisect_left(times, end)
+
+    def _series(self, series, start, end, index):
+        times, first, last = self._range(start, end, index)
+        if series is None:
+            return []
+        return [(times[number], value) for number, value in zip(
+            range(first, last), series.between(first, last))
+            if value is not _MISSING]
+
+    def fact(self, name, start, end, index="now"):
+        """
+        Значения поля name объекта fact в ответах с index (`now` или
+        `obs_time`) в полуинтервале [start, end): список пар
+        (время, значение), ответы без поля пропускаются.
+        """
+        return self._series(self._top.series.get(("fact", name)),
+                            start, end, index)
+
+    def part(self, date, part_name, name, start, end, index="now"):
+        """
+        Значения поля name прогноза на часть дня part_name дня date
+        (date_ts прогноза), аналогично `fact`.
+        """
+        group = self._days.get(date)
+        series = None if group is None else group.series.get(
+            ("parts", part_name, name))
+        return self._series(series, start, end, index)
+
+    def at(self, time, model="box", index="now"):
+        """
+        Восстанавливает последний ответ с index не позже time.
+
+        Схемы повторно не проверяются. None, если такого ответа нет.
+        """
+        number = bisect_right(self._times(index), time) - 1
+        if number < 0:
+            return None
+        data = _unflatten(self._top.at(number), model, _TOP_MODELS)
+        data["now"] = self.now[number]
+        data["forecasts"] = [
+            _unflatten(self._days[date].at(number), model, _DAY_MODELS)
+            for date in self.dates.at(number)
+        ]
+        return WeatherAnswer.build(data, model)
+
+    def stats(self):
+        """
+        Число ответов, число значений полей во всех ответах и число
+        действительно сохранённых значений.
+        """
+        groups = [self._top] + list(self._days.values())
+        return {
+            "answers": len(self),
+            "values": self._values,
+            "stored": sum(len(series.values) for group in groups
+                          for series in group.series.values()),
+        }
+
+
+class HistoryStore:
+    """
+    Истории ответов для многих точек.
+
+    Ответы группируются по `info.geoid`, а для ответов без geoid -
+    по широте и долготе, округлённым до precision знаков.
+
+    ```
+    store = HistoryStore()
+    key = store.append(answer)
+    store[key].fact("temp", start, end)
+    ```
+    """
+    def __init__(self, precision=2):
+        self.precision = precision
+        self._locations = {}  # type: dict
+
+    def key(self, answer):
+        "Ключ точки ответа answer: geoid или (широта, долгота)"
+        info = answer["info"]
+        geoid = info.get("geoid") if isinstance(info, dict) \
+            else getattr(info, "geoid", None)
+        if geoid is not None:
+            return int(geoid)
+        return (round(info["lat"], self.precision),
+                round(info["lon"], self.precision))
+
+    def append(self, answer):
+        "Добавляет ответ в историю его точки и возвращает ключ точки"
+        key = self.key(answer)
+        history = self._locations.get(key)
+        if history is None:
+            history = self._locations[key] = LocationHistory()
+        history.append(answer)
+        return key
+
+    def __getitem__(self, key):
+        return self._locations[key]
+
+    def __contains__(self, key):
+        return key in self._locations
+
+    def __iter__(self):
+        return iter(self._locations)
+
+    def __len__(self):
+        return len(self._locations)
@@ -0,0 +1,82 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from .types import WeatherAnswer, json_default
+
+
+def validate_line(number, line):
+    """
+    Проверяет одну строку архива и возвращает строку результата.
+
+    Результат - JSON-объект с номером строки "line" и проверенным
+    ответом "answer" или описанием ошибки "error".
+    """
+    try:
+        answer = WeatherAnswer.validate(json.loads(line))
+    except Exception as err:  # pylint: disable=broad-except
+        return json.dumps({
+            "line": number, "error": str(err), "type": type(err).__name__
+        }, ensure_ascii=False)
+    return json.dumps({"line": number, "answer": answer},
+                      default=json_default, ensure_ascii=False)
+
+
+def validate_chunk(chunk):
+    "Проверяет пачку пар (номер, строка) в процессе-обработчике"
+    return [validate_line(number, line) for number, line in chunk]
+
+
+def _chunks(lines, chunk_size):
+    "Разбивает непустые строки на пачки пар (номер строки, строка)"
+    numbered = ((number, line) for number, line in enumerate(lines, 1)
+                if line.strip())
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def ingest(lines, *, workers=None, chunk_size=1000, max_pending=None):
+    """
+    Проверяет архив ответов API в нескольких процессах.
+
+    lines - итерируемый набор строк JSONL (например, открытый файл)
+    workers - число процессов, по умолчанию - число ядер
+    chunk_size - число строк в одной пачке для процесса
+    max_pending - максимальное число пачек в обработке, по умолчанию
+        удвоенное число процессов; ограничивает память
+
+    Возвращает генератор строк результата (см. `validate_line`)
+    в порядке строк архива. Пустые строки пропускаются.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()  # type: deque
+        for chunk in _chunks(lines, chunk_size):
+            pending.append(pool.submit(validate_chunk, chunk))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
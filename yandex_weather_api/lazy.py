@@ -0,0 +1,77 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+_MISSING = object()
+
+
+class Lazy:
+    """
+    Заместитель вложенного объекта ответа для ленивой проверки.
+
+    При первом обращении проверяет исходные данные вызовом
+    `cls.validate(obj, model)` и дальше работает с результатом.
+    Ошибка проверки возникает в момент обращения, с тем же типом
+    исключения, что и при обычной проверке.
+    """
+    __slots__ = ("_cls", "_obj", "_model", "_value")
+
+    def __init__(self, cls, obj, model):
+        self._cls = cls
+        self._obj = obj
+        self._model = model
+        self._value = _MISSING
+
+    def resolve(self):
+        "Проверяет данные, если это ещё не сделано, и возвращает результат"
+        if self._value is _MISSING:
+            self._value = self._cls.validate(self._obj, self._model)
+            self._obj = None
+        return self._value
+
+    @property
+    def resolved(self):
+        "Истинно, если данные уже проверены"
+        return self._value is not _MISSING
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+    def __getitem__(self, key):
+        return self.resolve()[key]
+
+    def __contains__(self, key):
+        return key in self.resolve()
+
+    def __iter__(self):
+        return iter(self.resolve())
+
+    def __len__(self):
+        return len(self.resolve())
+
+    def __eq__(self, other):
+        if isinstance(other, Lazy):
+            other = other.resolve()
+        return self.resolve() == other
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self):
+        if self._value is _MISSING:
+            return "{}({}, unresolved)".format(
+                type(self).__name__, self._cls.__name__)
+        return repr(self._value)
@@ -0,0 +1,145 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import asyncio
+from time import perf_counter
+
+from . import async_get
+from .retry import DEFAULT_RETRY
+from .stub import Upstream
+
+
+def summarize(latencies, errors, elapsed):
+    "Пропускная способность и процентили задержки успешных запросов"
+    latencies = sorted(latencies)
+    count = len(latencies)
+
+    def percentile(share):
+        if not latencies:
+            return None
+        return latencies[min(count - 1, int(count * share))] * 1e3
+
+    return {
+        "requests": count + errors,
+        "errors": errors,
+        "seconds": elapsed,
+        "rps": (count + errors) / elapsed if elapsed else None,
+        "p50_ms": percentile(0.5),
+        "p99_ms": percentile(0.99),
+    }
+
+
+async def drive(send, requests, concurrency):
+    """
+    Выполняет `await send(number)` для number от 0 до requests - 1,
+    не больше concurrency одновременно, и возвращает `summarize`.
+    """
+    latencies = []
+    errors = 0
+    numbers = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for number in numbers:
+            start = perf_counter()
+            try:
+                await send(number)
+            except Exception:  # pylint: disable=broad-except
+                errors += 1
+            else:
+                latencies.append(perf_counter() - start)
+
+    start = perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(latencies, errors, perf_counter() - start)
+
+
+def point(number, points):
+    "Координаты number-го запроса: points разных точек по кругу"
+    return {"lat": 50 + number % points * 0.1, "lon": 30}
+
+
+async def load_client(base_url, requests, concurrency, points,
+                      rate="informers", retry=DEFAULT_RETRY):
+    "Нагрузка на `async_get` с сервером API base_url"
+    # pylint: disable=too-many-arguments
+    from aiohttp import ClientSession, TCPConnector
+    async with ClientSession(connector=TCPConnector(limit=concurrency)) as session:
+        async def send(number):
+            await async_get(session, "stub", rate=rate, base_url=base_url,
+                            retry=retry, **point(number, points))
+        return await drive(send, requests, concurrency)
+
+
+async def load_server(url, requests, concurrency, points):
+    "Нагрузка на подкоманду server по адресу url"
+    from aiohttp import ClientSession, TCPConnector
+    async with ClientSession(connector=TCPConnector(limit=concurrency)) as session:
+        async def send(number):
+            async with session.get(url, params=point(number, points)) as resp:
+                resp.raise_for_status()
+                await resp.read()
+        return await drive(send, requests, concurrency)
+
+
+async def run_load(target, requests=1000, concurrency=20, points=50,
+                   rate="informers", url=None, retry=DEFAULT_RETRY, **stub):
+    """
+    Нагрузочный тест без доступа к сети.
+
+    target - "client" (`async_get`) или "server" (подкоманда server)
+    requests, concurrency - число запросов и одновременных запросов
+    points - число разных точек, по которым идут запросы
+    url - адрес уже запущенного сервера для target="server" (заглушка
+        тогда не запускается); по умолчанию сервер запускается в этом
+        же процессе
+    retry - `RetryPolicy` запросов к заглушке
+    stub - аргументы заглушки API `Upstream` (latency, error_rate и т.д.)
+
+    Клиент, сервер и заглушка работают в одном цикле событий, если url
+    не указан, поэтому результат - нижняя оценка для отдельного процесса.
+    Возвращает `summarize` и число запросов к заглушке.
+    """
+    # pylint: disable=too-many-arguments
+    if target not in ("client", "server"):
+        raise ValueError("target must be 'client' or 'server'")
+    if url is not None:
+        return await load_server(url, requests, concurrency, points)
+    upstream = Upstream(**stub)
+    stub_runner, base_url = await upstream.start()
+    runner = None
+    try:
+        if target == "client":
+            ret = await load_client(base_url, requests, concurrency, points,
+                                    rate, retry)
+        else:
+            from aiohttp import web
+            from .cli import make_app
+            runner = web.AppRunner(
+                make_app("stub", rate, base_url=base_url, retry=retry),
+                access_log=None)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            url = "http://127.0.0.1:{}/".format(runner.addresses[0][1])
+            ret = await load_server(url, requests, concurrency, points)
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+        await stub_runner.cleanup()
+    ret["upstream_requests"] = upstream.requests
+    return ret
@@ -0,0 +1,135 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+# Зарегистрированные обработчики событий hook(name, value).
+# Пока список пуст, библиотека не измеряет время и не создаёт событий.
+HOOKS = []  # type: list
+
+# События:
+#   network_seconds - запрос к API до получения тела ответа
+#   decode_seconds - разбор JSON
+#   validate_seconds - проверка ответа схемой
+#   request_seconds - обработка запроса подкомандой server
+#   cache_hits_total, cache_stale_total, cache_misses_total - кэш в памяти
+#   disk_cache_hits_total, disk_cache_misses_total - файловый кэш
+#   upstream_errors_total - ошибки запросов к API
+#   retries_total - повторные запросы к API
+
+
+def add_hook(hook):
+    "Регистрирует обработчик событий hook(name, value)"
+    HOOKS.append(hook)
+
+
+def remove_hook(hook):
+    "Удаляет обработчик событий"
+    HOOKS.remove(hook)
+
+
+def emit(name, value=1):
+    "Передаёт событие name со значением value всем обработчикам"
+    for hook in HOOKS:
+        hook(name, value)
+
+
+def timed(name, func):
+    """
+    Оборачивает func так, что время каждого вызова передаётся событием
+    name. Без обработчиков возвращает func без изменений.
+    """
+    if not HOOKS:
+        return func
+
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            emit(name, perf_counter() - start)
+    return wrapper
+
+
+class _Histogram:
+    "Гистограмма значений с фиксированными границами"
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self, bounds):
+        self.buckets = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class MetricsRegistry:
+    """
+    Обработчик событий, собирающий их в метрики Prometheus.
+
+    События с именами на `_seconds` становятся гистограммами,
+    остальные - счётчиками.
+
+    ```
+    registry = MetricsRegistry()
+    add_hook(registry)
+    ...
+    print(registry.render())
+    ```
+    """
+    BOUNDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+              1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, prefix="yandex_weather_"):
+        self.prefix = prefix
+        self.counters = {}  # type: dict
+        self.histograms = {}  # type: dict
+        self._lock = threading.Lock()
+
+    def __call__(self, name, value):
+        with self._lock:
+            if name.endswith("_seconds"):
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = _Histogram(self.BOUNDS)
+                histogram.buckets[bisect_left(self.BOUNDS, value)] += 1
+                histogram.sum += value
+                histogram.count += 1
+            else:
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def render(self):
+        "Метрики в текстовом формате Prometheus"
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                name = self.prefix + name
+                lines.append("# TYPE {} counter".format(name))
+                lines.append("{} {}".format(name, value))
+            for name, histogram in sorted(self.histograms.items()):
+                name = self.prefix + name
+                lines.append("# TYPE {} histogram".format(name))
+                total = 0
+                for bound, count in zip(self.BOUNDS, histogram.buckets):
+                    total += count
+                    lines.append('{}_bucket{{le="{}"}} {}'.format(
+                        name, bound, total))
+                lines.append('{}_bucket{{le="+Inf"}} {}'.format(
+                    name, histogram.count))
+                lines.append("{}_sum {}".format(name, histogram.sum))
+                lines.append("{}_count {}".format(name, histogram.count))
+        return "\n".join(lines) + "\n"
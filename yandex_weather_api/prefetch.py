@@ -0,0 +1,131 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import asyncio
+
+from . import async_get
+
+
+class Prefetcher:
+    """
+    Фоновое обновление популярных ответов до истечения их ttl.
+
+    Считает обращения к каждому ключу кэша (счётчики затухают с периодом
+    полураспада halflife секунд) и раз в interval секунд обновляет
+    самые популярные ответы, которым осталось жить не больше lead секунд.
+    Число обновлений ограничено rate запросами в секунду, top - число
+    рассматриваемых популярных ключей. base_url - необязательный адрес
+    сервера API (см. `validate_args`).
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, api_key, rate, cache, flight, *, refresh_rate=1.0,
+                 lead=30, top=100, interval=1.0, halflife=600, base_url=None):
+        # pylint: disable=too-many-arguments
+        self.api_key = api_key
+        self.rate = rate
+        self.cache = cache
+        self.flight = flight
+        self.base_url = base_url
+        self.refresh_rate = refresh_rate
+        self.lead = lead
+        self.top = top
+        self.interval = interval
+        self.decay = 0.5 ** (interval / halflife)
+        self.session = None
+        self._hits = {}  # type: dict
+        self._params = {}  # type: dict
+        self._tokens = 0.0
+        self._task = None
+        self._refreshes = set()  # type: set
+
+    def touch(self, key, params):
+        """
+        Отмечает обращение к ключу key.
+
+        params - проверенные `validate_args` параметры запроса.
+        """
+        self._hits[key] = self._hits.get(key, 0.0) + 1.0
+        self._params[key] = params
+
+    def hottest(self):
+        "Популярные ключи, которые пора обновить, по убыванию популярности"
+        keys = sorted(self._hits, key=self._hits.get, reverse=True)
+        ret = []
+        for key in keys[:self.top]:
+            expires_in = self.cache.expires_in(key)
+            if expires_in is not None and expires_in <= self.lead \
+                    and key not in self.flight:
+                ret.append(key)
+        return ret
+
+    async def refresh(self, key):
+        """
+        Обновляет ответ с ключом key во всех уровнях кэша, в том числе
+        в общем для процессов `DiskCache`
+        """
+        params = self._params[key]
+
+        def fetch():
+            return async_get(
+                self.session, self.api_key, rate=self.rate,
+                base_url=self.base_url, cache=self.cache, refresh=True,
+                **params)
+        try:
+            await self.flight.run(key, fetch)
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    def tick(self):
+        "Один шаг планировщика, возвращает число запущенных обновлений"
+        self._tokens = min(self._tokens + self.refresh_rate * self.interval,
+                           max(self.refresh_rate, 1.0))
+        started = 0
+        for key in self.hottest():
+            if self._tokens < 1:
+                break
+            self._tokens -= 1
+            task = asyncio.ensure_future(self.refresh(key))
+            self._refreshes.add(task)
+            task.add_done_callback(self._refreshes.discard)
+            started += 1
+        for key in list(self._hits):
+            self._hits[key] *= self.decay
+            if self._hits[key] < 0.01:
+                del self._hits[key]
+                del self._params[key]
+        return started
+
+    async def run(self):
+        "Основной цикл планировщика"
+        while True:
+            await asyncio.sleep(self.interval)
+            self.tick()
+
+    def start(self, session):
+        "Запускает планировщик, обновляющий ответы через сессию session"
+        self.session = session
+        self._task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        "Останавливает планировщик и идущие обновления"
+        tasks = list(self._refreshes)
+        if self._task is not None:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
@@ -0,0 +1,280 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import random
+import sys
+import threading
+import time
+
+from . import metrics
+
+# Коды ответа, после которых запрос можно безопасно повторить
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+
+class UpstreamError(Exception):
+    "API ответил кодом, после которого запрос повторяется"
+    def __init__(self, status):
+        super().__init__("Upstream responded with HTTP {}".format(status))
+        self.status = status
+
+
+class DeadlineExceeded(TimeoutError):
+    "Истекло общее время на вызов со всеми повторами"
+
+
+def status_of(resp):
+    "Код ответа requests или aiohttp; None для объектов без кода"
+    status = getattr(resp, "status_code", None)
+    if status is None:
+        status = getattr(resp, "status", None)
+    return status if isinstance(status, int) else None
+
+
+def _transient_errors():
+    """
+    Исключения, после которых запрос можно повторить: сетевые ошибки
+    и истечение времени ожидания, в том числе из уже загруженных
+    requests и aiohttp (сами модули здесь не импортируются).
+    """
+    errors = [UpstreamError, ConnectionError, TimeoutError]
+    requests = sys.modules.get("requests")
+    if requests is not None:
+        errors += [requests.ConnectionError, requests.Timeout]
+    aiohttp = sys.modules.get("aiohttp")
+    if aiohttp is not None:
+        errors += [aiohttp.ClientConnectionError, aiohttp.ClientPayloadError]
+    return tuple(errors)
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool():
+    "Общий пул потоков для дублирующих синхронных запросов"
+    global _POOL  # pylint: disable=global-statement
+    with _POOL_LOCK:
+        if _POOL is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _POOL = ThreadPoolExecutor(32, thread_name_prefix="weather-hedge")
+        return _POOL
+
+
+def _emit(name):
+    if metrics.HOOKS:
+        metrics.emit(name)
+
+
+class RetryPolicy:
+    """
+    Время ожидания, повторы и дублирование запросов к API.
+
+    timeout - время ожидания соединения и ответа (в секундах): число
+        или пара (соединение, чтение); None - без ограничения
+    retries - число повторов после сетевой ошибки, истечения timeout
+        или ответа с кодом из statuses (`UpstreamError`)
+    backoff, max_backoff - пауза перед n-м повтором выбирается случайно
+        от 0 до min(max_backoff, backoff * 2 ** n) («full jitter»)
+    hedge - необязательное время (в секундах), после которого, если
+        ответа ещё нет, отправляется второй такой же запрос; берётся
+        ответ, пришедший первым
+    deadline - необязательное общее время на вызов со всеми повторами;
+        по его истечении вызов завершается `DeadlineExceeded`
+
+    Запросы к API только читают данные, поэтому повторять и дублировать
+    их безопасно; но каждый повтор расходует квоту ключа. События
+    метрик: upstream_errors_total, retries_total, hedges_total,
+    hedge_wins_total, deadline_exceeded_total.
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, timeout=(3.05, 10), retries=2, backoff=0.1,
+                 max_backoff=2.0, hedge=None, deadline=None,
+                 statuses=RETRY_STATUSES, clock=time.monotonic):
+        # pylint: disable=too-many-arguments
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.deadline = deadline
+        self.statuses = statuses
+        self.clock = clock
+
+    def replace(self, **changes):
+        "Копия политики с изменёнными аргументами"
+        args = dict(self.__dict__)
+        args.update(changes)
+        return type(self)(**args)
+
+    def delay(self, attempt):
+        "Пауза перед повтором номер attempt (с нуля)"
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def check(self, resp):
+        "Вызывает `UpstreamError` для ответа с кодом из statuses"
+        status = status_of(resp)
+        if status in self.statuses:
+            raise UpstreamError(status)
+        return resp
+
+    def _left(self, start):
+        "Остаток общего времени или None"
+        if self.deadline is None:
+            return None
+        left = self.deadline - (self.clock() - start)
+        if left <= 0:
+            _emit("deadline_exceeded_total")
+            raise DeadlineExceeded(
+                "Deadline of {}s exceeded".format(self.deadline))
+        return left
+
+    def _attempt_timeout(self, left):
+        "Время ожидания для попытки с учётом остатка общего времени"
+        if left is None:
+            return self.timeout
+        if self.timeout is None:
+            return (left, left)
+        return tuple(min(value, left) for value in _pair(self.timeout))
+
+    def _failed(self, error, attempt, start):
+        """
+        Решает, повторять ли запрос после ошибки error; возвращает паузу
+        или заново вызывает ошибку.
+        """
+        _emit("upstream_errors_total")
+        if attempt >= self.retries \
+                or not isinstance(error, _transient_errors()):
+            raise error
+        delay = self.delay(attempt)
+        left = self._left(start)
+        if left is not None and delay >= left:
+            raise error
+        _emit("retries_total")
+        return delay
+
+    def call(self, send):
+        """
+        Выполняет send(timeout) с повторами и возвращает результат.
+
+        timeout - число или пара (соединение, чтение), как в requests,
+        или None.
+        Общее время deadline соблюдается приблизительно: requests
+        ограничивает время каждого чтения из сокета, а не всего ответа.
+        """
+        start = self.clock()
+        attempt = 0
+        while True:
+            timeout = self._attempt_timeout(self._left(start))
+            try:
+                if self.hedge is None:
+                    return send(timeout)
+                return self._hedged(send, timeout)
+            except Exception as error:  # pylint: disable=broad-except
+                delay = self._failed(error, attempt, start)
+            attempt += 1
+            time.sleep(delay)
+
+    def _hedged(self, send, timeout):
+        "send(timeout) и, если он не успел за hedge секунд, его дубль"
+        from concurrent.futures import FIRST_COMPLETED, wait
+        pool = _pool()
+        first = pool.submit(send, timeout)
+        wait([first], timeout=self.hedge)
+        if first.done():
+            return first.result()
+        _emit("hedges_total")
+        pending = {first, pool.submit(send, timeout)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        _emit("hedge_wins_total")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def async_call(self, send):
+        """
+        Выполняет await send(timeout) с повторами и возвращает результат.
+
+        timeout - как у `call`; deadline соблюдается точно.
+        """
+        import asyncio
+        start = self.clock()
+        attempt = 0
+        while True:
+            left = self._left(start)
+            timeout = self._attempt_timeout(left)
+            try:
+                attempt_coro = send(timeout) if self.hedge is None \
+                    else self._async_hedged(send, timeout)
+                if left is None:
+                    return await attempt_coro
+                return await asyncio.wait_for(attempt_coro, left)
+            except Exception as error:  # pylint: disable=broad-except
+                self._left(start)
+                delay = self._failed(error, attempt, start)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _async_hedged(self, send, timeout):
+        "await send(timeout) и, если он не успел за hedge секунд, его дубль"
+        import asyncio
+        first = asyncio.ensure_future(send(timeout))
+        tasks = [first]
+        try:
+            await asyncio.wait(tasks, timeout=self.hedge)
+            if first.done():
+                return first.result()
+            _emit("hedges_total")
+            tasks.append(asyncio.ensure_future(send(timeout)))
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            _emit("hedge_wins_total")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+DEFAULT_RETRY = RetryPolicy()
+
+
+def _pair(timeout):
+    "Пара (соединение, чтение) из числа или пары"
+    if isinstance(timeout, (int, float)):
+        return (timeout, timeout)
+    return tuple(timeout)
+
+
+def client_timeout(timeout):
+    "aiohttp.ClientTimeout из числа или пары (соединение, чтение)"
+    from aiohttp import ClientTimeout
+    connect, read = _pair(timeout)
+    return ClientTimeout(sock_connect=connect, sock_read=read)
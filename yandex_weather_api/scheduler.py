@@ -0,0 +1,245 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+
+from . import async_get, metrics
+
+INTERACTIVE = 0
+NORMAL = 1
+BULK = 2
+
+
+class QuotaExceeded(Exception):
+    "Квота ключей доступа к API исчерпана или запрос отброшен"
+
+
+class KeyQuota:
+    """
+    Квота одного ключа доступа к API.
+
+    limit - число запросов за период period секунд; периоды отсчитываются
+        от начала эпохи clock, для time.time - с полуночи UTC
+    rate, burst - необязательное ведро токенов: не больше rate запросов
+        в секунду в среднем и не больше burst подряд
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, api_key, limit, *, rate=None, burst=1, period=86400,
+                 clock=time.time):
+        # pylint: disable=too-many-arguments
+        self.api_key = api_key
+        self.limit = limit
+        self.rate = rate
+        self.burst = burst
+        self.period = period
+        self.clock = clock
+        self.used = 0
+        self.tokens = float(burst)
+        self._window = clock() // period
+        self._updated = clock()
+
+    def update(self):
+        "Начинает новый период и пополняет ведро токенов"
+        now = self.clock()
+        window = now // self.period
+        if window != self._window:
+            self._window = window
+            self.used = 0
+        if self.rate is not None:
+            self.tokens = min(float(self.burst),
+                              self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def remaining(self):
+        "Число запросов, оставшихся в текущем периоде"
+        return max(0, self.limit - self.used)
+
+    def wait(self):
+        "Время (в секундах) до появления токена"
+        if self.rate is None or self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def resets_in(self):
+        "Время (в секундах) до начала следующего периода"
+        return (self._window + 1) * self.period - self.clock()
+
+    def take(self):
+        "Учитывает один запрос"
+        self.used += 1
+        if self.rate is not None:
+            self.tokens -= 1
+
+
+class _ScheduledSession:
+    "Сессия, которая выполняет запросы к API по очереди планировщика"
+    def __init__(self, scheduler, session, priority, low_quota):
+        self.scheduler = scheduler
+        self.session = session
+        self.priority = priority
+        self.low_quota = low_quota
+
+    async def get(self, *args, headers=None, **kwargs):
+        # pylint: disable=missing-docstring
+        api_key = await self.scheduler.acquire(self.priority, self.low_quota)
+        headers = dict(headers or {}, **{"X-Yandex-API-Key": api_key})
+        return await self.session.get(*args, headers=headers, **kwargs)
+
+
+class QuotaScheduler:
+    """
+    Планировщик запросов к API с учётом квот нескольких ключей.
+
+    keys - словарь ключ доступа -> число запросов в сутки
+    rate, burst - необязательное ограничение частоты запросов каждого
+        ключа (запросов в секунду и запросов подряд)
+    reserve - доля суточной квоты всех ключей, которая сохраняется для
+        запросов с приоритетом выше BULK
+    low_quota - что делать с запросами BULK, когда остался только
+        резерв: "defer" - ждать нового периода, "drop" - отбрасывать
+        с исключением `QuotaExceeded`
+
+    Запросы к API ждут в очереди по приоритету (INTERACTIVE, NORMAL,
+    BULK; при равном приоритете - по порядку) и выполняются с ключом,
+    у которого осталось больше всего запросов. Квота расходуется только
+    на настоящие запросы к API: ответы из кэша и объединённые
+    `SingleFlight` запросы её не тратят. Если квота исчерпана у всех
+    ключей, запросы завершаются `QuotaExceeded`.
+
+    ```
+    scheduler = QuotaScheduler({"КЛЮЧ1": 5000, "КЛЮЧ2": 5000})
+    await scheduler.get(session, priority=INTERACTIVE, lat=55.75, lon=37.62)
+    ```
+    """
+    # pylint: disable=too-many-instance-attributes
+    INTERACTIVE = INTERACTIVE
+    NORMAL = NORMAL
+    BULK = BULK
+
+    def __init__(self, keys, *, rate=None, burst=1, reserve=0.1,
+                 low_quota="defer", period=86400, clock=time.time):
+        # pylint: disable=too-many-arguments
+        if low_quota not in ("defer", "drop"):
+            raise ValueError("low_quota must be 'defer' or 'drop'")
+        self.quotas = [
+            KeyQuota(api_key, limit, rate=rate, burst=burst, period=period,
+                     clock=clock)
+            for api_key, limit in keys.items()]
+        self.reserve = reserve
+        self.low_quota = low_quota
+        self.clock = clock
+        self._waiting = []  # type: list
+        self._order = itertools.count()
+        self._timer = None  # type: asyncio.TimerHandle
+
+    def session(self, session, priority=NORMAL, low_quota=None):
+        """
+        Обёртка сессии aiohttp для `async_get` и `Prefetcher`: каждый
+        запрос к API ждёт своей очереди с приоритетом priority и получает
+        заголовок с выбранным ключом. low_quota заменяет одноимённый
+        аргумент планировщика для запросов этой сессии.
+        """
+        return _ScheduledSession(self, session, priority, low_quota)
+
+    async def get(self, session, *, priority=NORMAL, **kwargs):
+        "Выполняет `async_get` через планировщик с приоритетом priority"
+        return await async_get(self.session(session, priority), "", **kwargs)
+
+    def acquire(self, priority=NORMAL, low_quota=None):
+        "Future, который получит ключ для одного запроса к API; вызывается в цикле событий"
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (
+            priority, next(self._order), future, low_quota or self.low_quota))
+        self._dispatch()
+        return future
+
+    def low(self):
+        "Истинно, если осталось не больше резерва квоты"
+        limit = sum(quota.limit for quota in self.quotas)
+        remaining = sum(quota.remaining for quota in self.quotas)
+        return remaining <= limit * self.reserve
+
+    def _reject(self, error):
+        "Завершает первый запрос очереди с ошибкой error"
+        future = heapq.heappop(self._waiting)[2]
+        future.set_exception(error)
+        if metrics.HOOKS:
+            metrics.emit("quota_rejected_total")
+
+    def _dispatch(self):
+        "Выдаёт ключи ожидающим запросам, пока это возможно"
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for quota in self.quotas:
+            quota.update()
+        delay = None
+        while self._waiting:
+            priority, _, future, low_quota = self._waiting[0]
+            if future.done():
+                heapq.heappop(self._waiting)
+                continue
+            available = [quota for quota in self.quotas if quota.remaining]
+            if priority >= BULK and self.low():
+                if low_quota == "defer":
+                    delay = min(quota.resets_in() for quota in self.quotas)
+                    break
+                self._reject(QuotaExceeded(
+                    "Low-priority request dropped, API quota is low"))
+                continue
+            if not available:
+                self._reject(QuotaExceeded("API quota is exhausted"))
+                continue
+            ready = [quota for quota in available if quota.wait() == 0]
+            if not ready:
+                delay = min(quota.wait() for quota in available)
+                break
+            quota = max(ready, key=lambda quota: quota.remaining)
+            quota.take()
+            heapq.heappop(self._waiting)
+            future.set_result(quota.api_key)
+            if metrics.HOOKS:
+                metrics.emit("quota_used_total")
+        if delay is not None:
+            self._timer = asyncio.get_running_loop().call_later(
+                max(delay, 0.001), self._dispatch)
+
+    def usage(self):
+        """
+        Текущее использование квот: по каждому ключу (последние четыре
+        символа) лимит, израсходованные и оставшиеся запросы, время до
+        нового периода; а также число ожидающих запросов.
+        """
+        for quota in self.quotas:
+            quota.update()
+        return {
+            "keys": [{
+                "key": "..." + quota.api_key[-4:],
+                "limit": quota.limit,
+                "used": quota.used,
+                "remaining": quota.remaining,
+                "resets_in": quota.resets_in(),
+            } for quota in self.quotas],
+            "remaining": sum(quota.remaining for quota in self.quotas),
+            "low": self.low(),
+            "waiting": sum(1 for _, _, future, _ in self._waiting
+                           if not future.done()),
+        }
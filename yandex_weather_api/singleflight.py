@@ -0,0 +1,45 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import asyncio
+
+
+class SingleFlight:
+    """
+    Объединяет одновременные одинаковые запросы в один.
+
+    Пока запрос с ключом key выполняется, все остальные вызовы `run`
+    с тем же ключом ждут его результата вместо нового запроса.
+    Отмена одного из ожидающих не отменяет общий запрос.
+    """
+    def __init__(self):
+        self._flights = {}  # type: dict
+
+    def __len__(self):
+        return len(self._flights)
+
+    def __contains__(self, key):
+        return key in self._flights
+
+    async def run(self, key, fetch):
+        "Возвращает результат `await fetch()`, общий для ключа key"
+        future = self._flights.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fetch())
+            self._flights[key] = future
+            future.add_done_callback(lambda _: self._flights.pop(key, None))
+        return await asyncio.shield(future)
@@ -0,0 +1,166 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import copy
+
+import voluptuous as vol
+
+
+class Slotted:
+    """
+    Компактная неизменяемая модель ответа на основе `__slots__`.
+
+    Поля из схемы хранятся в слотах, остальные поля ответа - в словаре
+    `_extra`. Вложенные словари становятся такими же моделями, списки -
+    кортежами. Отсутствующие необязательные поля вызывают AttributeError,
+    как и у коробки.
+    """
+    __slots__ = ("_extra",)
+    FIELDS = frozenset()  # type: frozenset
+    # класс BoxWithSchema или ключи вложенного словаря, по которым
+    # модель создаётся заново при распаковке
+    SOURCE = None  # type: object
+
+    def __init__(self, data):
+        setter = object.__setattr__
+        extra = None
+        for key, value in data.items():
+            if key not in self.FIELDS:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+                continue
+            if type(value) is dict:  # pylint: disable=unidiomatic-typecheck
+                value = namespace_model(tuple(value))(value)
+            elif type(value) is list:  # pylint: disable=unidiomatic-typecheck
+                value = tuple(value)
+            setter(self, key, value)
+        setter(self, "_extra", extra)
+
+    def __getattr__(self, name):
+        if name == "_extra":
+            raise AttributeError(name)
+        extra = self._extra
+        if extra is not None and name in extra:
+            return extra[name]
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("{} is frozen".format(type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError("{} is frozen".format(type(self).__name__))
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def keys(self):
+        "Имена всех заполненных полей"
+        ret = [key for key in self.__slots__ if hasattr(self, key)]
+        if self._extra is not None:
+            ret.extend(self._extra)
+        return ret
+
+    def items(self):
+        "Пары (имя, значение) всех заполненных полей"
+        return [(key, self[key]) for key in self.keys()]
+
+    def to_dict(self):
+        "Преобразует модель обратно в словари и списки"
+        return {key: _plain(self[key]) for key in self.keys()}
+
+    def __eq__(self, other):
+        if isinstance(other, Slotted):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    __hash__ = None  # type: ignore
+
+    def __reduce__(self):
+        return _restore, (self.SOURCE, dict(self.items()))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return _restore(self.SOURCE, copy.deepcopy(dict(self.items()), memo))
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, self.to_dict())
+
+
+def _plain(value):
+    "Рекурсивно превращает модели в словари, а кортежи - в списки"
+    if isinstance(value, Slotted):
+        return value.to_dict()
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+
+def _make_model(name, fields, source):
+    "Создаёт класс модели с заданными полями"
+    return type(name, (Slotted,), {
+        "__slots__": tuple(fields),
+        "__module__": __name__,
+        "FIELDS": frozenset(fields),
+        "SOURCE": source,
+    })
+
+
+def _restore(source, data):
+    "Модель для source (см. `Slotted.SOURCE`) с полями data"
+    if isinstance(source, tuple):
+        return namespace_model(source)(data)
+    return slots_model(source)(data)
+
+
+_NAMESPACES = {}  # type: dict
+
+
+def namespace_model(keys):
+    "Класс модели для вложенного словаря с ключами keys"
+    model = _NAMESPACES.get(keys)
+    if model is None:
+        fields = [key for key in keys if key.isidentifier()]
+        model = _NAMESPACES[keys] = _make_model("Namespace", fields, keys)
+    return model
+
+
+_MODELS = {}  # type: dict
+
+
+def slots_model(box_cls):
+    """
+    Класс модели для `BoxWithSchema`-класса box_cls.
+
+    Поля модели - ключи верхнего уровня схемы box_cls.SCHEMA.
+    """
+    model = _MODELS.get(box_cls)
+    if model is None:
+        fields = [
+            key.schema if isinstance(key, vol.Marker) else key
+            for key in box_cls.SCHEMA.schema
+        ]
+        model = _MODELS[box_cls] = _make_model(box_cls.__name__, fields, box_cls)
+    return model
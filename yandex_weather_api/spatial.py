@@ -0,0 +1,200 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import math
+import threading
+
+EARTH_RADIUS = 6371.0088  # средний радиус Земли, км
+KM_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+
+
+def distance(lat1, lon1, lat2, lon2):
+    "Расстояние по дуге большого круга между двумя точками, км"
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    hav = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) \
+        * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(hav)))
+
+
+class SpatialIndex:
+    """
+    Равномерная сетка точек (широта, долгота) со значениями.
+
+    cell - размер ячейки в градусах; поиск быстрее всего, когда радиус
+    поиска - несколько ячеек. Повторное добавление точки с теми
+    же координатами заменяет её значение.
+    """
+    def __init__(self, cell=0.05):
+        self.cell = cell
+        self._columns = max(1, int(math.ceil(360 / cell)))
+        self._cells = {}  # type: dict
+        self._points = {}  # type: dict
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._points)
+
+    def _cell(self, lat, lon):
+        return (int(math.floor(lat / self.cell)),
+                int(math.floor((lon + 180) / self.cell)) % self._columns)
+
+    def add(self, lat, lon, value):
+        "Добавляет точку (lat, lon) со значением value"
+        lat, lon = float(lat), float(lon)
+        cell = self._cell(lat, lon)
+        # точка вместе с координатами на единичной сфере: хорда между
+        # точками монотонна по расстоянию по дуге и считается без
+        # тригонометрии
+        point = (lat, lon, value) + _unit(lat, lon)
+        with self._lock:
+            if (lat, lon) in self._points:
+                self._cells[cell] = [
+                    old for old in self._cells[cell] if old[:2] != (lat, lon)]
+            self._points[lat, lon] = value
+            self._cells.setdefault(cell, []).append(point)
+
+    def nearest(self, lat, lon, radius):
+        """
+        Ближайшая к (lat, lon) точка не дальше radius км.
+
+        Возвращает (расстояние, широта, долгота, значение) или None.
+        Ячейки просматриваются по возрастанию нижней оценки расстояния
+        до них, поэтому обычно проверяются лишь несколько ячеек.
+        """
+        # pylint: disable=too-many-locals
+        lat, lon = float(lat), float(lon)
+        cell = self.cell
+        angle = min(radius / EARTH_RADIUS, math.pi)
+        row, column = self._cell(lat, lon)
+        rows = int(math.ceil(math.degrees(angle) / cell))
+        # точка на широте не выше top удалена от меридиана запроса на
+        # asin(cos(широта) * sin(разница долгот)) и больше
+        top = math.cos(math.radians(min(abs(lat) + math.degrees(angle), 90)))
+        half = self._columns // 2
+        if angle >= math.pi / 2 or math.sin(angle) >= top:
+            columns = half
+        else:
+            columns = min(half, int(math.ceil(
+                math.degrees(math.asin(math.sin(angle) / top)) / cell)))
+        cells = self._cells
+        found = []
+        for cell_row in range(row - rows, row + rows + 1):
+            south = cell_row * cell
+            dlat = south - lat if lat < south else max(0.0, lat - south - cell)
+            row_cos = math.cos(math.radians(min(
+                max(abs(south), abs(south + cell)), 90)))
+            for offset in range(-columns, columns + 1):
+                points = cells.get((cell_row, (column + offset) % self._columns))
+                if not points:
+                    continue
+                dlon = min(90.0, max(0, abs(offset) - 1) * cell)
+                bound = max(math.radians(dlat), math.asin(
+                    row_cos * math.sin(math.radians(dlon))))
+                found.append((bound, points))
+        found.sort(key=lambda item: item[0])
+        query = _unit(lat, lon)
+        # квадрат хорды для угла angle
+        limit = (2 * math.sin(angle / 2)) ** 2
+        best = None
+        for bound, points in found:
+            if (2 * math.sin(bound / 2)) ** 2 > limit:
+                break
+            for point in points:
+                chord = (point[3] - query[0]) ** 2 + (point[4] - query[1]) ** 2 \
+                    + (point[5] - query[2]) ** 2
+                if chord <= limit:
+                    limit = chord
+                    best = point
+        if best is None:
+            return None
+        return (distance(lat, lon, best[0], best[1]),) + best[:3]
+
+
+def _unit(lat, lon):
+    "Координаты точки на единичной сфере"
+    lat, lon = math.radians(lat), math.radians(lon)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon),
+            math.sin(lat))
+
+
+class NearbyCache:
+    """
+    Кэш, который отвечает на запрос ответом для ближайшей известной
+    точки.
+
+    cache - кэш ответов (`AnswerCache` или `DiskCache`), в котором
+        хранятся ответы
+    radius - расстояние в км, в пределах которого ответ для известного
+        населённого пункта подходит для любой точки
+
+    Каждый полученный ответ добавляется в пространственный индекс по
+    `info.lat` и `info.lon` вместе с `info.geoid`. Запрос в пределах
+    radius от такой точки получает координаты запроса, для которого
+    был получен её ответ, и попадает в тот же ключ кэша. Остальные
+    методы и атрибуты берутся у cache.
+
+    ```
+    cache = NearbyCache(AnswerCache(), radius=5)
+    yandex_weather_api.get(req, "КЛЮЧ", lat=55.75, lon=37.62, cache=cache)
+    ```
+    """
+    def __init__(self, cache, radius=5.0):
+        self.cache = cache
+        self.radius = radius
+        self.index = SpatialIndex(cell=max(radius / 4 / KM_PER_DEGREE, 1e-3))
+
+    def __getattr__(self, name):
+        return getattr(self.cache, name)
+
+    def __len__(self):
+        return len(self.cache)
+
+    def key(self, args, kwargs):
+        """
+        Строит ключ кэша из результата `validate_args`.
+
+        Заменяет lat и lon в kwargs["params"] на месте координатами
+        запроса ближайшей известной точки, если она есть.
+        """
+        params = kwargs["params"]
+        found = self.index.nearest(params["lat"], params["lon"], self.radius)
+        if found is not None:
+            params["lat"], params["lon"] = found[3]["lat"], found[3]["lon"]
+        return self.cache.key(args, kwargs)
+
+    def _indexing(self, key, validate):
+        "validate, который добавляет проверенный ответ в индекс"
+        # ключ - результат `request_key`: адрес и пары параметров запроса
+        params = dict(item for item in key if isinstance(item, tuple))
+
+        def wrapper(data):
+            answer = validate(data)
+            info = answer["info"]
+            self.index.add(info["lat"], info["lon"], {
+                "lat": params["lat"], "lon": params["lon"],
+                "geoid": getattr(info, "geoid", None)})
+            return answer
+        return wrapper
+
+    def fetch(self, key, fetch, validate):
+        "Как `AnswerCache.fetch`, полученные ответы попадают в индекс"
+        return self.cache.fetch(key, fetch, self._indexing(key, validate))
+
+    async def async_fetch(self, key, fetch, validate):
+        "Как `AnswerCache.async_fetch`, полученные ответы попадают в индекс"
+        return await self.cache.async_fetch(
+            key, fetch, self._indexing(key, validate))
@@ -0,0 +1,213 @@
+"""
+    yandex_weather_api - Yandex Weather API python module
+
+    Copyright 2018 Pavel Pletenev <cpp.create@gmail.com>
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import asyncio
+import json
+import random
+import time
+from collections import OrderedDict
+
+from .types import Condition, MoonText, PartName, WindDir
+
+DAY = 24 * 3600
+ICONS = ("skc_d", "bkn_d", "ovc", "ovc_-ra", "ovc_-sn")
+
+
+def _weather(temp, number):
+    "Общие поля погоды для fact, частей дня и часов"
+    return {
+        "feels_like": temp - 2,
+        "icon": ICONS[number % len(ICONS)],
+        "condition": Condition.VALUES[number % 5],
+        "wind_speed": round(1 + number % 7 * 0.6, 1),
+        "wind_gust": round(4 + number % 5 * 0.9, 1),
+        "wind_dir": WindDir.VALUES[number % len(WindDir.VALUES)],
+        "pressure_mm": 740 + number % 11,
+        "pressure_pa": 987 + number % 13,
+        "humidity": 55 + number % 40,
+    }
+
+
+def _part(temp, number, name=None):
+    "Прогноз на время суток"
+    ret = {
+        "temp_min": temp - 2, "temp_max": temp + 2, "temp_avg": temp,
+        "daytime": "d" if name in ("morning", "day") else "n",
+        "polar": False,
+        "prec_mm": number % 3 * 0.4, "prec_period": 360,
+        "prec_prob": number % 5 * 20,
+    }
+    ret.update(_weather(temp, number))
+    if name is not None:
+        ret["part_name"] = name
+    return ret
+
+
+def _day(start, number, base, hours):
+    "Прогноз на день number после start"
+    date_ts = start + number * DAY
+    ret = {
+        "date": time.strftime("%Y-%m-%d", time.gmtime(date_ts)),
+        "date_ts": date_ts,
+        "week": int(time.strftime("%V", time.gmtime(date_ts))),
+        "sunrise": "05:12", "sunset": "19:48",
+        "moon_code": number % 16,
+        "moon_text": MoonText.VALUES[number % len(MoonText.VALUES)],
+        "parts": {
+            name: _part(base + offset, number + offset, name)
+            for offset, name in zip((-4, 0, 4, 1), PartName.VALUES)
+        },
+    }
+    if hours:
+        ret["hours"] = [
+            dict(_weather(base + hour // 3 - 4, number + hour),
+                 hour=str(hour), hour_ts=date_ts + hour * 3600,
+                 temp=base + hour // 3 - 4, prec_mm=0, prec_prob=0)
+            for hour in range(24)
+        ]
+    return ret
+
+
+def make_answer(lat, lon, rate="informers", days=7, hours=True, now=None):
+    """
+    Ответ API для точки (lat, lon) в форме ответов тарифов informers
+    (один прогноз на две части дня) и forecast (days дней, почасовой
+    прогноз, если hours истинно). Значения правдоподобны и зависят
+    только от аргументов.
+    """
+    # pylint: disable=too-many-arguments
+    now = int(time.time()) if now is None else int(now)
+    start = now - now % DAY
+    base = int(25 - abs(lat) * 0.4 + lon % 5)
+    number = int(abs(lat * 100 + lon * 10))
+    fact = dict(_weather(base, number), temp=base, daytime="d", polar=False,
+                season="summer", obs_time=now - now % 1800, uv_index=number % 8)
+    ret = {
+        "now": now,
+        "now_dt": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(now)),
+        "info": {"lat": lat, "lon": lon,
+                 "url": "https://yandex.ru/pogoda/?lat={}&lon={}".format(lat, lon)},
+        "fact": fact,
+    }
+    if rate == "informers":
+        day = _day(start, 0, base, False)
+        day["parts"] = [day["parts"]["day"], day["parts"]["evening"]]
+        ret["forecast"] = day
+    else:
+        ret["info"].update({
+            "tzinfo": {"name": "Europe/Moscow", "abbr": "MSK",
+                       "offset": 10800, "dst": False},
+            "def_pressure_mm": 745, "def_pressure_pa": 994,
+        })
+        ret["forecasts"] = [_day(start, day, base, hours) for day in range(days)]
+    return ret
+
+
+class Upstream:
+    """
+    Заглушка API Яндекс.Погоды для измерений без доступа к сети.
+
+    latency, jitter - задержка ответа в секундах: latency плюс
+        равномерно распределённая добавка от 0 до jitter
+    error_rate - доля запросов, на которые отвечает 503
+    slow_rate, slow_latency - доля запросов, ответ на которые задерживается
+        ещё на slow_latency секунд (медленный «хвост» распределения)
+    days, hours - наибольший срок прогноза тарифа forecast и наличие
+        почасового прогноза; limit и hours запроса могут их уменьшить
+    seed - начальное значение генератора задержек и ошибок
+
+    Отвечает на GET /v1/informers и /v1/forecast с параметрами lat, lon
+    (и limit, hours для forecast), проверяет заголовок с ключом.
+    Закодированные ответы запоминаются по аргументам запроса.
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, days=7,
+                 hours=True, seed=None, maxsize=4096, slow_rate=0.0,
+                 slow_latency=1.0):
+        # pylint: disable=too-many-arguments
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.days = days
+        self.hours = hours
+        self.maxsize = maxsize
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._answers = OrderedDict()  # type: OrderedDict
+
+    def answer(self, rate, lat, lon, days, hours):
+        "Закодированный ответ, одинаковый для одинаковых аргументов"
+        key = (rate, lat, lon, days, hours)
+        data = self._answers.get(key)
+        if data is None:
+            data = json.dumps(make_answer(lat, lon, rate, days, hours)).encode()
+            self._answers[key] = data
+            while len(self._answers) > self.maxsize:
+                self._answers.popitem(last=False)
+        return data
+
+    async def handle(self, request):
+        # pylint: disable=missing-docstring
+        from aiohttp import web
+        self.requests += 1
+        delay = self.latency + self._random.random() * self.jitter
+        if self.slow_rate and self._random.random() < self.slow_rate:
+            delay += self.slow_latency
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.errors += 1
+            raise web.HTTPServiceUnavailable(text="stub error")
+        if not request.headers.get("X-Yandex-API-Key"):
+            raise web.HTTPForbidden(text="no API key")
+        rate = request.match_info["rate"]
+        query = request.query
+        try:
+            lat = float(query["lat"])
+            lon = float(query["lon"])
+            days = min(int(query.get("limit", self.days)), self.days)
+        except (KeyError, ValueError) as err:
+            raise web.HTTPBadRequest(text=str(err))
+        hours = self.hours and query.get("hours", "true") != "false"
+        return web.Response(body=self.answer(rate, lat, lon, days, hours),
+                            content_type="application/json")
+
+    def make_app(self):
+        "aiohttp-приложение заглушки"
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_get("/v1/{rate:informers|forecast}", self.handle)
+        app["upstream"] = self
+        return app
+
+    async def start(self, host="127.0.0.1", port=0):
+        """
+        Запускает заглушку в текущем цикле событий.
+
+        Возвращает пару (runner, base_url); для остановки вызовите
+        `await runner.cleanup()`.
+        """
+        from aiohttp import web
+        runner = web.AppRunner(self.make_app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        host, port = runner.addresses[0][:2]
+        return runner, "http://{}:{}".format(host, port)
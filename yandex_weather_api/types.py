@@ -15,11 +15,18 @@
     You should have received a copy of the GNU General Public License
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
+from array import array
+from bisect import bisect_left
+from itertools import repeat
 from typing import Tuple, Union, Sequence, TypeVar
 
 import voluptuous as vol
 from box import Box
 
+from .compiled import compile_schema
+from .slots import slots_model
+from .lazy import Lazy
+
 
 # typing typevar
 T = TypeVar('T')  # pylint: disable=invalid-name
@@ -34,7 +41,10 @@ def ensure_list(value: Union[T, Sequence[T]]) -> Sequence[T]:
 
 def ensure_list_of(validator):
     """Wrap value if it is not one, and run validator in each item."""
-    return lambda value: list(validator(y) for y in ensure_list(value))
+    def validate(value):
+        return list(validator(y) for y in ensure_list(value))
+    validate.item_validator = validator  # type: ignore
+    return validate
 
 
 def number(num):
@@ -146,12 +156,112 @@ class Icon(str):
 class BoxWithSchema(Box):
     """
     Коробка, которая может проверить валидность входных данных
-    на соответсвие схеме SCHEMA, которую должны предоставить потомки
+    на соответсвие схеме SCHEMA, которую должны предоставить потомки.
+
+    При первом использовании SCHEMA компилируется в быструю функцию
+    проверки (см. `compile_schema`), которая создаёт коробку только
+    для корневого объекта. COMPILED = False отключает компиляцию.
+
+    Кроме коробок (model="box") поддерживается компактная неизменяемая
+    модель на `__slots__` (model="slots", см. `slots_model`).
     """
+    COMPILED = True
+    MODELS = ("box", "slots")
+
     @classmethod
-    def validate(cls, obj):
-        "Проверяет схему SCHEMA на объекте obj и создаёт коробку"
-        return cls(cls.SCHEMA(obj))
+    def compiled_schema(cls, model="box", lazy=False):
+        "Возвращает скомпилированную для этого класса схему SCHEMA"
+        compiled = cls.__dict__.get("_compiled_schemas")
+        if compiled is None:
+            compiled = {}
+            cls._compiled_schemas = compiled
+        if (model, lazy) not in compiled:
+            compiled[model, lazy] = compile_schema(
+                cls.SCHEMA, _resolver(model, lazy))
+        return compiled[model, lazy]
+
+    @classmethod
+    def check(cls, obj, model="box", lazy=False):
+        """
+        Проверяет схему SCHEMA на объекте obj, не создавая коробку.
+
+        Вложенные объекты возвращаются словарями для model="box"
+        и готовыми моделями для остальных моделей. При lazy=True
+        вложенные объекты первого уровня не проверяются сразу, а
+        заменяются заместителями `Lazy`.
+        """
+        if cls.COMPILED or model != "box" or lazy:
+            return cls.compiled_schema(model, lazy)(obj)
+        return cls.SCHEMA(obj)
+
+    @classmethod
+    def build(cls, data, model="box"):
+        "Создаёт объект модели model из проверенных данных data"
+        if model == "box":
+            return cls(data)
+        if model == "slots":
+            return slots_model(cls)(data)
+        raise ValueError("Model {} cannot be used in {}".format(model, cls))
+
+    def to_dict(self):
+        "`Box.to_dict`, в котором `Hours` заменены списками словарей"
+        return _plain_hours(super().to_dict())
+
+    def to_json(self, filename=None, encoding="utf-8", errors="strict",
+                **json_kwargs):
+        "`Box.to_json`, который также сериализует `Hours` (см. `json_default`)"
+        json_kwargs.setdefault("default", json_default)
+        return super().to_json(filename, encoding, errors, **json_kwargs)
+
+    @classmethod
+    def validate(cls, obj, model="box", lazy=False):
+        """
+        Проверяет схему SCHEMA на объекте obj и создаёт коробку или модель.
+
+        lazy=True откладывает проверку вложенных объектов (info, fact,
+        элементов forecasts) до первого обращения к ним.
+        """
+        if model not in cls.MODELS:
+            raise ValueError("Model {} cannot be used in {}".format(model, cls))
+        return cls.build(cls.check(obj, model, lazy), model)
+
+
+def _plain_hours(value):
+    "Заменяет `Hours` в словарях и списках value списками словарей на месте"
+    if isinstance(value, Hours):
+        return value.to_list()
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if isinstance(item, (dict, list, Hours)):
+                value[key] = _plain_hours(item)
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            if isinstance(item, (dict, list, Hours)):
+                value[index] = _plain_hours(item)
+    return value
+
+
+def _resolver(model, lazy=False):
+    """
+    Подменяет `X.validate` в схемах: для коробок - на `X.check`,
+    так как вложенные объекты всё равно пересоздаются коробкой родителя,
+    для остальных моделей - на проверку с той же моделью, в ленивом
+    режиме - на создание заместителя `Lazy`.
+    """
+    def resolve(validator):
+        item_validator = getattr(validator, "item_validator", None)
+        if item_validator is not None:
+            return ensure_list_of(resolve(item_validator))
+        owner = getattr(validator, "__self__", None)
+        if isinstance(owner, type) and issubclass(owner, BoxWithSchema) \
+                and validator == owner.validate:
+            if lazy:
+                return lambda obj: Lazy(owner, obj, model)
+            if model == "box":
+                return owner.check
+            return lambda obj: owner.validate(obj, model)
+        return validator
+    return resolve
 
 
 class TZInfo(BoxWithSchema):
@@ -329,6 +439,268 @@ class ForecastPart(BoxWithSchema):
     }, extra=vol.ALLOW_EXTRA)
 
 
+class HourRow:
+    """
+    Прогноз на один час: строка почасового прогноза `Hours`.
+
+    Поля доступны как атрибуты (`row.temp`) и как ключи словаря
+    (`row["temp"]`); отсутствующие поля в `keys` не входят.
+    """
+    __slots__ = ("_hours", "_index")
+
+    def __init__(self, hours, index):
+        self._hours = hours
+        self._index = index
+
+    def __getattr__(self, name):
+        # до __init__ (при копировании и распаковке) слотов ещё нет
+        if name.startswith("__") or name in self.__slots__:
+            raise AttributeError(name)
+        return self._hours.value(name, self._index)
+
+    def __reduce__(self):
+        return type(self), (self._hours, self._index)
+
+    def __getitem__(self, key):
+        try:
+            return self._hours.value(key, self._index)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.to_dict()
+
+    def get(self, key, default=None):
+        "Значение поля key или default"
+        return self.to_dict().get(key, default)
+
+    def keys(self):
+        "Имена заполненных полей"
+        return self.to_dict().keys()
+
+    def items(self):
+        "Пары (имя, значение) заполненных полей"
+        return self.to_dict().items()
+
+    def to_dict(self):
+        "Преобразует строку в словарь, пропуская отсутствующие поля"
+        ret = {}
+        for name, _, _ in self._hours.columns_spec():
+            value = self._hours.value(name, self._index)
+            if value is not None and value == value:
+                ret[name] = value
+        extra = self._hours.extra(self._index)
+        if extra:
+            ret.update(extra)
+        return ret
+
+    def __eq__(self, other):
+        if isinstance(other, HourRow):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, self.to_dict())
+
+
+class Hours:
+    """
+    Почасовой прогноз на один день, хранящийся по колонкам.
+
+    Числовые поля хранятся в `array('d')` (NaN для отсутствующих),
+    перечисления и логические поля - кодами в `array('b')` (индекс
+    в VALUES или 0/1, -1 для отсутствующих), строки - списками. Поля
+    вне схемы HOUR_SCHEMA хранятся словарём для каждого часа, у которого
+    они есть.
+
+    `hours[13].temp` возвращает значение из строки, `hours.temp` -
+    колонку целиком (её можно передать в `numpy.frombuffer` без
+    копирования), `hours[6:12]` и `hours.between(ts1, ts2)` - часть
+    прогноза без циклов на Python.
+    """
+    __slots__ = ("_columns", "_length", "_extra")
+    _enums = {}  # type: dict
+    HOUR_SCHEMA = vol.Schema({
+        # Значение часа, для которого дается прогноз (0-23),
+        # локальное время. 	Строка
+        vol.Required("hour"): str,
+        # Время прогноза в Unixtime. 	Число
+        vol.Required("hour_ts"): number,
+        # Температура (°C). 	Число
+        vol.Required("temp"): number,
+        # Ощущаемая температура (°C). 	Число
+        vol.Required("feels_like"): number,
+        # Код иконки погоды. 	Строка
+        vol.Required("icon"): Icon.validate,
+        # Код расшифровки погодного описания. 	Строка
+        vol.Required("condition"): Condition.validate,
+        # Скорость ветра (в м/с). 	Число
+        vol.Required("wind_speed"): number,
+        # Скорость порывов ветра (в м/с). 	Число
+        vol.Required("wind_gust"): number,
+        # Направление ветра. 	Строка
+        vol.Required("wind_dir"): WindDir.validate,
+        # Давление (в мм рт. ст.). 	Число
+        vol.Required("pressure_mm"): number,
+        # Давление (в гектопаскалях). 	Число
+        vol.Required("pressure_pa"): number,
+        # Влажность воздуха (в процентах). 	Число
+        vol.Required("humidity"): number,
+        # Прогнозируемое количество осадков (в мм). 	Число
+        vol.Optional("prec_mm"): number,
+        # Прогнозируемый период осадков (в минутах). 	Число
+        vol.Optional("prec_period"): number,
+        # Вероятность выпадения осадков. 	Число
+        vol.Optional("prec_prob"): number,
+        # Тип осадков. 	Число
+        vol.Optional("prec_type"): number,
+        # Сила осадков. 	Число
+        vol.Optional("prec_strength"): number,
+        # Облачность. 	Число
+        vol.Optional("cloudness"): number,
+        # Признак грозы. 	Логический
+        vol.Optional("is_thunder"): bool,
+        # Ультрафиолетовый индекс. 	Число
+        vol.Optional("uv_index"): number,
+        # Температура почвы (°C). 	Число
+        vol.Optional("soil_temp"): number,
+        # Влажность почвы. 	Число
+        vol.Optional("soil_moisture"): number,
+    }, extra=vol.ALLOW_EXTRA)
+
+    def __init__(self, columns, length, extra=None):
+        # раскладка нужна value() и после распаковки в новом процессе
+        self.columns_spec()
+        self._columns = columns
+        self._length = length
+        self._extra = extra
+
+    @classmethod
+    def columns_spec(cls):
+        "Список колонок (имя, тип array или None для строк, перечисление)"
+        spec = cls.__dict__.get("_spec")
+        if spec is None:
+            spec = []
+            for key, validator in cls.HOUR_SCHEMA.schema.items():
+                owner = getattr(validator, "__self__", None)
+                if validator is number:
+                    spec.append((key.schema, "d", None))
+                elif validator is bool:
+                    spec.append((key.schema, "b", bool))
+                elif isinstance(owner, type) and issubclass(owner, Enum):
+                    spec.append((key.schema, "b", owner))
+                else:
+                    spec.append((key.schema, None, None))
+            cls._enums = {name: enum for name, _, enum in spec if enum}
+            cls._spec = spec
+        return spec
+
+    @classmethod
+    def validate(cls, hours):
+        "Проверяет список часов hours и раскладывает его по колонкам"
+        if not isinstance(hours, list):
+            raise ValueError("Expecting list of hours, got {}".format(hours))
+        check = cls.__dict__.get("_check")
+        if check is None:
+            check = cls._check = compile_schema(cls.HOUR_SCHEMA)
+        rows = [check(hour) for hour in hours]
+        count = len(rows)
+        names = cls.__dict__.get("_names")
+        if names is None:
+            names = cls._names = frozenset(
+                name for name, _, _ in cls.columns_spec())
+        extra = [{key: value for key, value in row.items()
+                  if key not in names} or None for row in rows]
+        columns = {}
+        for name, kind, enum in cls.columns_spec():
+            if kind == "d":
+                columns[name] = array(kind, map(
+                    dict.get, rows, repeat(name, count),
+                    repeat(float("nan"))))
+                continue
+            values = map(dict.get, rows, repeat(name, count))
+            if enum is bool:
+                values = map({True: 1, False: 0}.get, values, repeat(-1))
+            elif enum is not None:
+                codes = {value: code for code, value in enumerate(enum.VALUES)}
+                values = map(codes.get, values, repeat(-1))
+            columns[name] = array(kind, values) if kind else list(values)
+        return cls(columns, count, extra if any(extra) else None)
+
+    def value(self, name, index):
+        "Значение поля name в строке index"
+        try:
+            column = self._columns[name]
+        except KeyError:
+            extra = self.extra(index)
+            if extra is None or name not in extra:
+                raise AttributeError(name)
+            return extra[name]
+        value = column[index]
+        enum = self._enums.get(name)
+        if enum is None:
+            return value
+        if value < 0:
+            return None
+        return bool(value) if enum is bool else enum(enum.VALUES[value])
+
+    def __getattr__(self, name):
+        # до __init__ (при копировании и распаковке) колонок ещё нет
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self._columns[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def extra(self, index):
+        "Словарь полей вне схемы в строке index или None"
+        return None if self._extra is None else self._extra[index]
+
+    def __reduce__(self):
+        return type(self), (self._columns, self._length, self._extra)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            columns = {name: column[index]
+                       for name, column in self._columns.items()}
+            extra = None if self._extra is None else self._extra[index]
+            return Hours(columns, len(range(*index.indices(self._length))),
+                         extra if extra and any(extra) else None)
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        return HourRow(self, index)
+
+    def __iter__(self):
+        return (HourRow(self, index) for index in range(self._length))
+
+    def between(self, start, end):
+        "Часы с hour_ts в полуинтервале [start, end)"
+        hour_ts = self._columns["hour_ts"]
+        return self[bisect_left(hour_ts, start):bisect_left(hour_ts, end)]
+
+    def to_list(self):
+        "Преобразует прогноз в список словарей"
+        return [row.to_dict() for row in self]
+
+    def __eq__(self, other):
+        if isinstance(other, Hours):
+            other = other.to_list()
+        return self.to_list() == other
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, self.to_list())
+
+
 BASE_FORECAST_SCHEMA = vol.Schema({
     # Дата прогноза в формате ГГГГ-ММ-ДД. 	Строка
     vol.Required("date"): str,
@@ -371,12 +743,12 @@ class Forecast(BoxWithSchema):
     })
 
     @classmethod
-    def validate(cls, obj):
-        ret = super().validate(obj)
+    def check(cls, obj, model="box", lazy=False):
+        ret = super().check(obj, model, lazy)
         parts = {}
-        for part in ret.parts:
-            parts[part.part_name] = part
-        ret.parts = Box(parts)
+        for part in ret["parts"]:
+            parts[part["part_name"]] = part
+        ret["parts"] = parts
         return ret
 
 
@@ -391,6 +763,8 @@ class Forecasts(BoxWithSchema):
         vol.Required("parts"): {
             vol.Required(key): ForecastPart.validate for key in PartName.VALUES
         },
+        # Почасовой прогноз (при запросе с hours=true). 	Массив
+        vol.Optional("hours"): Hours.validate,
     })
 
 
@@ -417,10 +791,28 @@ class WeatherAnswer(BoxWithSchema):
     }, extra=vol.ALLOW_EXTRA)
 
     @classmethod
-    def validate(cls, obj):
-        ret = super().validate(obj)
+    def build(cls, data, model="box"):
+        if model != "box":
+            forecasts = tuple(
+                data["forecasts"] if "forecasts" in data else data["forecast"])
+            data["forecast"] = data["forecasts"] = forecasts
+            return super().build(data, model)
+        ret = super().build(data, model)
         if "forecasts" in ret:
             ret.forecast = ret.forecasts
         else:
             ret.forecasts = ret.forecast
         return ret
+
+
+def json_default(obj):
+    "Преобразует модели ответа, которые не являются словарями, для json.dumps"
+    if isinstance(obj, Hours):
+        return obj.to_list()
+    if isinstance(obj, Lazy):
+        obj = obj.resolve()
+        return dict(obj) if isinstance(obj, dict) else json_default(obj)
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    raise TypeError("Object of type {} is not JSON serializable".format(
+        type(obj).__name__))